@@ -0,0 +1,94 @@
+"""Clients AWS compartilhados por todos os flows: um por (processo, serviço, configuração), com pool HTTP
+reaproveitado e contadores de requisições, bytes e latência."""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Tuple
+
+import boto3
+from botocore.config import Config
+
+ENDPOINT = os.getenv("LOCALSTACK_ENDPOINT", "http://localhost:4566")
+AWS_KWARGS = dict(
+    region_name="us-east-1",
+    aws_access_key_id="test",
+    aws_secret_access_key="test",
+    endpoint_url=ENDPOINT,
+)
+MAX_POOL_CONNECTIONS = int(os.getenv("AWS_MAX_POOL_CONNECTIONS", "50"))
+MAX_ATTEMPTS = int(os.getenv("AWS_MAX_ATTEMPTS", "10"))
+
+_clients: Dict[Tuple, object] = {}
+_stats: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+_lock = threading.Lock()
+
+
+def client(service: str, max_pool_connections: int = MAX_POOL_CONNECTIONS, **kwargs):
+    """Client cacheado; ``kwargs`` sobrescreve ``AWS_KWARGS`` (ex.: endpoint/credenciais do MinIO)."""
+    params = {**AWS_KWARGS, **kwargs}
+    key = (os.getpid(), service, max_pool_connections, tuple(sorted(params.items())))
+    cached = _clients.get(key)
+    if cached is not None:
+        return cached
+
+    with _lock:
+        if key not in _clients:
+            config = Config(
+                max_pool_connections=max_pool_connections,
+                retries={"mode": "adaptive", "max_attempts": MAX_ATTEMPTS},
+                tcp_keepalive=True,
+            )
+            # boto3.client() usa a sessão default, que não é thread-safe
+            new = boto3.session.Session().client(service, config=config, **params)
+            _instrument(new, f"{service}@{params.get('endpoint_url') or 'aws'}")
+            _clients[key] = new
+        return _clients[key]
+
+
+def client_stats() -> Dict[str, Dict[str, float]]:
+    with _lock:
+        return {name: dict(values) for name, values in _stats.items()}
+
+
+def log_client_stats(log=print) -> None:
+    for name, s in sorted(client_stats().items()):
+        calls = s.get("requests", 0) or 1
+        log(
+            f"📡 {name}: {int(s.get('requests', 0))} req, "
+            f"{int(s.get('bytes_sent', 0))} B enviados, {int(s.get('bytes_received', 0))} B recebidos, "
+            f"latência média {1000 * s.get('latency_s', 0) / calls:.1f} ms"
+        )
+
+
+def _body_size(body) -> int:
+    if isinstance(body, (bytes, bytearray, memoryview)):
+        return len(body)
+    if hasattr(body, "seek") and hasattr(body, "tell"):
+        pos = body.tell()
+        end = body.seek(0, os.SEEK_END)
+        body.seek(pos)
+        return end - pos
+    return 0
+
+
+def _instrument(new_client, name: str) -> None:
+    def before_call(params, context, **_):
+        context["_started"] = time.perf_counter()
+        context["_bytes_sent"] = _body_size(params.get("body"))
+
+    def after_call(http_response, context, model, **_):
+        elapsed = time.perf_counter() - context.get("_started", time.perf_counter())
+        received = int(http_response.headers.get("content-length", 0) or 0)
+        with _lock:
+            s = _stats[name]
+            s["requests"] += 1
+            s["latency_s"] += elapsed
+            s["bytes_sent"] += context.get("_bytes_sent", 0)
+            s["bytes_received"] += received
+            s[f"requests.{model.name}"] += 1
+
+    new_client.meta.events.register("before-call.*.*", before_call)
+    new_client.meta.events.register("after-call.*.*", after_call)
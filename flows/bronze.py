@@ -1,30 +1,71 @@
 from __future__ import annotations
 
+import csv
 import io
 import os
+import re
+import threading
+import time
 from collections import Counter
-from typing import List
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional
 
-import boto3
+import numpy as np
 import polars as pl
-from prefect import flow, task
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+from prefect import flow, task, unmapped
+from prefect.task_runners import ThreadPoolTaskRunner
 
-# ─── Configuração AWS/LocalStack ─────────────────────────────────────
-ENDPOINT = os.getenv("LOCALSTACK_ENDPOINT", "http://localhost:4566")
-AWS_KWARGS = dict(
-    region_name="us-east-1",
-    aws_access_key_id="test",
-    aws_secret_access_key="test",
-    endpoint_url=ENDPOINT,
-)
+import aws_clients
+import parquet_codecs
+import parquet_layout
+import quality
+import schemas
+import silver_merge
+from csv_chunks import HeaderFilter, read_header
+from dedup_index import DedupIndex, load_or_rebuild
+from s3_multipart import PrefixedStream, S3MultipartWriter
+from state_store import load_json, save_json
 
 BUCKET = "csv-batch-bucket"
 LANDING_PREFIX = "landing/"
 BRONZE_PREFIX = "bronze"
+STATE_KEY = "state/bronze_state.json"
+COMPACTION_PREFIX = "state/bronze_compaction"
+STREAM_BATCH_BYTES = int(os.getenv("BRONZE_STREAM_BATCH_BYTES", str(16 * 1024 * 1024)))
+# Polars/Arrow liberam o GIL na conversão: threads usam todos os núcleos
+BRONZE_WORKERS = int(os.getenv("BRONZE_WORKERS", str(os.cpu_count() or 4)))
+COMPACT_TARGET_BYTES = int(os.getenv("BRONZE_COMPACT_TARGET_BYTES", str(128 * 1024 * 1024)))
+# entregas do Firehose que chegam atrasadas caem em horas já listadas
+LATE_WINDOW_HOURS = int(os.getenv("BRONZE_LATE_WINDOW_HOURS", "2"))
+FIREHOSE_HOUR = re.compile(r"(\d{4})/(\d{2})/(\d{2})/(\d{2})/")
 
 
 def boto(service: str):
-    return boto3.client(service, **AWS_KWARGS)
+    return aws_clients.client(service)
+
+
+def iter_objects(s3, prefix: str, start_after: Optional[str] = None) -> Iterator[dict]:
+    kwargs = {"StartAfter": start_after} if start_after else {}
+    for page in s3.get_paginator("list_objects_v2").paginate(Bucket=BUCKET, Prefix=prefix, **kwargs):
+        yield from page.get("Contents", [])
+
+
+def iter_dataset_prefixes(s3, prefix: str = LANDING_PREFIX) -> Iterator[str]:
+    for page in s3.get_paginator("list_objects_v2").paginate(Bucket=BUCKET, Prefix=prefix, Delimiter="/"):
+        for common in page.get("CommonPrefixes", []):
+            yield common["Prefix"]
+
+
+# índices de dedup carregados nesta execução (as tasks rodam em threads do mesmo processo)
+_dedup_indexes: Dict[str, DedupIndex] = {}
+_dedup_lock = threading.Lock()
+# parts já incorporados a arquivos compactados, por dataset:
+# chave do part → {"etag": do part, "source_etag": do objeto da landing, "compact": chave do compactado}
+_compacted: Dict[str, Dict[str, dict]] = {}
+_compacted_lock = threading.Lock()
 
 
 def normalize_and_dedupe(columns: List[str]) -> List[str]:
@@ -54,62 +95,417 @@ def ensure_bucket() -> None:
 @task
 def list_landing_csv(prefix: str = LANDING_PREFIX) -> List[str]:
     s3 = boto("s3")
-    response = s3.list_objects_v2(Bucket=BUCKET, Prefix=prefix)
-    return [o["Key"] for o in response.get("Contents", []) if o.get("Key") and o["Key"]]
+    return [o["Key"] for o in iter_objects(s3, prefix) if o.get("Key") and o["Key"]]
+
+
+@task
+def load_bronze_state() -> dict:
+    return load_json(boto("s3"), BUCKET, STATE_KEY, {"datasets": {}})
+
+
+def listing_start(dataset_prefix: str, watermark: Optional[str], window_hours: int = LATE_WINDOW_HOURS) -> Optional[str]:
+    """``StartAfter`` da listagem: ``window_hours`` antes da hora da marca d'água
+    (``<dataset>/AAAA/MM/DD/HH/`` do Firehose); chaves sem hora usam a própria marca."""
+    if watermark is None:
+        return None
+    m = FIREHOSE_HOUR.match(watermark[len(dataset_prefix):])
+    if not m:
+        return watermark
+    hour = datetime(*map(int, m.groups())) - timedelta(hours=window_hours)
+    return f"{dataset_prefix}{hour:%Y/%m/%d/%H}/"
+
+
+@task(log_prints=True)
+def list_new_landing_objects(state: dict, full_rescan: bool = False) -> List[Dict[str, str]]:
+    """Objetos da landing ainda não convertidos, listados desde ``LATE_WINDOW_HOURS`` antes da marca d'água
+    (``full_rescan`` lista tudo)."""
+    s3 = boto("s3")
+    new = []
+    for dataset_prefix in iter_dataset_prefixes(s3):
+        dataset = dataset_prefix[len(LANDING_PREFIX):].strip("/")
+        ds_state = state["datasets"].get(dataset, {})
+        processed = ds_state.get("processed", {})
+        start_after = None if full_rescan else listing_start(dataset_prefix, ds_state.get("watermark"))
+        for o in iter_objects(s3, dataset_prefix, start_after):
+            if processed.get(o["Key"]) != o["ETag"]:
+                new.append({"Key": o["Key"], "ETag": o["ETag"], "dataset": dataset})
+        print(f"🔎 {dataset}: marca d'água {start_after or '—'}")
+    return new
+
+
+@task
+def save_bronze_state(state: dict, objects: List[Dict[str, str]], results: List[str]) -> dict:
+    """Registra os objetos convertidos, avança a marca d'água até a primeira falha e poda ``processed``."""
+    by_dataset: Dict[str, list] = {}
+    for obj, uri in zip(objects, results):
+        by_dataset.setdefault(obj["dataset"], []).append((obj, bool(uri)))
+
+    for dataset, items in by_dataset.items():
+        ds_state = state["datasets"].setdefault(dataset, {"watermark": None, "processed": {}})
+        watermark = ds_state.get("watermark")
+        blocked = False
+        for obj, ok in sorted(items, key=lambda item: item[0]["Key"]):
+            if ok:
+                ds_state["processed"][obj["Key"]] = obj["ETag"]
+            blocked = blocked or not ok
+            if not blocked and (watermark is None or obj["Key"] > watermark):
+                watermark = obj["Key"]
+        ds_state["watermark"] = watermark
+        start = listing_start(f"{LANDING_PREFIX}{dataset}/", watermark)
+        if start is not None:
+            ds_state["processed"] = {k: etag for k, etag in ds_state["processed"].items() if k > start}
+
+    save_json(boto("s3"), BUCKET, STATE_KEY, state)
+    return state
+
+
+def bronze_key_for(key: str) -> str:
+    parts = key.split("/")
+    if len(parts) < 2:
+        print(f"⚠️ Nome do dataset não identificado em: {key}")
+        return ""
+
+    dataset = parts[1].replace(".csv", "").strip()
+    if not dataset:
+        print(f"⚠️ Dataset inválido extraído de: {key}")
+        return ""
+
+    # um part file por objeto da landing: reprocessar o mesmo objeto sobrescreve o mesmo part
+    name = "_".join(p for p in parts[2:] if p).split(".csv")[0] or dataset
+    return f"{BRONZE_PREFIX}/{dataset}/part-{name}.parquet"
+
+
+def with_etag(parquet_key: str, etag: str) -> str:
+    tag = etag.strip('"')[:12]
+    return parquet_key.replace(".parquet", f"-{tag}.parquet")
+
+
+def superseded_parts(s3, parquet_key: str, current: str) -> List[str]:
+    """Parts de outras versões (outro ETag) do mesmo objeto da landing que ``current``."""
+    stem = parquet_key[:-len(".parquet")]
+    version = re.compile(re.escape(stem) + r"-[^-/]+\.parquet")
+    return [o["Key"] for o in iter_objects(s3, f"{stem}-") if version.fullmatch(o["Key"]) and o["Key"] != current]
+
+
+def read_bronze_parts(dataset: str) -> Iterator[pl.DataFrame]:
+    s3 = boto("s3")
+    for o in iter_objects(s3, f"{BRONZE_PREFIX}/{dataset}/"):
+        if o["Key"].endswith(".parquet"):
+            yield pl.read_parquet(io.BytesIO(s3.get_object(Bucket=BUCKET, Key=o["Key"])["Body"].read()))
+
+
+def register_existing_part(s3, parquet_key: str, index: DedupIndex) -> bool:
+    """Se o part desta versão do objeto já existe, põe as linhas dele no índice e devolve ``True``."""
+    try:
+        obj = s3.get_object(Bucket=BUCKET, Key=parquet_key)
+    except s3.exceptions.NoSuchKey:
+        return False
+    # o índice pode não ter sido salvo depois da escrita do part
+    index.filter_new(pl.read_parquet(io.BytesIO(obj["Body"].read())))
+    return True
+
+
+def compaction_key(dataset: str) -> str:
+    return f"{COMPACTION_PREFIX}/{dataset}.json"
+
+
+def compacted_parts(dataset: str) -> Dict[str, dict]:
+    with _compacted_lock:
+        if dataset not in _compacted:
+            _compacted[dataset] = load_json(boto("s3"), BUCKET, compaction_key(dataset), {})
+        return _compacted[dataset]
+
+
+def already_converted(s3, parquet_key: str, dataset: str, etag: str, index: Optional[DedupIndex]) -> str:
+    """URI onde esta versão do objeto da landing já está na bronze (``""`` se ainda não foi convertida)."""
+    compacted = compacted_parts(dataset).get(parquet_key)
+    if compacted and compacted.get("source_etag") == etag:
+        return f"s3://{BUCKET}/{compacted['compact']}"
+    if compacted:
+        # nova versão de um objeto já compactado: as linhas antigas continuam no compactado
+        print(f"⚠️ {parquet_key} mudou depois de compactado em {compacted['compact']}")
+    if index is not None and register_existing_part(s3, parquet_key, index):
+        return f"s3://{BUCKET}/{parquet_key}"
+    return ""
+
+
+def dedup_index(dataset: str) -> DedupIndex:
+    with _dedup_lock:
+        if dataset not in _dedup_indexes:
+            _dedup_indexes[dataset] = load_or_rebuild(boto("s3"), BUCKET, dataset, read_bronze_parts)
+        return _dedup_indexes[dataset]
+
+
+@task(log_prints=True)
+def save_dedup_indexes() -> None:
+    s3 = boto("s3")
+    for dataset, index in _dedup_indexes.items():
+        index.save(s3, BUCKET)
+        print(f"🧮 Índice de dedup de {dataset}: {len(index)} hashes")
+
+
+def open_csv(body, block_size: int = STREAM_BATCH_BYTES):
+    """Leitor CSV em lotes, tudo como texto e sem os cabeçalhos repetidos; ``None`` para objeto vazio."""
+    header, rest = read_header(body, 64 * 1024)
+    if not header:
+        return None
+    names = normalize_and_dedupe(next(csv.reader([header.decode()])))
+    return pacsv.open_csv(
+        HeaderFilter(PrefixedStream(rest, body), header),
+        read_options=pacsv.ReadOptions(column_names=names, block_size=block_size),
+        parse_options=pacsv.ParseOptions(newlines_in_values=True),
+        convert_options=pacsv.ConvertOptions(
+            column_types={n: pa.string() for n in names},
+            strings_can_be_null=True,
+            null_values=[""],
+        ),
+    )
+
+
+def empty_csv(dataset: str) -> pl.DataFrame:
+    """Objeto vazio (sem cabeçalho): as colunas do registro, como texto."""
+    schema = schemas.REGISTRY.get(dataset)
+    return pl.DataFrame(schema={n: pl.String for n in schema.names} if schema else None)
+
+
+def clean_batch(df: pl.DataFrame, dataset: str) -> pl.DataFrame:
+    """Converte para os tipos do registro e descarta linhas sem as colunas obrigatórias e duplicatas do lote."""
+    rows = df.height
+    df, failures = schemas.cast_text(df, dataset)
+    quality.add_cast_failures("bronze", dataset, rows, failures)
+    schema = schemas.REGISTRY.get(dataset)
+    if schema and schema.required:
+        df = df.drop_nulls(schema.required)
+    return df.unique()
+
+
+def stream_csv_to_parquet(
+    s3,
+    body,
+    parquet_key: str,
+    dataset: str,
+    batch_bytes: int = STREAM_BATCH_BYTES,
+    dedup: Optional[DedupIndex] = None,
+    metadata: Optional[Dict[str, str]] = None,
+) -> int:
+    """Converte o corpo do objeto em lotes de ~``batch_bytes`` e sobe os row groups via multipart."""
+    reader = open_csv(body, batch_bytes)
+    empty = empty_csv(dataset) if reader is None else pl.from_arrow(reader.schema.empty_table())
+    # o schema que o Polars devolve já convertido (texto como large_string), para todos os lotes baterem
+    schema = schemas.cast_text(empty, dataset)[0].to_arrow().schema
+
+    rows, tokens = 0, []
+    sink = S3MultipartWriter(s3, BUCKET, parquet_key, Metadata=metadata or {})
+    sort_by = parquet_layout.sort_keys(dataset)
+    writer = None
+    try:
+        for batch in reader or []:
+            df = parquet_layout.arrange(clean_batch(pl.from_arrow(batch), dataset), sort_by)
+            if dedup is not None:
+                df, token = dedup.filter_new(df)
+                tokens.append(token)
+            if writer is None:
+                # codecs decididos pela amostra do primeiro lote
+                codecs = parquet_codecs.choose(df, dataset)
+                schema = parquet_layout.with_codec_metadata(schema, codecs)
+                writer = pq.ParquetWriter(sink, schema, **parquet_layout.writer_options(schema.names, sort_by, codecs))
+            rows += df.height
+            writer.write_table(df.to_arrow().cast(schema), row_group_size=parquet_layout.row_group_rows(df))
+        if writer is None:
+            writer = pq.ParquetWriter(sink, schema, **parquet_layout.writer_options(schema.names, sort_by))
+        writer.close()
+    except Exception:
+        sink.abort()
+        for token in tokens:
+            dedup.release(token)
+        raise
+    sink.close()
+    return rows
 
 
 @task(log_prints=True)
-def csv_s3_to_parquet(key: str) -> str:
+def csv_s3_to_parquet(
+    key: str,
+    streaming: bool = False,
+    batch_bytes: int = STREAM_BATCH_BYTES,
+    dedup: bool = False,
+) -> str:
+    """Converte um objeto da landing num part da bronze (com ``dedup``, descarta linhas já vistas)."""
     print(f"📥 Processando CSV: {key}")
     s3 = boto("s3")
 
+    parquet_key = bronze_key_for(key)
+    if not parquet_key:
+        return ""
+    dataset = parquet_key.split("/")[1]
+    index = dedup_index(dataset) if dedup else None
+
     try:
         obj = s3.get_object(Bucket=BUCKET, Key=key)
-        data = io.BytesIO(obj["Body"].read())
     except Exception as e:
         print(f"❌ Erro ao acessar o arquivo no S3: {e}")
         return ""
+    stale, discarded = [], None
+    if index is not None:
+        stale = superseded_parts(s3, parquet_key, with_etag(parquet_key, obj["ETag"]))
+        parquet_key = with_etag(parquet_key, obj["ETag"])
+    existing = already_converted(s3, parquet_key, dataset, obj["ETag"], index)
+    if existing:
+        obj["Body"].close()
+        print(f"♻️ Versão já convertida, mantida: {existing}")
+        return existing
+    if stale:
+        # nova versão do objeto: as linhas da anterior saem do índice e o part novo a substitui
+        discarded = np.concatenate([index.discard(pl.read_parquet(io.BytesIO(
+            s3.get_object(Bucket=BUCKET, Key=k)["Body"].read()))) for k in stale])
 
+    # o ETag da origem vai junto do part: a compactação o registra
+    metadata = {"source-etag": obj["ETag"]}
+    uri = ""
     try:
-        df = pl.read_csv(data, infer_schema_length=5000)
-    except Exception as e:
-        print(f"❌ Erro ao ler CSV: {e}")
-        return ""
+        if streaming:
+            try:
+                rows = stream_csv_to_parquet(s3, obj["Body"], parquet_key, dataset, batch_bytes, index, metadata)
+                uri = f"s3://{BUCKET}/{parquet_key}"
+                print(f"✅ Parquet salvo (streaming, {rows} linhas): {uri}")
+            except Exception as e:
+                print(f"❌ Erro na conversão em streaming de {key}: {e}")
+        else:
+            uri = eager_csv_to_parquet(s3, obj["Body"], parquet_key, dataset, index, metadata)
+    finally:
+        if discarded is not None and not uri:
+            index.restore(discarded)
+    if uri and stale:
+        silver_merge.delete_keys(s3, BUCKET, stale)
+        print(f"🗑️ {len(stale)} part(s) da versão anterior substituído(s): {', '.join(stale)}")
+    return uri
 
-    df.columns = normalize_and_dedupe(df.columns)
-    df = df.unique()
 
-    parts = key.split("/")
-    if len(parts) < 2:
-        print(f"⚠️ Nome do dataset não identificado em: {key}")
+def eager_csv_to_parquet(
+    s3,
+    body,
+    parquet_key: str,
+    dataset: str,
+    index: Optional[DedupIndex] = None,
+    metadata: Optional[Dict[str, str]] = None,
+) -> str:
+    try:
+        data = io.BytesIO(body.read())
+    except Exception as e:
+        print(f"❌ Erro ao acessar o arquivo no S3: {e}")
         return ""
 
-    dataset = parts[1].replace(".csv", "").strip()
-    if not dataset:
-        print(f"⚠️ Dataset inválido extraído de: {key}")
+    try:
+        reader = open_csv(data)
+        df = pl.from_arrow(reader.read_all()) if reader else empty_csv(dataset)
+    except Exception as e:
+        print(f"❌ Erro ao ler CSV: {e}")
         return ""
 
-    parquet_key = f"{BRONZE_PREFIX}/{dataset}/{dataset}.parquet"
-    buf = io.BytesIO()
-    df.write_parquet(buf, compression="snappy")
-    buf.seek(0)
+    df = clean_batch(df, dataset)
+    if index is not None:
+        df, token = index.filter_new(df)
 
-    s3.put_object(Bucket=BUCKET, Key=parquet_key, Body=buf.getvalue())
+    try:
+        s3.put_object(Bucket=BUCKET, Key=parquet_key, Body=parquet_layout.to_bytes(df, dataset), Metadata=metadata or {})
+    except Exception:
+        if index is not None:
+            index.release(token)
+        raise
     print(f"✅ Parquet salvo: s3://{BUCKET}/{parquet_key}")
     return f"s3://{BUCKET}/{parquet_key}"
 
 
-@flow(name="landing-to-bronze-flow")
-def landing_to_bronze_flow() -> List[str]:
+def plan_compaction(objects: List[dict], target_bytes: int) -> List[List[str]]:
+    """Agrupa, em ordem de chave, parts pequenos em lotes de até ``target_bytes``."""
+    bins, current, size = [], [], 0
+    for obj in sorted(objects, key=lambda o: o["Key"]):
+        if obj["Size"] >= target_bytes // 2:
+            continue
+        if current and size + obj["Size"] > target_bytes:
+            bins.append(current)
+            current, size = [], 0
+        current.append(obj["Key"])
+        size += obj["Size"]
+    bins.append(current)
+    return [b for b in bins if len(b) > 1]
+
+
+@task(log_prints=True)
+def compact_bronze(dataset: str, target_bytes: int = COMPACT_TARGET_BYTES) -> List[str]:
+    """Junta parts pequenos e registra em ``state/bronze_compaction/`` quais entraram em cada compactado."""
+    s3 = boto("s3")
+    prefix = f"{BRONZE_PREFIX}/{dataset}/"
+    compacted = compacted_parts(dataset)
+    parts, leftovers = [], []
+    for o in iter_objects(s3, prefix):
+        if o["Key"].endswith(".parquet"):
+            (leftovers if compacted.get(o["Key"], {}).get("etag") == o["ETag"] else parts).append(o)
+    silver_merge.delete_keys(s3, BUCKET, [o["Key"] for o in leftovers])
+    etags = {o["Key"]: o["ETag"] for o in parts}
+    written = []
+    for i, keys in enumerate(plan_compaction(parts, target_bytes)):
+        objects = [s3.get_object(Bucket=BUCKET, Key=k) for k in keys]
+        merged = pl.concat([pl.read_parquet(io.BytesIO(o["Body"].read())) for o in objects], how="diagonal_relaxed")
+
+        out_key = f"{prefix}compact-{int(time.time() * 1000)}-{i}.parquet"
+        s3.put_object(Bucket=BUCKET, Key=out_key, Body=parquet_layout.to_bytes(merged, dataset))
+        with _compacted_lock:
+            for key, obj in zip(keys, objects):
+                for entry in compacted.values():
+                    if entry["compact"] == key:
+                        entry["compact"] = out_key
+                compacted[key] = {
+                    "etag": etags[key],
+                    "source_etag": obj.get("Metadata", {}).get("source-etag"),
+                    "compact": out_key,
+                }
+            save_json(s3, BUCKET, compaction_key(dataset), compacted)
+        silver_merge.delete_keys(s3, BUCKET, keys)
+        print(f"🧱 {len(keys)} parts → s3://{BUCKET}/{out_key} ({merged.height} linhas)")
+        written.append(f"s3://{BUCKET}/{out_key}")
+    return written
+
+
+@task
+def publish_quality_report() -> str:
+    return quality.publish(boto("s3"), BUCKET, "bronze")
+
+
+@flow(name="landing-to-bronze-flow", task_runner=ThreadPoolTaskRunner(max_workers=BRONZE_WORKERS))
+def landing_to_bronze_flow(
+    streaming: bool = False,
+    compact: bool = False,
+    incremental: bool = False,
+    full_rescan: bool = False,
+    dedup: bool = False,
+) -> List[str]:
     print("🚀 Iniciando pipeline Landing → Bronze")
     ensure_bucket()
-    landing_keys = list_landing_csv()
+    if incremental:
+        state = load_bronze_state()
+        new_objects = list_new_landing_objects(state, full_rescan)
+        landing_keys = [o["Key"] for o in new_objects]
+    else:
+        landing_keys = list_landing_csv()
     if not landing_keys:
-        print("⚠️ Nenhum arquivo CSV encontrado na camada landing.")
+        print("⚠️ Nenhum arquivo CSV novo encontrado na camada landing.")
         return []
 
     print(f"📂 {len(landing_keys)} arquivos CSV encontrados.")
-    parquet_keys = csv_s3_to_parquet.map(landing_keys)
+    parquet_keys = csv_s3_to_parquet.map(
+        landing_keys, streaming=unmapped(streaming), dedup=unmapped(dedup)
+    ).result()
+    if dedup:
+        save_dedup_indexes()
+    if incremental:
+        save_bronze_state(state, new_objects, parquet_keys)
+
+    if compact:
+        datasets = sorted({uri.split("/")[-2] for uri in parquet_keys if uri})
+        compact_bronze.map(datasets).result()
+    publish_quality_report()
+    aws_clients.log_client_stats()
     return parquet_keys
 
 
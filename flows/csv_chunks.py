@@ -0,0 +1,144 @@
+"""Chunker de CSV em streaming para a landing: corta só fora de aspas e repete o cabeçalho
+em cada chunk, com memória limitada a ~1 chunk por vez."""
+from __future__ import annotations
+
+import io
+import re
+from pathlib import Path
+from typing import BinaryIO, Iterator, Optional, Tuple
+
+QUOTE = ord('"')
+NEWLINE = ord("\n")
+DEFAULT_MAX_BYTES = 900 * 1024
+
+
+def last_record_boundary(buf: bytearray, start: int, end: int) -> int:
+    """Posição logo após o último ``\\n`` fora de aspas em ``buf[start:end]`` (-1 se não houver)."""
+    cut, pos, quoted = -1, start, False
+    while True:
+        q = buf.find(QUOTE, pos, end)
+        seg_end = end if q == -1 else q
+        if not quoted:
+            nl = buf.rfind(NEWLINE, pos, seg_end)
+            if nl != -1:
+                cut = nl + 1
+        if q == -1:
+            return cut
+        quoted = not quoted
+        pos = q + 1
+
+
+def _fill(fh: BinaryIO, buf: bytearray, filled: int, limit: Optional[int] = None) -> int:
+    view = memoryview(buf)
+    stop = len(buf) if limit is None else min(len(buf), filled + max(limit, 0))
+    while filled < stop:
+        n = fh.readinto(view[filled:stop])
+        if not n:
+            break
+        filled += n
+    return filled
+
+
+def read_header(fh: BinaryIO, buffer_size: int) -> Tuple[bytes, bytes]:
+    """Separa o primeiro registro (cabeçalho) do resto do primeiro buffer."""
+    buf = bytearray()
+    pos = 0
+    while True:
+        nl = buf.find(NEWLINE, pos)
+        if nl == -1:
+            block = fh.read(buffer_size)
+            if not block:
+                return (bytes(buf) + b"\n" if buf else b""), b""
+            pos = len(buf)
+            buf += block
+            continue
+        if buf.count(QUOTE, 0, nl) % 2 == 0:
+            return bytes(buf[:nl + 1]), bytes(buf[nl + 1:])
+        pos = nl + 1
+
+
+def iter_csv_chunks(
+    csv_path: Path,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    buffer_size: int = 64 * 1024,
+    start: int = 0,
+    end: Optional[int] = None,
+) -> Iterator[bytearray]:
+    """Gera chunks ``header + registros completos`` com até ``max_bytes``, restritos a ``[start, end)``."""
+    with open(csv_path, "rb", buffering=0) as fh:
+        header, carry = read_header(fh, buffer_size)
+        if not header:
+            return
+        body_start = len(header)
+        if start > body_start:
+            fh.seek(start)
+            carry = b""
+        if end is not None:
+            carry = carry[:max(end - body_start, 0)]
+        capacity = max(max_bytes, body_start + buffer_size)
+
+        eof = False
+        while True:
+            out = bytearray(capacity)
+            out[:body_start] = header
+            filled = body_start + len(carry)
+            out[body_start:filled] = carry
+
+            while True:
+                if not eof:
+                    limit = None if end is None else end - fh.tell()
+                    filled = _fill(fh, out, filled, limit)
+                    eof = filled < len(out)
+                if eof:
+                    cut = filled
+                    break
+                cut = last_record_boundary(out, body_start, filled)
+                if cut != -1:
+                    break
+                # registro único maior que o chunk: cresce até achar o fim dele
+                out.extend(bytes(buffer_size))
+
+            carry = bytes(out[cut:filled])
+            del out[cut:]
+            if len(out) > body_start:
+                if not out.endswith(b"\n"):
+                    out += b"\n"
+                yield out
+            if eof:
+                return
+
+
+class HeaderFilter(io.RawIOBase):
+    """Stream de leitura que descarta as linhas idênticas a ``header`` (cabeçalhos do Firehose)."""
+
+    def __init__(self, stream: BinaryIO, header: bytes, block_size: int = 1024 * 1024):
+        super().__init__()
+        self._stream = stream
+        self._header = header.rstrip(b"\r\n")
+        self._line = re.compile(rb"(?m)^" + re.escape(self._header) + rb"\r?(?:\n|\Z)")
+        self._block_size = block_size
+        self._pending = bytearray()
+        self._carry = b""
+        self._eof = False
+        self.dropped = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buf) -> int:
+        while not self._pending and not self._eof:
+            block = self._stream.read(self._block_size)
+            if block:
+                data = self._carry + block
+                cut = data.rfind(b"\n") + 1
+                data, self._carry = data[:cut], data[cut:]
+            else:
+                data, self._carry, self._eof = self._carry, b"", True
+            if self._header and self._header in data:
+                data, n = self._line.subn(b"", data)
+                self.dropped += n
+            self._pending += data
+        n = min(len(buf), len(self._pending))
+        buf[:n] = self._pending[:n]
+        del self._pending[:n]
+        return n
@@ -0,0 +1,128 @@
+"""Índice persistente de deduplicação da bronze: hashes de linha ``uint64`` ordenados em ``state/dedup/<dataset>.npy``,
+reconstruído quando muda a versão do Polars."""
+from __future__ import annotations
+
+import io
+import threading
+import time
+from typing import Dict, Iterable, Tuple
+
+import numpy as np
+import polars as pl
+
+INDEX_PREFIX = "state/dedup"
+HASH_SEED = 0x5EED
+REBUILD_AFTER_DAYS = 30
+
+
+def row_hashes(df: pl.DataFrame) -> np.ndarray:
+    cols = sorted(df.columns)
+    return df.select(pl.col(cols).cast(pl.String)).hash_rows(seed=HASH_SEED).to_numpy()
+
+
+class DedupIndex:
+    def __init__(self, dataset: str, hashes: np.ndarray, built_at: float):
+        self.dataset = dataset
+        self.built_at = built_at
+        self.polars_version = pl.__version__
+        self._base = np.unique(hashes.astype(np.uint64, copy=False))
+        self._reserved: Dict[int, np.ndarray] = {}
+        self._next_token = 0
+        self._lock = threading.Lock()
+
+    @property
+    def key(self) -> str:
+        return f"{INDEX_PREFIX}/{self.dataset}.npy"
+
+    def __len__(self) -> int:
+        return len(self._base) + sum(len(h) for h in self._reserved.values())
+
+    # ─── Persistência ───────────────────────────────────────────────
+    @classmethod
+    def load(cls, s3, bucket: str, dataset: str) -> "DedupIndex":
+        key = f"{INDEX_PREFIX}/{dataset}.npy"
+        try:
+            obj = s3.get_object(Bucket=bucket, Key=key)
+        except s3.exceptions.NoSuchKey:
+            return cls(dataset, np.empty(0, dtype=np.uint64), time.time())
+        meta = obj.get("Metadata", {})
+        index = cls(dataset, np.load(io.BytesIO(obj["Body"].read())), float(meta.get("built-at", 0)))
+        index.polars_version = meta.get("polars-version")
+        return index
+
+    @classmethod
+    def rebuild(cls, dataset: str, frames: Iterable[pl.DataFrame]) -> "DedupIndex":
+        hashes = [row_hashes(df) for df in frames]
+        base = np.concatenate(hashes) if hashes else np.empty(0, dtype=np.uint64)
+        return cls(dataset, base, time.time())
+
+    def needs_rebuild(self) -> bool:
+        stale = time.time() - self.built_at > REBUILD_AFTER_DAYS * 86400
+        return stale or self.polars_version != pl.__version__
+
+    def save(self, s3, bucket: str) -> None:
+        """Incorpora as reservas confirmadas ao array base e grava o índice."""
+        with self._lock:
+            if self._reserved:
+                self._base = np.union1d(self._base, np.concatenate(list(self._reserved.values())))
+                self._reserved.clear()
+            buf = io.BytesIO()
+            np.save(buf, self._base)
+        s3.put_object(
+            Bucket=bucket,
+            Key=self.key,
+            Body=buf.getvalue(),
+            Metadata={"polars-version": pl.__version__, "built-at": str(self.built_at)},
+        )
+
+    # ─── Consulta ───────────────────────────────────────────────────
+    def filter_new(self, df: pl.DataFrame) -> Tuple[pl.DataFrame, int]:
+        """Remove linhas já vistas e reserva as novas; devolve o frame e um token de reserva."""
+        if df.is_empty():
+            return df, -1
+        hashes = row_hashes(df)
+        # também descarta colisões dentro do próprio lote
+        first = np.zeros(len(hashes), dtype=bool)
+        first[np.unique(hashes, return_index=True)[1]] = True
+
+        base = self._base
+        pos = np.searchsorted(base, hashes)
+        seen = pos < len(base)
+        seen[seen] = base[pos[seen]] == hashes[seen]
+        keep = first & ~seen
+
+        with self._lock:
+            if self._reserved:
+                keep &= ~np.isin(hashes, np.concatenate(list(self._reserved.values())))
+            token = self._next_token
+            self._next_token += 1
+            self._reserved[token] = hashes[keep]
+        return df.filter(pl.Series(keep)), token
+
+    def release(self, token: int) -> None:
+        with self._lock:
+            self._reserved.pop(token, None)
+
+    def discard(self, df: pl.DataFrame) -> np.ndarray:
+        """Tira do índice as linhas de ``df`` (um part que vai ser substituído); devolve os hashes tirados."""
+        hashes = np.unique(row_hashes(df)) if not df.is_empty() else np.empty(0, dtype=np.uint64)
+        with self._lock:
+            removed = np.intersect1d(self._base, hashes)
+            self._base = np.setdiff1d(self._base, hashes, assume_unique=True)
+            for token, reserved in self._reserved.items():
+                removed = np.union1d(removed, np.intersect1d(reserved, hashes))
+                self._reserved[token] = reserved[~np.isin(reserved, hashes)]
+        return removed
+
+    def restore(self, hashes: np.ndarray) -> None:
+        """Devolve ao índice hashes tirados por ``discard`` (a substituição falhou)."""
+        with self._lock:
+            self._base = np.union1d(self._base, hashes)
+
+
+def load_or_rebuild(s3, bucket: str, dataset: str, read_parts) -> DedupIndex:
+    """Carrega o índice; se estiver velho ou de outra versão do Polars, refaz com ``read_parts(dataset)``."""
+    index = DedupIndex.load(s3, bucket, dataset)
+    if len(index) and not index.needs_rebuild():
+        return index
+    return DedupIndex.rebuild(dataset, read_parts(dataset))
@@ -1,36 +1,56 @@
-import io
-import os
-from typing import Dict
+import sys
+from typing import Dict, List, Optional, Tuple, Union
 
-import boto3
 import polars as pl
 from prefect import flow, task
 
-# ─── Config LocalStack ──────────────────────────────────────────────
-ENDPOINT = os.getenv("LOCALSTACK_ENDPOINT", "http://localhost:4566")
-AWS_KWARGS = dict(
-    region_name="us-east-1",
-    aws_access_key_id="test",
-    aws_secret_access_key="test",
-    endpoint_url=ENDPOINT,
-)
+import aws_clients
+import gold_publish
+import gold_state
+import parquet_codecs
+import parquet_layout
+import partitioning
+import quality
+import ranking
+import result_cache
+import s3_scan
+import schemas
 
 BUCKET = "csv-batch-bucket"
 SILVER_PREFIX = "silver"
 GOLD_PREFIX = "gold"
 
+# colunas da silver que alguma saída da gold usa (reviews.content nunca é lido)
+MUSIC_COLUMNS = ["album_id", "band_id", "band_name", "country"]
+REVIEW_COLUMNS = ["album_id", "score"]
+
+# saída da gold → datasets da silver de que ela depende
+DEPENDENCIES: Dict[str, List[str]] = {
+    "top10_by_country": ["music_catalog", "reviews"],
+    "country_rankings": ["music_catalog", "reviews"],
+    "band_avg_scores": ["music_catalog", "reviews"],
+    "brazilian_bands": ["music_catalog", "reviews"],
+    "band_album_counts": ["music_catalog"],
+    "full_dataset": ["albums", "bands", "reviews"],
+}
+# saídas derivadas dos agregados por banda (join review × catálogo)
+SCORED_OUTPUTS = ["top10_by_country", "country_rankings", "band_avg_scores", "brazilian_bands"]
+
+# tabela larga banda × álbum × review
+FULL_DATASET_COLUMNS = [
+    "name", "country", "status", "formed_in", "title_album", "year_album", "title_review", "score", "content",
+]
+
+BRAZIL = pl.col("country").str.to_lowercase().str.strip_chars().is_in(["brazil", "brasil"])
+
 
 def boto(service: str):
-    return boto3.client(service, **AWS_KWARGS)
+    return aws_clients.client(service)
 
 
 # ─── Util ───────────────────────────────────────────────────────────
-def read_parquet_lazy_from_s3(path: str) -> pl.LazyFrame:
-    s3 = boto("s3")
-    path_parts = path.replace("s3://", "").split("/")
-    bucket, key = path_parts[0], "/".join(path_parts[1:])
-    response = s3.get_object(Bucket=bucket, Key=key)
-    return pl.read_parquet(io.BytesIO(response["Body"].read())).lazy()
+def read_parquet_lazy_from_s3(path: Union[str, List[str]], sorted_by: Optional[str] = None) -> pl.LazyFrame:
+    return s3_scan.scan_parquet(path, sorted_by=sorted_by)
 
 
 @task
@@ -42,82 +62,163 @@ def ensure_bucket():
         s3.create_bucket(Bucket=BUCKET)
 
 
+@task(log_prints=True)
+def publish_gold(run_id: int, outputs: Dict[str, str]) -> None:
+    if gold_publish.publish(boto("s3"), BUCKET, GOLD_PREFIX, run_id, outputs) is None:
+        print(f"⚠️ Versão {run_id} da gold não publicada: já existe uma mais nova.")
+        return
+    print(f"📌 Gold publicada: {gold_publish.run_prefix(GOLD_PREFIX, run_id)}")
+
+
+@task(log_prints=True)
+def collect_gold_garbage() -> None:
+    deleted, requests = gold_publish.collect_garbage(boto("s3"), BUCKET, GOLD_PREFIX)
+    if deleted:
+        print(f"🗑️ Gold: {deleted} objeto(s) de versões antigas apagados em {requests} requisição(ões)")
+
+
 @task
-def clear_gold_prefix():
+def fingerprint_outputs(partitioned: bool, top_k: int) -> Dict[str, str]:
+    """Impressão digital de cada saída: objetos da silver de que ela depende,
+    código da gold e parâmetros."""
     s3 = boto("s3")
-    resp = s3.list_objects_v2(Bucket=BUCKET, Prefix=GOLD_PREFIX)
-    if 'Contents' in resp:
-        for obj in resp['Contents']:
-            s3.delete_object(Bucket=BUCKET, Key=obj['Key'])
+    inputs = {
+        name: result_cache.listing(s3, f"s3://{BUCKET}/{SILVER_PREFIX}/{name}/")
+        for name in result_cache.required_inputs(DEPENDENCIES, DEPENDENCIES)
+    }
+    code = result_cache.code_hash(
+        sys.modules[__name__], gold_state, ranking, schemas, parquet_layout, parquet_codecs, partitioning,
+    )
+    params = {"partitioned": partitioned, "top_k": top_k, "bayes_prior": ranking.BAYES_PRIOR}
+    return {
+        name: result_cache.fingerprint({i: inputs[i] for i in deps}, code, params)
+        for name, deps in DEPENDENCIES.items()
+    }
+
+
+@task(log_prints=True)
+def lookup_cached_outputs(fingerprints: Dict[str, str]) -> Dict[str, str]:
+    cached = result_cache.lookup_all(boto("s3"), BUCKET, "gold", fingerprints)
+    for name, uri in cached.items():
+        print(f"♻️ {name}: entradas e código inalterados, mantido {uri}")
+    return cached
+
+
+@task
+def remember_outputs(fingerprints: Dict[str, str], written: Dict[str, str]) -> None:
+    for name, uri in written.items():
+        result_cache.store(boto("s3"), BUCKET, "gold", name, fingerprints[name], uri)
 
 
 @task
-def read_silver_lazy(dataset_name: str) -> pl.LazyFrame:
-    path = f"s3://{BUCKET}/{SILVER_PREFIX}/{dataset_name}/{dataset_name}.parquet"
-    return read_parquet_lazy_from_s3(path)
+def read_silver_lazy(dataset_name: str, predicate: Optional[pl.Expr] = None) -> pl.LazyFrame:
+    # silver incremental: os arquivos atuais vêm do manifesto do MERGE; silver
+    # particionada: só as partições que podem satisfazer ``predicate``
+    uris = partitioning.dataset_uris(boto("s3"), BUCKET, SILVER_PREFIX, dataset_name, predicate)
+    # a chave de ordenação da silver é a chave dos joins da gold (album_id)
+    df = read_parquet_lazy_from_s3(uris, sorted_by=next(iter(parquet_layout.sort_keys(dataset_name)), None))
+    return df if predicate is None else df.filter(predicate)
 
 
 @task
-def write_gold_dataset(df: pl.LazyFrame, name: str) -> str:
-    collected = df.collect()
+def write_gold_dataset(df: pl.LazyFrame, name: str, partitioned: bool = False, prefix: str = GOLD_PREFIX) -> str:
+    collected, profile = quality.collect_profiled(df, name)
+    quality.record("gold", name, profile)
     if collected.is_empty():
         print(f"⚠️ Dataset '{name}' vazio. Não será salvo.")
         return ""
     s3 = boto("s3")
-    buf = io.BytesIO()
-    collected.write_parquet(buf, compression="snappy")
-    buf.seek(0)
-    key = f"{GOLD_PREFIX}/{name}.parquet"
-    s3.put_object(Bucket=BUCKET, Key=key, Body=buf.getvalue())
+    spec = partitioning.SPECS.get(name) if partitioned else None
+    if spec is not None:
+        directory = f"{prefix}/{name}"
+        keys = partitioning.write_partitioned(s3, BUCKET, directory, collected, spec)
+        print(f"✅ Escrito: {directory}/ ({len(keys)} arquivo(s))")
+        return f"s3://{BUCKET}/{directory}/"
+    # a ordem das saídas da gold faz parte do resultado: não reordena
+    key = f"{prefix}/{name}.parquet"
+    s3.put_object(Bucket=BUCKET, Key=key, Body=parquet_layout.to_bytes(collected, name, sort_by=[]))
     print(f"✅ Escrito: {key}")
     return f"s3://{BUCKET}/{key}"
 
 
+@task
+def publish_quality_report() -> str:
+    return quality.publish(boto("s3"), BUCKET, "gold")
+
+
 @task
 def preprocess_reviews(df: pl.LazyFrame) -> pl.LazyFrame:
-    return df.rename({"id": "review_id", "album": "album_id"})
+    return df.rename(schemas.REVIEWS.renames)
 
 
 @task
-def create_top10_by_country(music: pl.LazyFrame, reviews: pl.LazyFrame) -> pl.LazyFrame:
-    reviews = preprocess_reviews(reviews)
-    return (
-        reviews.join(music, on="album_id", how="left")
-        .group_by(["country", "band_id", "band_name"])
-        .agg([
-            pl.count().alias("review_count"),
-            pl.mean("score").alias("avg_score")
-        ])
-        .sort(["country", "review_count"], descending=True)
-        .group_by("country")
-        .head(10)
-    )
+def count_silver_rows(dataset_name: str) -> int:
+    # pelo num_rows dos footers: nenhum column chunk é lido
+    return s3_scan.count_rows(partitioning.dataset_uris(boto("s3"), BUCKET, SILVER_PREFIX, dataset_name))
 
 
 @task
-def create_band_avg_scores(music: pl.LazyFrame, reviews: pl.LazyFrame) -> pl.LazyFrame:
-    reviews = preprocess_reviews(reviews)
+def load_gold_inputs(music: pl.LazyFrame, reviews: pl.LazyFrame) -> Tuple[pl.LazyFrame, pl.LazyFrame]:
+    """Coleta as duas entradas juntas, uma vez, só com as colunas que alguma saída usa."""
+    music_df, reviews_df = pl.collect_all([music.select(MUSIC_COLUMNS), reviews.select(REVIEW_COLUMNS)])
+    return music_df.lazy(), reviews_df.lazy()
+
+
+@task
+def create_band_scores(music: pl.LazyFrame, reviews: pl.LazyFrame) -> pl.LazyFrame:
+    """Join review × catálogo e agregados por banda, materializados uma vez para
+    ``top10_by_country``, ``band_avg_scores`` e ``brazilian_bands``."""
     return (
         reviews.join(music, on="album_id", how="left")
         .group_by(["band_id", "band_name", "country"])
         .agg([
-            pl.count().alias("review_count"),
+            pl.len().alias("review_count"),
             pl.mean("score").alias("avg_score"),
             pl.min("score").alias("min_score"),
             pl.max("score").alias("max_score"),
             pl.std("score").alias("std_score")
         ])
-        .sort("avg_score", descending=True)
+        .collect()
+        .lazy()
+    )
+
+
+@task(log_prints=True)
+def refresh_band_scores(run_id: int) -> pl.LazyFrame:
+    """``create_band_scores`` a partir do estado agregado, atualizado só com as
+    faixas de reviews que mudaram na silver (ver ``gold_state``)."""
+    return gold_state.refresh(boto("s3"), BUCKET, SILVER_PREFIX, run_id).lazy()
+
+
+@task
+def create_country_rankings(band_scores: pl.LazyFrame, k: int = ranking.TOP_K) -> pl.LazyFrame:
+    """Top-k de cada país por ``review_count``, ``avg_score`` e média bayesiana,
+    num único ``group_by`` (ver ``ranking``); materializado para as saídas derivadas."""
+    scores = ranking.with_bayesian(band_scores.select(["country", "band_id", "band_name", "review_count", "avg_score"]))
+    return ranking.top_k(scores, "country", ranking.RANKINGS, k).collect().lazy()
+
+
+@task
+def create_top10_by_country(rankings: pl.LazyFrame) -> pl.LazyFrame:
+    return (
+        rankings.filter(pl.col("metric") == "review_count")
+        .sort(["country", "rank"], descending=[True, False])
+        .select(["country", "band_id", "band_name", "review_count", "avg_score"])
     )
 
 
+@task
+def create_band_avg_scores(band_scores: pl.LazyFrame) -> pl.LazyFrame:
+    return band_scores.sort("avg_score", descending=True)
+
+
 @task
 def create_brazilian_bands(df: pl.LazyFrame) -> pl.LazyFrame:
     return (
-        df.with_columns([
+        df.filter(BRAZIL)
+        .with_columns([
             pl.col("country").str.to_lowercase().str.strip_chars().alias("country_normalized")
         ])
-        .filter(pl.col("country_normalized").is_in(["brazil", "brasil"]))
         .sort("avg_score", descending=True)
     )
 
@@ -126,44 +227,101 @@ def create_brazilian_bands(df: pl.LazyFrame) -> pl.LazyFrame:
 def create_band_album_counts(music: pl.LazyFrame) -> pl.LazyFrame:
     return (
         music.group_by(["band_id", "band_name", "country"])
-        .agg(pl.count().alias("album_count"))
+        .agg(pl.len().alias("album_count"))
         .sort("album_count", descending=True)
     )
 
 
+@task
+def create_full_dataset(albums: pl.LazyFrame, bands: pl.LazyFrame, reviews: pl.LazyFrame) -> pl.LazyFrame:
+    """Tabela larga banda × álbum × review, uma linha por review com álbum e banda (joins internos)."""
+    bands = (
+        bands.select([pl.col("id").alias("band"), "name", "country", "status", "formed_in"])
+        .filter(pl.col("name") != "None")
+    )
+    albums = albums.select([
+        pl.col("id").alias("album_id"), "band", pl.col("title").alias("title_album"), pl.col("year").alias("year_album"),
+    ])
+    reviews = (
+        reviews.select([pl.col("album").alias("album_id"), pl.col("title").alias("title_review"), "score", "content"])
+        .filter(pl.col("title_review") != "None")
+    )
+    return (
+        reviews.join(albums, on="album_id", how="inner", maintain_order="left")
+        .join(bands, on="band", how="inner", maintain_order="left")
+        .select(FULL_DATASET_COLUMNS)
+    )
+
+
 # ─── Flow Principal ─────────────────────────────────────────────────
 @flow(name="gold-transform-flow")
-def gold_flow() -> Dict[str, str]:
+def gold_flow(partitioned: bool = False, incremental: bool = False, top_k: int = ranking.TOP_K) -> Dict[str, str]:
+    """Gera a gold a partir de um único join review × catálogo e publica a versão em ``gold/_CURRENT`` no fim
+    (``incremental``: agregados do estado mesclável, ver ``gold_state``)."""
     print("\n🚀 Iniciando Gold Flow...")
 
     ensure_bucket()
-    clear_gold_prefix()
-
-    results = {}
-
-    try:
-        music = read_silver_lazy("music_catalog")
-        reviews = read_silver_lazy("reviews")
-    except Exception as e:
-        print(f"❌ Erro ao carregar arquivos da camada Silver: {e}")
-        return {}
-
-    if music.collect().is_empty() or reviews.collect().is_empty():
-        print("⚠️ Dados da camada Silver ausentes ou vazios.")
-        return {}
-
-    top10 = create_top10_by_country(music, reviews)
-    results["top10_by_country"] = write_gold_dataset(top10, "top10_by_country")
-
-    avg_scores = create_band_avg_scores(music, reviews)
-    results["band_avg_scores"] = write_gold_dataset(avg_scores, "band_avg_scores")
-
-    brazil = create_brazilian_bands(avg_scores)
-    results["brazilian_bands"] = write_gold_dataset(brazil, "brazilian_bands")
-
-    counts = create_band_album_counts(music)
-    results["band_album_counts"] = write_gold_dataset(counts, "band_album_counts")
-
+    run_id = gold_publish.new_run_id()
+    staging = gold_publish.run_prefix(GOLD_PREFIX, run_id)
+
+    # saídas cujas entradas da silver e código não mudaram vêm da versão anterior
+    fingerprints = fingerprint_outputs(partitioned, top_k)
+    cached = lookup_cached_outputs(fingerprints)
+    pending = [name for name in fingerprints if name not in cached]
+    scored = bool(set(pending) & set(SCORED_OUTPUTS))
+
+    written = {}
+    if pending:
+        try:
+            empty = count_silver_rows("music_catalog") == 0 or count_silver_rows("reviews") == 0
+            music = read_silver_lazy("music_catalog")
+            # no modo incremental as reviews só são lidas pelo estado (faixas alteradas)
+            reviews = preprocess_reviews(read_silver_lazy("reviews")) if scored and not incremental else None
+        except Exception as e:
+            print(f"❌ Erro ao carregar arquivos da camada Silver: {e}")
+            return {}
+
+        if empty:
+            print("⚠️ Dados da camada Silver ausentes ou vazios.")
+            return {}
+
+        if not scored:
+            music = music.select(MUSIC_COLUMNS)
+        elif incremental:
+            band_scores = refresh_band_scores(run_id)
+            music = music.select(MUSIC_COLUMNS)
+        else:
+            music, reviews = load_gold_inputs(music, reviews)
+            band_scores = create_band_scores(music, reviews)
+
+        outputs = {}
+        if {"top10_by_country", "country_rankings"} & set(pending):
+            rankings = create_country_rankings(band_scores, top_k)
+            outputs["top10_by_country"] = create_top10_by_country(rankings)
+            outputs["country_rankings"] = rankings
+        if {"band_avg_scores", "brazilian_bands"} & set(pending):
+            avg_scores = create_band_avg_scores(band_scores)
+            outputs["band_avg_scores"] = avg_scores
+            outputs["brazilian_bands"] = create_brazilian_bands(avg_scores)
+        if "band_album_counts" in pending:
+            outputs["band_album_counts"] = create_band_album_counts(music)
+        if "full_dataset" in pending:
+            # plano próprio: projeção e filtros descem até a leitura da silver
+            outputs["full_dataset"] = create_full_dataset(
+                read_silver_lazy("albums"), read_silver_lazy("bands"), read_silver_lazy("reviews"),
+            )
+        for name in pending:
+            written[name] = write_gold_dataset(outputs[name], name, partitioned, staging)
+
+    results = {name: cached.get(name) or written[name] for name in fingerprints}
+    publish_gold(run_id, results)
+    remember_outputs(fingerprints, written)
+    collect_gold_garbage()
+    publish_quality_report()
+
+    s3_scan.log_scan_stats()
+    aws_clients.log_client_stats()
+    result_cache.log_cache_stats()
     return results
 
 
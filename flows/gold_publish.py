@@ -0,0 +1,125 @@
+"""Publicação atômica da gold: cada execução grava em ``gold/_runs/<run_id>/`` e troca o ponteiro ``gold/_CURRENT`` no fim."""
+from __future__ import annotations
+
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+import polars as pl
+
+import partitioning
+import silver_merge
+from state_store import load_json, save_json
+
+POINTER = "_CURRENT"
+RUNS = "_runs"
+KEEP_VERSIONS = int(os.getenv("GOLD_KEEP_VERSIONS", "2"))
+
+_cache: Dict[Tuple[str, str], Optional[dict]] = {}
+
+
+def pointer_key(prefix: str) -> str:
+    return f"{prefix}/{POINTER}"
+
+
+def new_run_id() -> int:
+    """Nanossegundos desde a época: duas execuções no mesmo segundo não colidem e a ordem continua numérica."""
+    return time.time_ns()
+
+
+def run_prefix(prefix: str, run_id: int) -> str:
+    return f"{prefix}/{RUNS}/{run_id}"
+
+
+def _run_id(prefix: str, key: str) -> Optional[int]:
+    """``run_id`` de uma chave de ``prefix/_runs/<run_id>/...``; ``None`` fora das versões."""
+    head = f"{prefix}/{RUNS}/"
+    if not key.startswith(head):
+        return None
+    run = key[len(head):].split("/", 1)[0]
+    return int(run) if run.isdigit() else None
+
+
+def referenced_runs(prefix: str, outputs: Dict[str, str]) -> List[int]:
+    """Execuções cujos arquivos as saídas ``outputs`` (nome → URI) usam."""
+    runs = {_run_id(prefix, uri.split("/", 3)[-1]) for uri in outputs.values()}
+    return sorted(run for run in runs if run is not None)
+
+
+def load(s3, bucket: str, prefix: str) -> Optional[dict]:
+    return load_json(s3, bucket, pointer_key(prefix), None)
+
+
+def resolve(s3, bucket: str, prefix: str, refresh: bool = False) -> Optional[dict]:
+    """Ponteiro da versão publicada, lido do S3 uma vez por processo."""
+    if refresh or (bucket, prefix) not in _cache:
+        _cache[(bucket, prefix)] = load(s3, bucket, prefix)
+    return _cache[(bucket, prefix)]
+
+
+def publish(s3, bucket: str, prefix: str, run_id: int, outputs: Dict[str, str]) -> Optional[dict]:
+    """Aponta ``_CURRENT`` para a versão ``run_id``; se uma execução mais nova já publicou, devolve ``None``."""
+    current = load(s3, bucket, prefix)
+    if current is not None and current["run_id"] > run_id:
+        return None
+    outputs = {name: uri for name, uri in outputs.items() if uri}
+    # execuções usadas por cada versão anterior mantida (ponteiros sem ``runs``
+    # guardavam só o run_id de cada versão)
+    history = [] if current is None else [
+        runs if isinstance(runs, list) else [runs]
+        for runs in [current.get("runs", current["run_id"]), *current.get("history", [])]
+    ]
+    pointer = {
+        "run_id": run_id,
+        "prefix": run_prefix(prefix, run_id),
+        "published_at": time.time(),
+        "outputs": outputs,
+        "runs": referenced_runs(prefix, outputs),
+        "history": history[:max(KEEP_VERSIONS - 1, 0)],
+    }
+    save_json(s3, bucket, pointer_key(prefix), pointer)
+    _cache[(bucket, prefix)] = pointer
+    return pointer
+
+
+def dataset_uris(
+    s3,
+    bucket: str,
+    prefix: str,
+    name: str,
+    predicate: Optional[pl.Expr] = None,
+    refresh: bool = False,
+) -> List[str]:
+    """Arquivos de ``name`` na versão publicada (``[]`` sem versão ou sem a saída);
+    numa saída particionada, só as partições que podem satisfazer ``predicate``."""
+    pointer = resolve(s3, bucket, prefix, refresh)
+    uri = (pointer or {}).get("outputs", {}).get(name)
+    if not uri:
+        return []
+    if uri.endswith(".parquet"):
+        return [uri]
+    # a saída pode ser de uma execução anterior (reaproveitada pelo cache)
+    version = uri.split("/", 3)[-1].rstrip("/").rsplit("/", 1)[0]
+    return partitioning.dataset_uris(s3, bucket, version, name, predicate)
+
+
+def collect_garbage(s3, bucket: str, prefix: str) -> Tuple[int, int]:
+    """Apaga de ``prefix/`` o que nenhuma versão mantida usa.
+
+    Devolve (objetos apagados, requisições ``delete_objects``)."""
+    pointer = load(s3, bucket, prefix)
+    if pointer is None:
+        return 0, 0
+    keep = {pointer["run_id"], *pointer["runs"], *(run for runs in pointer.get("history", []) for run in runs)}
+    stale = []
+    for page in s3.get_paginator("list_objects_v2").paginate(Bucket=bucket, Prefix=f"{prefix}/"):
+        for obj in page.get("Contents", []):
+            key = obj["Key"]
+            if key == pointer_key(prefix):
+                continue
+            run = _run_id(prefix, key)
+            if run is not None and (run in keep or run > pointer["run_id"]):
+                continue
+            stale.append(key)
+    silver_merge.delete_keys(s3, bucket, stale)
+    return len(stale), -(-len(stale) // 1000)
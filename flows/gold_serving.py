@@ -0,0 +1,273 @@
+"""Consultas de baixa latência sobre a gold publicada, em processo e somente leitura, sobre arquivos Arrow IPC
+mapeados em memória (``python flows/gold_serving.py [chamadores] [consultas]`` mede p50/p99)."""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, fields
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import polars as pl
+import pyarrow as pa
+
+import aws_clients
+import gold_publish
+import partitioning
+import result_cache
+import s3_scan
+import schemas
+
+BUCKET = "csv-batch-bucket"
+GOLD_PREFIX = "gold"
+SILVER_PREFIX = "silver"
+SERVING_DIR = Path(os.getenv("GOLD_SERVING_DIR", Path(tempfile.gettempdir()) / "gold_serving"))
+POLL_S = float(os.getenv("GOLD_SERVING_POLL_S", "30"))
+
+GOLD_DATASETS = ["band_avg_scores", "top10_by_country", "band_album_counts"]
+# saída vazia não é publicada pela gold: serve uma tabela vazia com as colunas consultadas
+BAND_KEYS = {"band_id": pl.Int64, "band_name": pl.String, "country": pl.String}
+EMPTY_SCHEMAS: Dict[str, Dict[str, pl.DataType]] = {
+    "band_avg_scores": {
+        **BAND_KEYS, "review_count": pl.UInt32, "avg_score": pl.Float64,
+        "min_score": pl.Float64, "max_score": pl.Float64, "std_score": pl.Float64,
+    },
+    "top10_by_country": {**BAND_KEYS, "review_count": pl.UInt32, "avg_score": pl.Float64},
+    "band_album_counts": {**BAND_KEYS, "album_count": pl.UInt32},
+    "music_catalog": schemas.MUSIC_CATALOG.polars_schema(),
+}
+
+
+@dataclass(frozen=True)
+class BandStats:
+    band_id: int
+    band_name: Optional[str]
+    country: Optional[str]
+    review_count: int
+    avg_score: Optional[float]
+    min_score: Optional[float]
+    max_score: Optional[float]
+    std_score: Optional[float]
+    album_count: Optional[int]
+
+
+@dataclass(frozen=True)
+class RankedBand:
+    rank: int
+    band_id: Optional[int]
+    band_name: Optional[str]
+    review_count: int
+    avg_score: Optional[float]
+
+
+@dataclass(frozen=True)
+class Album:
+    album_id: int
+    album_title: Optional[str]
+    year: Optional[int]
+    band_id: Optional[int]
+    band_name: Optional[str]
+    country: Optional[str]
+    genre: Optional[str]
+    theme: Optional[str]
+
+
+# ─── Carga ──────────────────────────────────────────────────────────
+def _write_ipc(path: Path, df: pl.DataFrame) -> None:
+    table = df.to_arrow().combine_chunks()
+    tmp = path.with_suffix(".tmp")
+    with pa.OSFile(str(tmp), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp, path)
+
+
+def _map(path: Path) -> Dict[str, pa.Array]:
+    """Colunas do arquivo IPC por memory map (um único record batch, sem cópia)."""
+    table = pa.ipc.open_file(pa.memory_map(str(path), "r")).read_all()
+    return {name: (column.chunk(0) if column.num_chunks else pa.array([], column.type))
+            for name, column in zip(table.column_names, table.columns)}
+
+
+def _hash_index(array: pa.Array) -> Dict[Any, List[int]]:
+    """Valor → linhas, na ordem do arquivo."""
+    groups = (
+        pl.DataFrame({"key": pl.from_arrow(array)})
+        .with_row_index("row")
+        .group_by("key", maintain_order=True)
+        .agg("row")
+    )
+    return dict(zip(groups["key"].to_list(), groups["row"].to_list()))
+
+
+class Snapshot:
+    """Uma versão carregada: colunas mapeadas e índices."""
+
+    def __init__(self, version: str, columns: Dict[str, Dict[str, pa.Array]]):
+        self.version = version
+        self.columns = columns
+        self.band_rows = _hash_index(columns["band_avg_scores"]["band_id"])
+        self.album_count_rows = _hash_index(columns["band_album_counts"]["band_id"])
+        self.country_rows = _hash_index(columns["top10_by_country"]["country"])
+        self.catalog_band_rows = _hash_index(columns["music_catalog"]["band_id"])
+        album_ids = columns["music_catalog"]["album_id"]
+        # nulos ficam no fim (parquet_layout): a busca binária só vê a parte preenchida
+        self.album_ids = album_ids.to_numpy(zero_copy_only=False)[:len(album_ids) - album_ids.null_count]
+
+    def row(self, dataset: str, cls, i: int, **extra):
+        cols = self.columns[dataset]
+        return cls(**{f.name: cols[f.name][i].as_py() for f in fields(cls) if f.name in cols}, **extra)
+
+
+def version(s3, bucket: str = BUCKET) -> str:
+    """Versão servível: ponteiro da gold + arquivos do ``music_catalog``."""
+    pointer = gold_publish.resolve(s3, bucket, GOLD_PREFIX, refresh=True)
+    if pointer is None:
+        raise FileNotFoundError("❌ Nenhuma versão da gold publicada")
+    catalog = result_cache.listing(s3, f"s3://{bucket}/{SILVER_PREFIX}/music_catalog/")
+    digest = hashlib.sha256(json.dumps(catalog, sort_keys=True).encode()).hexdigest()[:12]
+    return f"{pointer['run_id']}-{digest}"
+
+
+def load(s3, bucket: str, version_id: str, directory: Path = SERVING_DIR) -> Snapshot:
+    target = directory / version_id
+    target.mkdir(parents=True, exist_ok=True)
+    sources = {name: gold_publish.dataset_uris(s3, bucket, GOLD_PREFIX, name) for name in GOLD_DATASETS}
+    sources["music_catalog"] = partitioning.dataset_uris(s3, bucket, SILVER_PREFIX, "music_catalog")
+    columns = {}
+    for name, uris in sources.items():
+        path = target / f"{name}.arrow"
+        if not path.exists():
+            if uris:
+                df = s3_scan.scan_parquet(uris).collect()
+            else:
+                print(f"⚠️ gold_serving: {name} vazio ou não publicado na versão {version_id}")
+                df = pl.DataFrame(schema=EMPTY_SCHEMAS[name])
+            if name == "music_catalog":
+                df = df.sort("album_id", nulls_last=True, maintain_order=True)
+            _write_ipc(path, df)
+        columns[name] = _map(path)
+    return Snapshot(version_id, columns)
+
+
+# ─── Serviço ────────────────────────────────────────────────────────
+class GoldService:
+    def __init__(self, bucket: str = BUCKET, directory: Path = SERVING_DIR):
+        self.bucket = bucket
+        self.directory = Path(directory)
+        self._snapshot: Optional[Snapshot] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.refresh()
+
+    @property
+    def version(self) -> str:
+        return self._snapshot.version
+
+    def refresh(self) -> bool:
+        """Recarrega se a versão mudou; devolve se recarregou."""
+        with self._lock:
+            s3 = aws_clients.client("s3")
+            current = version(s3, self.bucket)
+            if self._snapshot is not None and self._snapshot.version == current:
+                return False
+            self._snapshot = load(s3, self.bucket, current, self.directory)
+            # versões antigas: consultas em andamento mantêm o mapeamento (Linux/macOS)
+            for old in self.directory.iterdir():
+                if old.is_dir() and old.name != current:
+                    shutil.rmtree(old, ignore_errors=True)
+            return True
+
+    def start(self, poll_s: float = POLL_S) -> threading.Thread:
+        """Thread que chama ``refresh`` a cada ``poll_s`` segundos."""
+        def loop():
+            while not self._stop.wait(poll_s):
+                try:
+                    if self.refresh():
+                        print(f"🔄 gold_serving: versão {self.version} carregada")
+                except Exception as e:
+                    print(f"❌ gold_serving: falha ao recarregar: {e}")
+
+        thread = threading.Thread(target=loop, name="gold-serving-reload", daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    # ─── Consultas ──────────────────────────────────────────────────
+    def band_stats(self, band_id: int) -> Optional[BandStats]:
+        snap = self._snapshot
+        rows = snap.band_rows.get(band_id)
+        if not rows:
+            return None
+        counts = snap.album_count_rows.get(band_id)
+        album_count = snap.columns["band_album_counts"]["album_count"][counts[0]].as_py() if counts else None
+        return snap.row("band_avg_scores", BandStats, rows[0], album_count=album_count)
+
+    def top_bands(self, country: str, k: int = 10) -> List[RankedBand]:
+        snap = self._snapshot
+        rows = snap.country_rows.get(country, [])[:k]
+        return [snap.row("top10_by_country", RankedBand, i, rank=rank) for rank, i in enumerate(rows, 1)]
+
+    def albums_of_band(self, band_id: int) -> List[Album]:
+        snap = self._snapshot
+        return [snap.row("music_catalog", Album, i) for i in snap.catalog_band_rows.get(band_id, [])]
+
+    def album(self, album_id: int) -> Optional[Album]:
+        snap = self._snapshot
+        i = int(np.searchsorted(snap.album_ids, album_id))
+        if i == len(snap.album_ids) or snap.album_ids[i] != album_id:
+            return None
+        return snap.row("music_catalog", Album, i)
+
+
+# ─── Benchmark ──────────────────────────────────────────────────────
+def _percentiles(latencies_ns: List[int]) -> Tuple[float, float]:
+    p50, p99 = np.percentile(np.array(latencies_ns) / 1000, [50, 99])
+    return float(p50), float(p99)
+
+
+def benchmark(service: GoldService, callers: int = 8, queries: int = 20000, log=print) -> None:
+    snap = service._snapshot
+    rng = random.Random(0)
+    band_ids = [b for b in snap.band_rows if b is not None]
+    countries = [c for c in snap.country_rows if c is not None]
+    album_ids = snap.album_ids.tolist()
+    ops = {
+        "band_stats": lambda: service.band_stats(rng.choice(band_ids)),
+        "top_bands": lambda: service.top_bands(rng.choice(countries)),
+        "albums_of_band": lambda: service.albums_of_band(rng.choice(band_ids)),
+        "album": lambda: service.album(rng.choice(album_ids)),
+    }
+
+    def timed(op):
+        start = time.perf_counter_ns()
+        op()
+        return time.perf_counter_ns() - start
+
+    for name, op in ops.items():
+        with ThreadPoolExecutor(callers) as pool:
+            latencies = list(pool.map(lambda _: timed(op), range(queries)))
+        p50, p99 = _percentiles(latencies)
+        log(f"⏱️ {name}: p50 {p50:.1f} µs, p99 {p99:.1f} µs ({queries} consultas, {callers} chamador(es))")
+
+
+if __name__ == "__main__":
+    import sys
+
+    start = time.perf_counter()
+    gold = GoldService()
+    print(f"📦 versão {gold.version} carregada em {1000 * (time.perf_counter() - start):.0f} ms")
+    benchmark(
+        gold,
+        callers=int(sys.argv[1]) if len(sys.argv) > 1 else 8,
+        queries=int(sys.argv[2]) if len(sys.argv) > 2 else 20000,
+    )
@@ -0,0 +1,300 @@
+"""Estado agregado por banda (contagem, soma, soma dos quadrados, min e max), mesclável, para a gold incremental;
+só as faixas de reviews alteradas na silver são relidas."""
+from __future__ import annotations
+
+import sys
+from typing import Dict, List, Optional, Tuple
+
+import polars as pl
+
+import parquet_layout
+import partitioning
+import result_cache
+import s3_scan
+import silver_merge
+from state_store import load_json, save_json
+
+STATE_PREFIX = "state/gold_scores"
+MANIFEST_KEY = f"{STATE_PREFIX}/_manifest.json"
+KEYS = ["band_id", "band_name", "country"]
+REVIEW_COLUMNS = ["id", "album", "score"]  # colunas lidas da silver de reviews
+CONTRIB_COLUMNS = ["review_id", "album_id", "score"]
+
+
+def _put(s3, bucket: str, key: str, df: pl.DataFrame) -> None:
+    # por banda: nomes/países em sequência comprimem bem e o recálculo de
+    # extremos pula row groups pelo min/max de band_id
+    s3.put_object(Bucket=bucket, Key=key, Body=parquet_layout.to_bytes(df, "", sort_by=["band_id", "review_id"]))
+
+
+def _read(uris: List[str], columns: Optional[List[str]] = None) -> pl.DataFrame:
+    lf = s3_scan.scan_parquet(uris)
+    return (lf if columns is None else lf.select(columns)).collect()
+
+
+def _partition_files(s3, bucket: str, prefix: str, dataset: str) -> Optional[Dict[str, str]]:
+    manifest = load_json(s3, bucket, silver_merge.manifest_key(prefix, dataset), None)
+    return None if manifest is None else {start: p["file"] for start, p in manifest["partitions"].items()}
+
+
+def _catalog_version(s3, bucket: str, prefix: str) -> Dict[str, str]:
+    """Arquivos do ``music_catalog`` (chave → ETag), em qualquer layout."""
+    return silver_merge.list_sources(s3, f"s3://{bucket}/{prefix}/music_catalog/")
+
+
+# ─── Agregados ──────────────────────────────────────────────────────
+def aggregate(contrib: pl.DataFrame, sign: int = 1) -> pl.DataFrame:
+    """Estado das linhas de ``contrib``; ``sign=-1`` gera a retratação (sem min/max)."""
+    score = pl.col("score")
+    extremes = [score.min().alias("score_min"), score.max().alias("score_max")]
+    if sign < 0:
+        extremes = [pl.lit(None, pl.Float64).alias("score_min"), pl.lit(None, pl.Float64).alias("score_max")]
+    return contrib.group_by(KEYS).agg([
+        (pl.len().cast(pl.Int64) * sign).alias("review_count"),
+        (score.count().cast(pl.Int64) * sign).alias("score_count"),
+        (score.sum() * sign).alias("score_sum"),
+        ((score * score).sum() * sign).alias("score_sumsq"),
+        *extremes,
+    ])
+
+
+def combine(states: List[pl.DataFrame]) -> pl.DataFrame:
+    """Junta estados parciais (e retratações) das mesmas bandas."""
+    return (
+        pl.concat(states, how="vertical_relaxed")
+        .group_by(KEYS)
+        .agg([
+            pl.col("review_count").sum(),
+            pl.col("score_count").sum(),
+            pl.col("score_sum").sum(),
+            pl.col("score_sumsq").sum(),
+            pl.col("score_min").min(),
+            pl.col("score_max").max(),
+        ])
+        .filter(pl.col("review_count") > 0)
+    )
+
+
+def merge(state: pl.DataFrame, added: pl.DataFrame, removed: pl.DataFrame) -> Tuple[pl.DataFrame, pl.DataFrame]:
+    """Soma ``added`` e subtrai ``removed`` de ``state``; devolve o estado e as bandas cujo min/max precisa ser recalculado."""
+    merged = combine([state, aggregate(added), aggregate(removed, -1)])
+    extremes = removed.group_by(KEYS).agg(pl.col("score").min().alias("low"), pl.col("score").max().alias("high"))
+    dirty = (
+        extremes.join(state.select([*KEYS, "score_min", "score_max"]), on=KEYS, nulls_equal=True)
+        .filter((pl.col("low") <= pl.col("score_min")) | (pl.col("high") >= pl.col("score_max")))
+        .select(KEYS)
+    )
+    return merged, dirty
+
+
+def fix_extremes(state: pl.DataFrame, dirty: pl.DataFrame, contrib: pl.DataFrame) -> pl.DataFrame:
+    """Recalcula min/max das bandas em ``dirty`` a partir das contribuições atuais."""
+    if dirty.is_empty():
+        return state
+    fixed = (
+        contrib.join(dirty, on=KEYS, how="semi", nulls_equal=True)
+        .group_by(KEYS)
+        .agg(pl.col("score").min().alias("score_min"), pl.col("score").max().alias("score_max"))
+        .with_columns(pl.lit(True).alias("_fixed"))
+    )
+    return (
+        state.join(fixed, on=KEYS, how="left", nulls_equal=True, suffix="_fixed")
+        .with_columns([
+            pl.when(pl.col("_fixed")).then(pl.col(f"{c}_fixed")).otherwise(pl.col(c)).alias(c)
+            for c in ("score_min", "score_max")
+        ])
+        .drop(["score_min_fixed", "score_max_fixed", "_fixed"])
+    )
+
+
+def band_scores(state: pl.DataFrame) -> pl.DataFrame:
+    """Mesmas colunas de ``gold.create_band_scores``, derivadas do estado."""
+    n = pl.col("score_count")
+    variance = (pl.col("score_sumsq") - pl.col("score_sum") ** 2 / n) / (n - 1)
+    return state.select([
+        *KEYS,
+        pl.col("review_count").cast(pl.UInt32),
+        pl.when(n > 0).then(pl.col("score_sum") / n).alias("avg_score"),
+        pl.col("score_min").alias("min_score"),
+        pl.col("score_max").alias("max_score"),
+        pl.when(n > 1).then(variance.clip(lower_bound=0).sqrt()).alias("std_score"),
+    ])
+
+
+# ─── Atualização ────────────────────────────────────────────────────
+def attribute(reviews: pl.DataFrame, catalog: pl.DataFrame) -> pl.DataFrame:
+    """Contribuições: cada review com a banda do seu álbum (``left``, como na gold)."""
+    reviews = reviews.select(pl.col("id").alias("review_id"), pl.col("album").alias("album_id"), "score")
+    return reviews.join(catalog.select(["album_id", *KEYS]), on="album_id", how="left")
+
+
+def _catalog(s3, bucket: str, prefix: str, album_ids: Optional[pl.Series] = None) -> pl.DataFrame:
+    columns = ["album_id", *KEYS]
+    uris = silver_merge.current_uris(s3, bucket, prefix, "music_catalog", album_ids)
+    if uris is None:
+        uris = partitioning.dataset_uris(s3, bucket, prefix, "music_catalog")
+    if not uris:
+        return pl.DataFrame(schema={"album_id": pl.Int64, "band_id": pl.Int64, "band_name": pl.String, "country": pl.String})
+    lf = s3_scan.scan_parquet(uris).select(columns)
+    return (lf if album_ids is None else lf.filter(pl.col("album_id").is_in(album_ids.to_list()))).collect()
+
+
+def _contrib_key(start: str, run_id: int) -> str:
+    return f"{STATE_PREFIX}/contrib/range={start}/part-{run_id}.parquet"
+
+
+def _catalog_key(run_id: int) -> str:
+    return f"{STATE_PREFIX}/catalog/part-{run_id}.parquet"
+
+
+def code_version() -> str:
+    """Hash deste módulo: mudança de código (ou das colunas do estado) pede reconstrução."""
+    return result_cache.code_hash(sys.modules[__name__])
+
+
+def rebuild(s3, bucket: str, prefix: str, run_id: int, reviews_files: Dict[str, str], catalog_files) -> pl.DataFrame:
+    """Reconstrói estado e contribuições a partir de todas as reviews da silver."""
+    catalog = _catalog(s3, bucket, prefix)
+    _put(s3, bucket, _catalog_key(run_id), catalog)
+    contrib_files = {}
+    states = [_empty_state()]
+    for start, file in sorted(reviews_files.items(), key=lambda i: int(i[0])):
+        contrib = attribute(_read([f"s3://{bucket}/{file}"], REVIEW_COLUMNS), catalog)
+        contrib_files[start] = _contrib_key(start, run_id)
+        _put(s3, bucket, contrib_files[start], contrib)
+        states.append(aggregate(contrib))
+    state = combine(states)
+    _save(s3, bucket, run_id, state, reviews_files, catalog_files, _catalog_key(run_id), contrib_files)
+    return state
+
+
+def _empty_contrib() -> pl.DataFrame:
+    return pl.DataFrame(schema={
+        "review_id": pl.Int64, "album_id": pl.Int64, "score": pl.Float64,
+        "band_id": pl.Int64, "band_name": pl.String, "country": pl.String,
+    })
+
+
+def _empty_state() -> pl.DataFrame:
+    return aggregate(_empty_contrib())
+
+
+def _save(s3, bucket: str, run_id: int, state: pl.DataFrame, reviews_files, catalog_files, catalog_map, contrib_files) -> None:
+    previous = load_json(s3, bucket, MANIFEST_KEY, None)
+    state_key = f"{STATE_PREFIX}/bands/part-{run_id}.parquet"
+    _put(s3, bucket, state_key, state)
+    save_json(s3, bucket, MANIFEST_KEY, {
+        "run_id": run_id,
+        "code": code_version(),
+        "state": state_key,
+        "reviews": reviews_files,
+        "catalog": catalog_files,
+        "catalog_map": catalog_map,
+        "contrib": contrib_files,
+    })
+    if previous:
+        current = {state_key, catalog_map, *contrib_files.values()}
+        old = (previous["state"], previous.get("catalog_map"), *previous["contrib"].values())
+        silver_merge.delete_keys(s3, bucket, [k for k in old if k and k not in current])
+
+
+def reattribute(s3, bucket: str, prefix: str, manifest: dict, contrib_files: Dict[str, str], run_id: int):
+    """Move para a banda nova as contribuições dos álbuns cuja banda/país mudou no ``music_catalog``.
+
+    Devolve (retratações, adições) e reescreve só os arquivos de contribuição afetados."""
+    old_map = _read([f"s3://{bucket}/{manifest['catalog_map']}"])
+    new_map = _catalog(s3, bucket, prefix)
+    _put(s3, bucket, _catalog_key(run_id), new_map)
+    moved = (
+        old_map.join(new_map, on="album_id", how="full", coalesce=True, suffix="_new")
+        .filter(pl.any_horizontal(pl.col(k).ne_missing(pl.col(f"{k}_new")) for k in KEYS))
+    )
+    if moved.is_empty():
+        return _empty_contrib(), _empty_contrib()
+    # contribuições ficam ordenadas por band_id: o filtro pela banda antiga pula row groups
+    old_bands = moved["band_id"].drop_nulls().unique().to_list()
+    wanted = (pl.col("band_id").is_in(old_bands) | pl.col("band_id").is_null()) & pl.col("album_id").is_in(moved["album_id"].to_list())
+    removed_all, added_all = [], []
+    for start, key in sorted(contrib_files.items(), key=lambda i: int(i[0])):
+        hit = s3_scan.scan_parquet(f"s3://{bucket}/{key}").filter(wanted).collect()
+        if hit.is_empty():
+            continue
+        added = attribute(hit.select(pl.col("review_id").alias("id"), pl.col("album_id").alias("album"), "score"), new_map)
+        contrib = pl.concat(
+            [_read([f"s3://{bucket}/{key}"]).join(hit.select("review_id"), on="review_id", how="anti"), added.select(hit.columns)],
+            how="vertical_relaxed",
+        )
+        contrib_files[start] = _contrib_key(start, run_id)
+        _put(s3, bucket, contrib_files[start], contrib)
+        removed_all.append(hit)
+        added_all.append(added.select(hit.columns))
+    if not removed_all:
+        return _empty_contrib(), _empty_contrib()
+    return pl.concat(removed_all, how="vertical_relaxed"), pl.concat(added_all, how="vertical_relaxed")
+
+
+def refresh(s3, bucket: str, prefix: str, run_id: int, log=print) -> pl.DataFrame:
+    """Atualiza o estado com as faixas de reviews alteradas na silver e devolve ``band_scores``."""
+    reviews_files = _partition_files(s3, bucket, prefix, "reviews")
+    if reviews_files is None:
+        # silver sem MERGE: não há faixas para comparar, agrega tudo sem guardar estado
+        log("📐 Estado da gold: silver de reviews não é incremental, agregando tudo")
+        reviews = s3_scan.scan_parquet(partitioning.dataset_uris(s3, bucket, prefix, "reviews")).select(REVIEW_COLUMNS)
+        return band_scores(aggregate(attribute(reviews.collect(), _catalog(s3, bucket, prefix))))
+
+    catalog_files = _catalog_version(s3, bucket, prefix)
+    manifest = load_json(s3, bucket, MANIFEST_KEY, None)
+    if manifest is None or manifest.get("code") != code_version() or not manifest.get("catalog_map"):
+        log("📐 Estado da gold: reconstrução completa (sem estado ou código alterado)")
+        return band_scores(rebuild(s3, bucket, prefix, run_id, reviews_files, catalog_files))
+
+    changed = sorted((s for s, f in reviews_files.items() if manifest["reviews"].get(s) != f), key=int)
+    catalog_changed = manifest["catalog"] != catalog_files
+    state = _read([f"s3://{bucket}/{manifest['state']}"])
+    if not changed and not catalog_changed:
+        log("📐 Estado da gold: nenhuma faixa de reviews alterada")
+        return band_scores(state)
+
+    contrib_files = dict(manifest["contrib"])
+    removed_all, added_all, contribs = [_empty_contrib()], [_empty_contrib()], []
+    catalog_map = manifest["catalog_map"]
+    if catalog_changed:
+        removed, added = reattribute(s3, bucket, prefix, manifest, contrib_files, run_id)
+        removed_all.append(removed)
+        added_all.append(added)
+        catalog_map = _catalog_key(run_id)
+        log(f"📐 Estado da gold: catálogo alterado, {added.height} contribuição(ões) reatribuída(s)")
+
+    for start in changed:
+        new = _read([f"s3://{bucket}/{reviews_files[start]}"], REVIEW_COLUMNS).select(
+            pl.col("id").alias("review_id"), pl.col("album").alias("album_id"), "score"
+        )
+        old = _read([f"s3://{bucket}/{contrib_files[start]}"]) if start in contrib_files else _empty_contrib()
+        # linhas idênticas não mudam nada; o resto é retratação (versão antiga) e adição (nova)
+        removed = old.join(new, on=CONTRIB_COLUMNS, how="anti", nulls_equal=True)
+        added = new.join(old.select(CONTRIB_COLUMNS), on=CONTRIB_COLUMNS, how="anti", nulls_equal=True)
+        added = added.join(_catalog(s3, bucket, prefix, added["album_id"].unique()), on="album_id", how="left")
+        contrib = pl.concat(
+            [old.join(removed.select("review_id"), on="review_id", how="anti"), added.select(old.columns)],
+            how="vertical_relaxed",
+        )
+        contrib_files[start] = _contrib_key(start, run_id)
+        _put(s3, bucket, contrib_files[start], contrib)
+        added_all.append(added.select(old.columns))
+        removed_all.append(removed)
+        contribs.append(contrib)
+
+    added, removed = pl.concat(added_all, how="vertical_relaxed"), pl.concat(removed_all, how="vertical_relaxed")
+    state, dirty = merge(state, added, removed)
+    if not dirty.is_empty():
+        # o extremo retirado pode estar em qualquer faixa da banda: relê as contribuições (colunas estreitas)
+        uris = [f"s3://{bucket}/{k}" for s, k in contrib_files.items() if s not in changed]
+        wanted = pl.col("band_id").is_in(dirty["band_id"].drop_nulls().to_list()) | pl.col("band_id").is_null()
+        others = s3_scan.scan_parquet(uris).filter(wanted).collect() if uris else _empty_contrib()
+        state = fix_extremes(state, dirty, pl.concat([others, *contribs], how="vertical_relaxed"))
+    log(
+        f"📐 Estado da gold: {len(changed)} faixa(s), +{added.height}/-{removed.height} contribuição(ões), "
+        f"{dirty.height} extremo(s) recalculado(s)"
+    )
+    _save(s3, bucket, run_id, state, reviews_files, catalog_files, catalog_map, contrib_files)
+    return band_scores(state)
@@ -0,0 +1,183 @@
+"""Producer Kinesis em lote para a landing: ``put_records`` espalhado pelos shards, com reenvio e backoff."""
+from __future__ import annotations
+
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional
+
+from botocore.exceptions import ClientError
+
+MAX_BATCH_RECORDS = 500
+MAX_BATCH_BYTES = 5 * 1024 * 1024
+MAX_RECORD_BYTES = 1024 * 1024
+THROTTLE_CODE = "ProvisionedThroughputExceededException"
+
+
+@dataclass
+class ProducerStats:
+    stream: str
+    records: int = 0
+    bytes: int = 0
+    requests: int = 0
+    retried_records: int = 0
+    throttled_requests: int = 0
+    elapsed_s: float = 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        out = asdict(self)
+        elapsed = self.elapsed_s or 1e-9
+        out["records_per_s"] = round(self.records / elapsed, 1)
+        out["bytes_per_s"] = round(self.bytes / elapsed, 1)
+        return out
+
+
+def shard_hash_keys(kin, stream: str) -> List[str]:
+    """Um ``ExplicitHashKey`` (meio do range) por shard aberto do stream."""
+    keys: List[str] = []
+    kwargs = {"StreamName": stream}
+    while True:
+        resp = kin.list_shards(**kwargs)
+        for shard in resp.get("Shards", []):
+            if "EndingSequenceNumber" in shard.get("SequenceNumberRange", {}):
+                continue
+            rng = shard["HashKeyRange"]
+            start, end = int(rng["StartingHashKey"]), int(rng["EndingHashKey"])
+            keys.append(str((start + end) // 2))
+        token = resp.get("NextToken")
+        if not token:
+            return keys or ["0"]
+        kwargs = {"NextToken": token}
+
+
+class KinesisProducer:
+    """Envia registros em lotes ``put_records``, com até ``max_in_flight`` (padrão: nº de shards) em paralelo."""
+
+    def __init__(
+        self,
+        kin,
+        stream: str,
+        partition_prefix: str,
+        max_in_flight: Optional[int] = None,
+        max_attempts: int = 8,
+        base_delay: float = 0.05,
+        max_delay: float = 5.0,
+    ):
+        self.kin = kin
+        self.stream = stream
+        self.partition_prefix = partition_prefix
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.stats = ProducerStats(stream)
+
+        self._hash_keys = shard_hash_keys(kin, stream)
+        self.max_in_flight = max_in_flight or len(self._hash_keys)
+        self._pool = ThreadPoolExecutor(max_workers=self.max_in_flight)
+        self._slots = threading.BoundedSemaphore(self.max_in_flight)
+        self._lock = threading.Lock()
+        self._pending: List[Future] = []
+        self._batch: List[dict] = []
+        self._batch_bytes = 0
+        self._seq = 0
+        self._delay = 0.0
+        self._started: Optional[float] = None
+
+    # ─── API pública ────────────────────────────────────────────────
+    def put(self, data) -> None:
+        if len(data) > MAX_RECORD_BYTES:
+            raise ValueError(f"Registro de {len(data)} bytes excede o limite de 1 MB do Kinesis")
+        if self._started is None:
+            self._started = time.perf_counter()
+
+        key = f"{self.partition_prefix}-{self._seq}"
+        entry = {
+            "Data": data,
+            "PartitionKey": key,
+            "ExplicitHashKey": self._hash_keys[self._seq % len(self._hash_keys)],
+        }
+        self._seq += 1
+        size = len(data) + len(key)
+        if len(self._batch) >= MAX_BATCH_RECORDS or self._batch_bytes + size > MAX_BATCH_BYTES:
+            self._submit()
+        self._batch.append(entry)
+        self._batch_bytes += size
+
+    def flush(self) -> ProducerStats:
+        if self._batch:
+            self._submit()
+        pending, self._pending = self._pending, []
+        for future in pending:
+            future.result()
+        if self._started is not None:
+            self.stats.elapsed_s = time.perf_counter() - self._started
+        return self.stats
+
+    def close(self) -> ProducerStats:
+        try:
+            return self.flush()
+        finally:
+            self._pool.shutdown(wait=True)
+
+    def __enter__(self) -> "KinesisProducer":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+
+    # ─── Internos ───────────────────────────────────────────────────
+    def _submit(self) -> None:
+        batch, self._batch, self._batch_bytes = self._batch, [], 0
+        self._slots.acquire()
+        future = self._pool.submit(self._send, batch)
+        future.add_done_callback(lambda _: self._slots.release())
+        self._pending = [f for f in self._pending if not f.done() or f.exception()]
+        self._pending.append(future)
+
+    def _send(self, entries: List[dict]) -> None:
+        attempt = 0
+        while entries:
+            self._wait_throttle()
+            try:
+                resp = self.kin.put_records(StreamName=self.stream, Records=entries)
+                results = resp["Records"]
+            except ClientError as e:
+                if e.response.get("Error", {}).get("Code") != THROTTLE_CODE:
+                    raise
+                results = [{"ErrorCode": THROTTLE_CODE}] * len(entries)
+
+            failed = [entry for entry, r in zip(entries, results) if r.get("ErrorCode")]
+            throttled = any(r.get("ErrorCode") == THROTTLE_CODE for r in results)
+            sent = [entry for entry, r in zip(entries, results) if not r.get("ErrorCode")]
+            with self._lock:
+                self.stats.requests += 1
+                self.stats.records += len(sent)
+                self.stats.bytes += sum(len(entry["Data"]) for entry in sent)
+                self.stats.retried_records += len(failed)
+                if throttled:
+                    self.stats.throttled_requests += 1
+                    self._delay = min(self.max_delay, max(self.base_delay, self._delay * 2))
+                else:
+                    self._delay = self._delay / 2 if self._delay > self.base_delay else 0.0
+
+            if failed:
+                attempt += 1
+                if attempt >= self.max_attempts:
+                    codes = {r.get("ErrorCode") for r in results if r.get("ErrorCode")}
+                    raise RuntimeError(
+                        f"{len(failed)} registro(s) não enviados para {self.stream} após {attempt} tentativas: {codes}"
+                    )
+                if not throttled:
+                    time.sleep(self.base_delay * 2 ** attempt * random.uniform(0.5, 1.0))
+            entries = failed
+
+    def _wait_throttle(self) -> None:
+        with self._lock:
+            delay = self._delay
+        if delay:
+            time.sleep(delay * random.uniform(0.5, 1.0))
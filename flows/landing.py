@@ -1,22 +1,23 @@
-import boto3
-import os
 import time
 from pathlib import Path
-from typing import List
+from typing import Dict, Iterator, List, Optional
 
-from prefect import flow, task, get_run_logger
+from prefect import flow, task, get_run_logger, unmapped
 
-ENDPOINT = os.getenv("LOCALSTACK_ENDPOINT", "http://localhost:4566")
-AWS_KWARGS = dict(
-    region_name="us-east-1",
-    aws_access_key_id="test",
-    aws_secret_access_key="test",
-    endpoint_url=ENDPOINT,
+import aws_clients
+import bronze
+from csv_chunks import DEFAULT_MAX_BYTES, iter_csv_chunks
+from kinesis_producer import KinesisProducer
+from landing_manifest import (
+    FilePlan, PushDigest, load_manifest, plan_file, record_push, save_manifest,
 )
+from landing_tracker import DatasetProgress, LandingCompletionTracker
+
+BUCKET = "csv-batch-bucket"
 
 
 def boto(service):
-    return boto3.client(service, **AWS_KWARGS)
+    return aws_clients.client(service)
 
 
 @task
@@ -25,8 +26,23 @@ def list_csv(folder: str = "csv") -> List[Path]:
 
 
 @task
-def push_csv_in_chunks(csv_path: Path, max_bytes: int = 900 * 1024):
-    kin = boto("kinesis")
+def plan_ingestion(files: List[Path], manifest: dict) -> List[FilePlan]:
+    log = get_run_logger()
+    plans = [plan_file(f, manifest) for f in files]
+    for plan in plans:
+        log.info(f"🧾 {Path(plan.path).name}: {plan.mode} (bytes {plan.start}–{plan.end or plan.size})")
+    return plans
+
+
+@task
+def push_csv_in_chunks(
+    csv_path: Path,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    max_in_flight: Optional[int] = None,
+    start: int = 0,
+    end: Optional[int] = None,
+) -> Dict[str, object]:
+    kin, log = boto("kinesis"), get_run_logger()
     dataset = csv_path.stem.lower()
     stream = {
         "albums": "albums-stream",
@@ -34,44 +50,93 @@ def push_csv_in_chunks(csv_path: Path, max_bytes: int = 900 * 1024):
         "reviews": "reviews-stream",
     }[dataset]
 
-    lines = csv_path.read_text().splitlines()
-    header = lines[0] + "\n"
-
-    chunk = header
-    size = len(chunk.encode())
-    for line in lines[1:]:
-        encoded = (line + "\n").encode()
-        if size + len(encoded) > max_bytes:
-            kin.put_record(StreamName=stream, Data=chunk.encode(), PartitionKey=dataset)
-            chunk = header + line + "\n"
-            size = len((header + line + "\n").encode())
-        else:
-            chunk += line + "\n"
-            size += len(encoded)
-
-    if size > len(header.encode()):
-        kin.put_record(StreamName=stream, Data=chunk.encode(), PartitionKey=dataset)
-
-
-@task(log_prints=True, retries=3, retry_delay_seconds=30)
-def wait_firehose(bucket="csv-batch-bucket", prefix="landing/") -> List[str]:
-    s3, log = boto("s3"), get_run_logger()
-    while True:
-        resp = s3.list_objects_v2(Bucket=bucket, Prefix=prefix)
-        if resp.get("KeyCount", 0):
-            keys = [o["Key"] for o in resp["Contents"]]
-            log.info(f"🔥 Chegaram {len(keys)} arquivo(s) no S3")
-            return keys
-        log.info("⏳ Aguardando Firehose… (15 s)")
-        time.sleep(15)
+    digest = PushDigest()
+    with KinesisProducer(kin, stream, dataset, max_in_flight=max_in_flight) as producer:
+        for chunk in iter_csv_chunks(csv_path, max_bytes, start=start, end=end):
+            producer.put(chunk)
+            digest.update(chunk)
+    stats = {"dataset": dataset, "push": digest.as_dict(), **producer.stats.as_dict()}
+    log.info(
+        f"📤 {stream}: {stats['records']} registro(s), {stats['bytes']} bytes em {stats['requests']} "
+        f"put_records ({stats['records_per_s']} rec/s, {stats['bytes_per_s']} B/s)"
+    )
+    return stats
+
+
+@task
+def snapshot_landing(files: List[Path], bucket=BUCKET, prefix="landing/") -> Dict[str, List[str]]:
+    tracker = LandingCompletionTracker(boto("s3"), bucket, prefix)
+    return tracker.snapshot(f.stem.lower() for f in files)
+
+
+def wait_firehose(
+    sent: List[Dict[str, float]],
+    baseline: Dict[str, List[str]],
+    bucket=BUCKET,
+    prefix="landing/",
+    timeout: float = 900,
+) -> Iterator[DatasetProgress]:
+    """Gera cada dataset assim que o Firehose termina de entregá-lo."""
+    log = get_run_logger()
+    tracker = LandingCompletionTracker(boto("s3"), bucket, prefix)
+    tracker.restore(baseline)
+    for stats in sent:
+        tracker.expect(stats["dataset"], stats["records"], stats["bytes"])
+
+    for progress in tracker.iter_ready(timeout):
+        log.info(
+            f"🔥 {progress.dataset}: {len(progress.keys)} arquivo(s), "
+            f"{progress.landed_bytes}/{progress.expected_bytes} bytes ({progress.expected_records} registros)"
+        )
+        yield progress
+
+
+@task
+def record_ingestion(manifest: dict, plans: List[FilePlan], sent: List[Dict[str, object]], bucket=BUCKET) -> None:
+    run_id = int(time.time() * 1000)
+    pushes = {stats["dataset"]: stats["push"] for stats in sent}
+    for plan in plans:
+        record_push(manifest, plan, run_id, pushes.get(plan.dataset))
+    save_manifest(boto("s3"), bucket, manifest)
 
 
 @flow
-def ingest_folder_flow(folder: str = "csv") -> list[str]:
-    files = list_csv(folder)
-    push_csv_in_chunks.map(files)
-    keys = wait_firehose()
-    return keys
+def ingest_folder_flow(
+    folder: str = "csv",
+    to_bronze: bool = False,
+    streaming: bool = False,
+    dedup: bool = False,
+) -> Dict[str, List[str]]:
+    log = get_run_logger()
+    manifest = load_manifest(boto("s3"), BUCKET)
+    plans = plan_ingestion(list_csv(folder), manifest)
+    todo = [p for p in plans if p.mode != "skip"]
+    if not todo:
+        log.info("✅ Nenhum CSV mudou desde a última ingestão.")
+        record_ingestion(manifest, plans, [])
+        aws_clients.log_client_stats(log.info)
+        return {}
+
+    files = [Path(p.path) for p in todo]
+    baseline = snapshot_landing(files)
+    sent = push_csv_in_chunks.map(files, start=[p.start for p in todo], end=[p.end for p in todo])
+    ready, converting = {}, []
+    for progress in wait_firehose(sent.result(), baseline):
+        ready[progress.dataset] = progress.keys
+        if to_bronze:
+            # a bronze de um dataset começa assim que ele chega, sem esperar os outros streams
+            converting.append(bronze.csv_s3_to_parquet.map(
+                progress.keys, streaming=unmapped(streaming), dedup=unmapped(dedup)
+            ))
+    record_ingestion(manifest, plans, sent)
+    if converting:
+        for futures in converting:
+            futures.result()
+        if dedup:
+            bronze.save_dedup_indexes()
+        bronze.publish_quality_report()
+    aws_clients.log_client_stats(log.info)
+    return ready
 
 
 if __name__ == "__main__":
@@ -0,0 +1,159 @@
+"""Manifesto de ingestão da landing: por arquivo de origem decide ``skip``, ``append`` (só a cauda)
+ou ``full``, com um digest por envio e um hash curto por chunk."""
+from __future__ import annotations
+
+import hashlib
+import os
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from state_store import load_json, save_json
+
+MANIFEST_KEY = "state/landing_manifest.json"
+HASH_BLOCK = 1024 * 1024
+CHUNK_HASH_HEX = 16  # 64 bits do SHA-256 por chunk: ~17 bytes no JSON
+MAX_PUSHES_PER_FILE = 100
+
+
+@dataclass
+class FilePlan:
+    path: str
+    dataset: str
+    mode: str
+    size: int
+    mtime_ns: int
+    sha256: str = ""
+    start: int = 0
+    end: Optional[int] = None
+    ends_with_newline: bool = True
+
+
+@dataclass
+class PushRecord:
+    run_id: int
+    mode: str
+    start: int
+    end: int
+    chunks: int = 0
+    bytes: int = 0
+    sha256: str = ""
+    first_key: Optional[str] = None
+    last_key: Optional[str] = None
+    chunk_hashes: List[str] = field(default_factory=list)
+
+
+def chunk_hash(chunk) -> str:
+    return hashlib.sha256(chunk).hexdigest()[:CHUNK_HASH_HEX]
+
+
+class PushDigest:
+    """Resumo de um envio, acumulado chunk a chunk: contagem, bytes, SHA-256, hash de cada chunk e primeira/última chave."""
+
+    def __init__(self):
+        self._hash = hashlib.sha256()
+        self.chunk_hashes: List[str] = []
+        self.chunks = 0
+        self.bytes = 0
+        self.first_key: Optional[str] = None
+        self.last_key: Optional[str] = None
+
+    def update(self, chunk, key: Optional[str] = None) -> None:
+        self._hash.update(chunk)
+        self.chunk_hashes.append(chunk_hash(chunk))
+        self.chunks += 1
+        self.bytes += len(chunk)
+        if key is not None:
+            self.first_key = self.first_key or key
+            self.last_key = key
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "chunks": self.chunks,
+            "bytes": self.bytes,
+            "sha256": self._hash.hexdigest(),
+            "first_key": self.first_key,
+            "last_key": self.last_key,
+            "chunk_hashes": list(self.chunk_hashes),
+        }
+
+
+def changed_chunks(push: dict, chunks: Iterable) -> List[int]:
+    """Posições dos chunks de um reenvio que diferem do envio ``push`` registrado (ou que ele não tinha)."""
+    recorded = push.get("chunk_hashes", [])
+    return [i for i, chunk in enumerate(chunks) if i >= len(recorded) or chunk_hash(chunk) != recorded[i]]
+
+
+def load_manifest(s3, bucket: str, key: str = MANIFEST_KEY) -> dict:
+    return load_json(s3, bucket, key, {"files": {}})
+
+
+def save_manifest(s3, bucket: str, manifest: dict, key: str = MANIFEST_KEY) -> None:
+    save_json(s3, bucket, key, manifest)
+
+
+def file_digest(path: Path, size: int, prefix_size: Optional[int] = None) -> Tuple[str, Optional[str], bool]:
+    """SHA-256 dos primeiros ``size`` e ``prefix_size`` bytes numa leitura só, e se o conteúdo termina em ``\\n``."""
+    full, prefix_hex, read, last = hashlib.sha256(), None, 0, b""
+    with open(path, "rb") as fh:
+        while block := fh.read(min(HASH_BLOCK, size - read)):
+            if prefix_size is not None and prefix_hex is None and read + len(block) >= prefix_size:
+                head = prefix_size - read
+                full.update(block[:head])
+                prefix_hex = full.hexdigest()
+                full.update(block[head:])
+            else:
+                full.update(block)
+            read += len(block)
+            last = block[-1:]
+    return full.hexdigest(), prefix_hex, last in (b"", b"\n")
+
+
+def plan_file(path: Path, manifest: dict) -> FilePlan:
+    st = os.stat(path)
+    plan = FilePlan(str(path), path.stem.lower(), "full", st.st_size, st.st_mtime_ns)
+    entry = manifest.get("files", {}).get(path.name)
+
+    if entry and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+        plan.mode, plan.sha256 = "skip", entry["sha256"]
+        plan.ends_with_newline = entry.get("ends_with_newline", True)
+        return plan
+
+    prefix_size = entry["size"] if entry and entry["size"] < st.st_size else None
+    plan.sha256, prefix_hex, plan.ends_with_newline = file_digest(path, st.st_size, prefix_size)
+    if entry and plan.sha256 == entry["sha256"]:
+        plan.mode = "skip"
+    elif entry and prefix_hex == entry["sha256"] and entry.get("ends_with_newline", True):
+        plan.mode, plan.start = "append", entry["size"]
+    plan.end = st.st_size
+    return plan
+
+
+def record_push(manifest: dict, plan: FilePlan, run_id: int, push: Optional[Dict[str, object]] = None) -> None:
+    """Atualiza a entrada do arquivo com o resumo do envio (``PushDigest.as_dict``);
+    chamar só depois que o envio terminou sem erro."""
+    files = manifest.setdefault("files", {})
+    name = Path(plan.path).name
+    entry = files.setdefault(name, {"pushes": []})
+    entry.update(
+        dataset=plan.dataset,
+        size=plan.size,
+        mtime_ns=plan.mtime_ns,
+        sha256=plan.sha256,
+        ends_with_newline=plan.ends_with_newline,
+    )
+    if plan.mode == "skip":
+        return
+    record = PushRecord(run_id, plan.mode, plan.start, plan.size, **(push or {}))
+    entry["pushes"] = (entry.get("pushes", []) + [asdict(record)])[-MAX_PUSHES_PER_FILE:]
+
+
+def pushes_since(manifest: dict, dataset: str, run_id: int) -> List[dict]:
+    """Envios de ``dataset`` feitos depois de ``run_id`` (o delta para as camadas seguintes)."""
+    return [
+        push
+        for entry in manifest.get("files", {}).values()
+        if entry.get("dataset") == dataset
+        for push in entry.get("pushes", [])
+        if push["run_id"] > run_id
+    ]
@@ -0,0 +1,95 @@
+"""Detecção de conclusão da landing por dataset: completo quando os objetos novos do prefixo somam os bytes enviados."""
+from __future__ import annotations
+
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+
+
+def iter_objects(s3, bucket: str, prefix: str) -> Iterator[dict]:
+    paginator = s3.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        yield from page.get("Contents", [])
+
+
+@dataclass
+class DatasetProgress:
+    dataset: str
+    expected_records: int = 0
+    expected_bytes: int = 0
+    landed_bytes: int = 0
+    keys: List[str] = field(default_factory=list)
+
+    @property
+    def ready(self) -> bool:
+        return self.landed_bytes >= self.expected_bytes
+
+
+class LandingCompletionTracker:
+    def __init__(self, s3, bucket: str, prefix: str = "landing/"):
+        self.s3 = s3
+        self.bucket = bucket
+        self.prefix = prefix
+        self.progress: Dict[str, DatasetProgress] = {}
+        self._baseline: Dict[str, Set[str]] = {}
+
+    def dataset_prefix(self, dataset: str) -> str:
+        return f"{self.prefix}{dataset}/"
+
+    def snapshot(self, datasets: Iterable[str]) -> Dict[str, List[str]]:
+        """Chaves já existentes por dataset, que não contam para este envio."""
+        for dataset in datasets:
+            prefix = self.dataset_prefix(dataset)
+            self._baseline[dataset] = {o["Key"] for o in iter_objects(self.s3, self.bucket, prefix)}
+        return {name: sorted(keys) for name, keys in self._baseline.items()}
+
+    def restore(self, baseline: Dict[str, List[str]]) -> None:
+        self._baseline = {name: set(keys) for name, keys in baseline.items()}
+
+    def expect(self, dataset: str, records: int, nbytes: int) -> None:
+        progress = self.progress.setdefault(dataset, DatasetProgress(dataset))
+        progress.expected_records += records
+        progress.expected_bytes += nbytes
+
+    def poll(self, datasets: Optional[Iterable[str]] = None) -> List[str]:
+        """Relista os datasets informados (padrão: todos); devolve os que estão prontos."""
+        done = []
+        for dataset in (self.progress if datasets is None else datasets):
+            progress = self.progress[dataset]
+            baseline = self._baseline.get(dataset, set())
+            keys, landed = [], 0
+            for obj in iter_objects(self.s3, self.bucket, self.dataset_prefix(dataset)):
+                if obj["Key"] not in baseline:
+                    keys.append(obj["Key"])
+                    landed += obj.get("Size", 0)
+            progress.keys, progress.landed_bytes = sorted(keys), landed
+            if progress.ready:
+                done.append(dataset)
+        return done
+
+    def iter_ready(
+        self,
+        timeout: float = 900,
+        base_delay: float = 1.0,
+        max_delay: float = 15.0,
+    ) -> Iterator[DatasetProgress]:
+        """Gera cada dataset assim que ele termina de chegar, para o downstream começar já."""
+        deadline = time.monotonic() + timeout
+        attempt = 0
+        pending = set(self.progress)
+        while pending:
+            landed_before = sum(self.progress[d].landed_bytes for d in pending)
+            for dataset in self.poll(sorted(pending)):
+                pending.discard(dataset)
+                yield self.progress[dataset]
+            if not pending:
+                return
+            if sum(self.progress[d].landed_bytes for d in pending) > landed_before:
+                attempt = 0
+            delay = min(max_delay, base_delay * 2 ** attempt) * random.uniform(0.5, 1.0)
+            if time.monotonic() + delay > deadline:
+                missing = {d: (self.progress[d].landed_bytes, self.progress[d].expected_bytes) for d in pending}
+                raise TimeoutError(f"Landing incompleta (bytes recebidos, esperados): {missing}")
+            time.sleep(delay)
+            attempt += 1
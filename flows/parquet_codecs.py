@@ -0,0 +1,160 @@
+"""Compressão e encoding por coluna, escolhidos uma vez por dataset pelo menor tamanho numa amostra
+(``PARQUET_CODEC_POLICY=snappy`` volta ao snappy fixo)."""
+from __future__ import annotations
+
+import io
+import json
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Tuple
+
+import polars as pl
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+POLICY = os.getenv("PARQUET_CODEC_POLICY", "adaptive")
+SAMPLE_ROWS = int(os.getenv("PARQUET_CODEC_SAMPLE_ROWS", "20000"))
+TOLERANCE = float(os.getenv("PARQUET_CODEC_TOLERANCE", "0.02"))
+METADATA_KEY = b"codec_policy"
+
+COMPRESSIONS: List[Tuple[str, Optional[int]]] = [("snappy", None), ("zstd", 3), ("zstd", 9)]
+
+
+@dataclass(frozen=True)
+class Codec:
+    compression: str = "snappy"
+    level: Optional[int] = None
+    dictionary: bool = True
+    encoding: Optional[str] = None  # só para colunas sem dicionário
+
+    @property
+    def label(self) -> str:
+        codec = self.compression if self.level is None else f"{self.compression}-{self.level}"
+        return f"{codec}/{'dict' if self.dictionary else (self.encoding or 'PLAIN').lower()}"
+
+
+DEFAULT = Codec()
+
+_chosen: Dict[Tuple, Dict[str, Codec]] = {}
+_lock = threading.Lock()
+
+
+def _encodings(dtype: pa.DataType) -> List[Tuple[bool, Optional[str]]]:
+    special = None
+    if pa.types.is_integer(dtype):
+        special = "DELTA_BINARY_PACKED"
+    elif pa.types.is_floating(dtype):
+        special = "BYTE_STREAM_SPLIT"
+    elif pa.types.is_string(dtype) or pa.types.is_large_string(dtype):
+        special = "DELTA_LENGTH_BYTE_ARRAY"
+    options = [(True, None), (False, "PLAIN")]
+    return options + [(False, special)] if special else options
+
+
+def candidates(dtype: pa.DataType) -> List[Codec]:
+    """Candidatos em ordem crescente de custo de CPU."""
+    return [
+        Codec(compression, level, dictionary, encoding)
+        for compression, level in COMPRESSIONS
+        for dictionary, encoding in _encodings(dtype)
+    ]
+
+
+def writer_options(codecs: Dict[str, Codec]) -> dict:
+    """``compression``/``compression_level``/``use_dictionary``/``column_encoding`` por coluna."""
+    levels = {c: codec.level for c, codec in codecs.items() if codec.level is not None}
+    encodings = {c: codec.encoding for c, codec in codecs.items() if not codec.dictionary and codec.encoding}
+    return {
+        "compression": {c: codec.compression for c, codec in codecs.items()},
+        "compression_level": levels or None,
+        "use_dictionary": [c for c, codec in codecs.items() if codec.dictionary],
+        "column_encoding": encodings or None,
+    }
+
+
+def metadata(codecs: Dict[str, Codec]) -> Dict[bytes, bytes]:
+    return {METADATA_KEY: json.dumps({c: asdict(codec) for c, codec in codecs.items()}).encode()}
+
+
+def encoded_size(column: pa.Table, codec: Codec) -> int:
+    buf = io.BytesIO()
+    pq.write_table(column, buf, **writer_options({column.column_names[0]: codec}))
+    return buf.tell()
+
+
+def measure(column: pa.Table, codec: Codec) -> Tuple[int, float, float]:
+    """Bytes, ms de codificação e ms de decodificação de ``column`` com ``codec``."""
+    buf = io.BytesIO()
+    start = time.perf_counter()
+    pq.write_table(column, buf, **writer_options({column.column_names[0]: codec}))
+    encoded = time.perf_counter()
+    pq.read_table(io.BytesIO(buf.getvalue()), pre_buffer=False)  # ver s3_scan.PARQUET
+    decoded = time.perf_counter()
+    return buf.tell(), 1000 * (encoded - start), 1000 * (decoded - encoded)
+
+
+def sample(df: pl.DataFrame, rows: int = SAMPLE_ROWS) -> pa.Table:
+    """Fatia contígua do meio do frame (preserva a ordem de escrita)."""
+    start = max(df.height - rows, 0) // 2
+    return df.slice(start, rows).to_arrow()
+
+
+def pick(results: List[Tuple[Codec, int]]) -> Codec:
+    """Primeiro candidato (o mais barato) a até ``TOLERANCE`` do menor tamanho."""
+    smallest = min(size for _, size in results)
+    return next(codec for codec, size in results if size <= smallest * (1 + TOLERANCE))
+
+
+def choose(df: pl.DataFrame, dataset: str = "") -> Dict[str, Codec]:
+    """Codec de cada coluna de ``df``, pela amostra; com ``dataset``, reaproveita a
+    escolha anterior do mesmo dataset e schema."""
+    if POLICY != "adaptive" or df.is_empty():
+        return {c: DEFAULT for c in df.columns}
+    key = (dataset, tuple((name, str(dtype)) for name, dtype in df.schema.items()))
+    if dataset and key in _chosen:
+        return _chosen[key]
+    table = sample(df)
+    codecs = {
+        name: pick([(codec, encoded_size(table.select([name]), codec)) for codec in candidates(table.schema.field(name).type)])
+        for name in table.column_names
+    }
+    if dataset:
+        with _lock:
+            _chosen.setdefault(key, codecs)
+    return codecs
+
+
+# ─── Benchmark ──────────────────────────────────────────────────────
+def _write(table: pa.Table, codecs: Dict[str, Codec]) -> Tuple[bytes, float, float]:
+    buf = io.BytesIO()
+    start = time.perf_counter()
+    pq.write_table(table, buf, **writer_options(codecs))
+    encoded = time.perf_counter()
+    pq.read_table(io.BytesIO(buf.getvalue()), pre_buffer=False)  # ver s3_scan.PARQUET
+    return buf.getvalue(), 1000 * (encoded - start), 1000 * (time.perf_counter() - encoded)
+
+
+def benchmark(df: pl.DataFrame, log=print) -> None:
+    table = sample(df)
+    chosen = choose(df)
+    for name in table.column_names:
+        log(f"📊 {name}")
+        for codec in candidates(table.schema.field(name).type):
+            size, enc, dec = measure(table.select([name]), codec)
+            mark = "*" if codec == chosen[name] else " "
+            log(f"   {mark} {codec.label:<28} {size:>10} B  codif. {enc:7.2f} ms  decod. {dec:7.2f} ms")
+
+    full = df.to_arrow()
+    for label, codecs in (("snappy fixo", {c: DEFAULT for c in df.columns}), ("política", chosen)):
+        data, enc, dec = _write(full, codecs)
+        log(f"📦 {label}: {len(data)} B, codif. {enc:.1f} ms, decod. {dec:.1f} ms")
+
+
+if __name__ == "__main__":
+    import sys
+
+    import s3_scan
+
+    benchmark(s3_scan.scan_parquet(sys.argv[1]).collect())
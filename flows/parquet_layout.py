@@ -0,0 +1,106 @@
+"""Layout físico dos Parquet: ordenação pela chave de join (``SORT_KEYS``), row groups dimensionados,
+estatísticas, page index e codecs por coluna."""
+from __future__ import annotations
+
+import io
+import os
+from typing import Dict, List, Optional, Sequence
+
+import polars as pl
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+import parquet_codecs
+
+ROW_GROUP_BYTES = int(os.getenv("PARQUET_ROW_GROUP_BYTES", str(64 * 1024 * 1024)))
+MIN_ROW_GROUP_ROWS = 4096
+MAX_ROW_GROUP_ROWS = 1_000_000
+
+# chave de join/filtro dominante de cada dataset (bronze e silver)
+SORT_KEYS: Dict[str, List[str]] = {
+    "albums": ["id"],
+    "bands": ["id"],
+    "reviews": ["album", "id"],
+    "music_catalog": ["album_id"],
+    "album_reviews": ["album_id", "review_id"],
+}
+
+
+def sort_keys(dataset: str) -> List[str]:
+    return SORT_KEYS.get(dataset, [])
+
+
+def row_group_rows(df: pl.DataFrame) -> int:
+    """Linhas por row group para ~``ROW_GROUP_BYTES`` descomprimidos (datasets largos, menos linhas)."""
+    if df.is_empty():
+        return MIN_ROW_GROUP_ROWS
+    rows = ROW_GROUP_BYTES * df.height // max(df.estimated_size(), 1)
+    return int(min(max(rows, MIN_ROW_GROUP_ROWS), MAX_ROW_GROUP_ROWS))
+
+
+def arrange(df: pl.DataFrame, sort_by: Sequence[str]) -> pl.DataFrame:
+    sort_by = [c for c in sort_by if c in df.columns]
+    return df.sort(sort_by, nulls_last=True, maintain_order=True) if sort_by else df
+
+
+def writer_options(
+    columns: Sequence[str],
+    sort_by: Sequence[str],
+    codecs: Optional[Dict[str, parquet_codecs.Codec]] = None,
+) -> dict:
+    """Opções do writer pyarrow; ``sort_by`` vai para ``sorting_columns`` de cada row group
+    e ``codecs`` (``parquet_codecs.choose``) define compressão/encoding por coluna."""
+    columns = list(columns)
+    codecs = codecs or {c: parquet_codecs.DEFAULT for c in columns}
+    return {
+        **parquet_codecs.writer_options(codecs),
+        "write_statistics": True,
+        "write_page_index": True,
+        "sorting_columns": [pq.SortingColumn(columns.index(c), nulls_first=False) for c in sort_by if c in columns] or None,
+    }
+
+
+def with_codec_metadata(schema: pa.Schema, codecs: Dict[str, parquet_codecs.Codec]) -> pa.Schema:
+    return schema.with_metadata({**(schema.metadata or {}), **parquet_codecs.metadata(codecs)})
+
+
+def to_bytes(
+    df: pl.DataFrame,
+    dataset: str,
+    sort_by: Optional[Sequence[str]] = None,
+    codecs: Optional[Dict[str, parquet_codecs.Codec]] = None,
+) -> bytes:
+    """Serializa ``df`` com o layout de ``dataset``; ``sort_by=[]`` mantém a ordem recebida."""
+    sort_by = sort_keys(dataset) if sort_by is None else list(sort_by)
+    df = arrange(df, sort_by)
+    codecs = codecs or parquet_codecs.choose(df, dataset)
+    table = df.to_arrow()
+    table = table.replace_schema_metadata(with_codec_metadata(table.schema, codecs).metadata)
+    buf = io.BytesIO()
+    pq.write_table(table, buf, row_group_size=row_group_rows(df), **writer_options(df.columns, sort_by, codecs))
+    return buf.getvalue()
+
+
+def is_sorted(dataset: ds.FileSystemDataset, column: str) -> bool:
+    """Verdadeiro se os row groups declaram ordenação crescente por ``column``,
+    sem nulos, e as faixas min/max não se sobrepõem na ordem dos arquivos."""
+    previous = None
+    for fragment in dataset.get_fragments():
+        metadata = fragment.metadata
+        names = metadata.schema.names
+        if column not in names:
+            return False
+        index = names.index(column)
+        for i in range(metadata.num_row_groups):
+            row_group = metadata.row_group(i)
+            sorting = row_group.sorting_columns
+            if not sorting or sorting[0].column_index != index or sorting[0].descending:
+                return False
+            stats = row_group.column(index).statistics
+            if stats is None or not stats.has_min_max or stats.null_count:
+                return False
+            if previous is not None and stats.min < previous:
+                return False
+            previous = stats.max
+    return True
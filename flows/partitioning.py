@@ -0,0 +1,173 @@
+"""Layout Hive (``coluna=valor/``) para silver e gold, com poda de arquivos pelo predicado do leitor."""
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+from urllib.parse import quote, unquote
+
+import polars as pl
+
+import parquet_codecs
+import parquet_layout
+import s3_scan
+import silver_merge
+
+TARGET_BYTES = int(os.getenv("PARTITION_TARGET_BYTES", str(128 * 1024 * 1024)))
+NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+
+@dataclass(frozen=True)
+class PartitionSpec:
+    column: str
+    bucket: Optional[int] = None
+
+    @property
+    def directory_column(self) -> str:
+        return f"{self.column}_bucket" if self.bucket else self.column
+
+    def value_expr(self) -> pl.Expr:
+        col = pl.col(self.column)
+        return (col // self.bucket * self.bucket) if self.bucket else col
+
+
+SPECS: Dict[str, PartitionSpec] = {
+    "albums": PartitionSpec("year", bucket=10),
+    "bands": PartitionSpec("country"),
+    "music_catalog": PartitionSpec("country"),
+    "band_avg_scores": PartitionSpec("country"),
+    "top10_by_country": PartitionSpec("country"),
+    "country_rankings": PartitionSpec("country"),
+    "full_dataset": PartitionSpec("country"),
+    "brazilian_bands": PartitionSpec("country"),
+}
+
+
+def _encode(value) -> str:
+    return NULL_PARTITION if value is None else quote(str(value), safe="")
+
+
+def _put(s3, bucket: str, key: str, df: pl.DataFrame, sort_by: Sequence[str] = (), codecs=None) -> None:
+    s3.put_object(Bucket=bucket, Key=key, Body=parquet_layout.to_bytes(df, "", sort_by, codecs))
+
+
+def write_partitioned(
+    s3,
+    bucket: str,
+    prefix: str,
+    df: pl.DataFrame,
+    spec: PartitionSpec,
+    sort_by: Sequence[str] = (),
+    target_bytes: int = TARGET_BYTES,
+) -> List[str]:
+    """Grava ``df`` em ``prefix/<coluna>=<valor>/part-NNNN.parquet``, ordenado por ``sort_by``; devolve as chaves."""
+    if df.is_empty():
+        key = f"{prefix}/part-0000.parquet"
+        _put(s3, bucket, key, df, sort_by)
+        return [key]
+
+    rows_per_file = max(int(target_bytes * df.height / max(df.estimated_size(), 1)), 1)
+    # codecs escolhidos uma vez para todos os arquivos, por uma amostra do frame inteiro
+    middle = max(df.height - parquet_codecs.SAMPLE_ROWS, 0) // 2
+    codecs = parquet_codecs.choose(parquet_layout.arrange(df.slice(middle, parquet_codecs.SAMPLE_ROWS), sort_by))
+    keys = []
+    parts = df.with_columns(spec.value_expr().alias("_partition")).partition_by("_partition", as_dict=True)
+    for (value,), part in parts.items():
+        part = parquet_layout.arrange(part.drop("_partition"), sort_by)
+        directory = f"{prefix}/{spec.directory_column}={_encode(value)}"
+        for i, start in enumerate(range(0, part.height, rows_per_file)):
+            key = f"{directory}/part-{i:04d}.parquet"
+            _put(s3, bucket, key, part.slice(start, rows_per_file), sort_by, codecs)
+            keys.append(key)
+    return keys
+
+
+def remove_stale(s3, bucket: str, prefix: str, keep: List[str]) -> None:
+    """Apaga de ``prefix/`` os Parquet de layouts anteriores (o que não está em ``keep``)."""
+    keep = set(keep)
+    stale = [
+        o["Key"]
+        for page in s3.get_paginator("list_objects_v2").paginate(Bucket=bucket, Prefix=f"{prefix}/")
+        for o in page.get("Contents", [])
+        if o["Key"].endswith(".parquet") and o["Key"] not in keep
+    ]
+    silver_merge.delete_keys(s3, bucket, stale)
+
+
+def partition_values(key: str) -> Dict[str, Optional[str]]:
+    values = {}
+    for segment in key.split("/")[:-1]:
+        if "=" in segment:
+            name, _, raw = segment.partition("=")
+            values[name] = None if raw == NULL_PARTITION else unquote(raw)
+    return values
+
+
+def prune(uris: List[str], dataset: str, predicate: Optional[pl.Expr]) -> List[str]:
+    """Arquivos que podem conter linhas que satisfazem ``predicate``."""
+    if predicate is None or not uris:
+        return uris
+    spec = SPECS.get(dataset)
+    if spec is None or set(predicate.meta.root_names()) != {spec.column}:
+        return uris
+
+    rows = []
+    for uri in uris:
+        raw = partition_values(uri).get(spec.directory_column, "")
+        if raw == "":
+            return uris  # arquivo fora do layout particionado: não dá para podar
+        if raw is None:
+            rows.append((uri, None))
+        elif spec.bucket:
+            rows.extend((uri, int(raw) + i) for i in range(spec.bucket))
+        else:
+            rows.append((uri, raw))
+    dtype = pl.Int64 if spec.bucket else pl.String
+    table = pl.DataFrame(rows, schema={"_uri": pl.String, spec.column: dtype}, orient="row")
+    return table.filter(predicate)["_uri"].unique(maintain_order=True).to_list()
+
+
+def dataset_uris(s3, bucket: str, prefix: str, dataset: str, predicate: Optional[pl.Expr] = None) -> List[str]:
+    """Arquivos atuais de ``prefix/<dataset>``: manifesto do MERGE, senão listagem podada."""
+    uris = silver_merge.current_uris(s3, bucket, prefix, dataset)
+    if uris is None:
+        uris = sorted(s3_scan.resolve_objects(f"s3://{bucket}/{prefix}/{dataset}/"))
+    return prune(uris, dataset, predicate)
+
+
+def scan(s3, bucket: str, prefix: str, dataset: str, predicate: Optional[pl.Expr] = None) -> pl.LazyFrame:
+    lf = s3_scan.scan_parquet(dataset_uris(s3, bucket, prefix, dataset, predicate))
+    return lf if predicate is None else lf.filter(predicate)
+
+
+# ─── Benchmark ──────────────────────────────────────────────────────
+def benchmark(s3, bucket: str, source_uri: str, country: str, prefix: str = "bench/partitioning") -> None:
+    """Bytes lidos para ``country == <país>`` num arquivo único vs. particionado por país."""
+    df = s3_scan.scan_parquet(source_uri).collect()
+    _put(s3, bucket, f"{prefix}/single/single.parquet", df, parquet_layout.sort_keys("music_catalog"))
+    remove_stale(s3, bucket, f"{prefix}/music_catalog", [])
+    write_partitioned(s3, bucket, f"{prefix}/music_catalog", df, SPECS["music_catalog"], parquet_layout.sort_keys("music_catalog"))
+
+    predicate = pl.col("country") == country
+    for label, dataset in (("arquivo único", "single"), ("particionado", "music_catalog")):
+        s3_scan.log_scan_stats(log=lambda _: None)
+        rows = scan(s3, bucket, prefix, dataset, predicate).collect().height
+        (stats,) = s3_scan.scan_stats()
+        print(
+            f"📊 {label}: {rows} linhas, {stats.bytes_fetched} bytes lidos de "
+            f"{stats.object_bytes} ({stats.files} arquivo(s))"
+        )
+
+
+if __name__ == "__main__":
+    import sys
+
+    import aws_clients
+
+    bench_bucket = "csv-batch-bucket"
+    benchmark(
+        aws_clients.client("s3"),
+        bench_bucket,
+        f"s3://{bench_bucket}/silver/music_catalog/",
+        sys.argv[1] if len(sys.argv) > 1 else "Brazil",
+    )
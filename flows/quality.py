@@ -0,0 +1,166 @@
+"""Perfil de qualidade calculado na mesma consulta que coleta cada dataset, salvo em ``quality/<camada>/<run_id>.json``."""
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, List, Tuple
+
+import polars as pl
+
+import schemas
+from state_store import save_json
+
+REPORT_PREFIX = "quality"
+SEP = "|"
+MAX_YEAR = date.today().year + 1
+
+
+@dataclass(frozen=True)
+class Rule:
+    name: str
+    violation: pl.Expr  # verdadeiro nas linhas que violam a regra
+
+
+def score_in_range(column: str = "score") -> Rule:
+    return Rule(f"range:{column}", ~pl.col(column).is_between(0, 1))
+
+
+def year_in_range(column: str) -> Rule:
+    return Rule(f"range:{column}", ~pl.col(column).is_between(1900, MAX_YEAR))
+
+
+def orphan(key: str, looked_up: str) -> Rule:
+    """Chave preenchida sem correspondência no join (``left`` deixou o lado direito nulo)."""
+    return Rule(f"orphan:{key}", pl.col(key).is_not_null() & pl.col(looked_up).is_null())
+
+
+RULES: Dict[str, List[Rule]] = {
+    "albums": [year_in_range("year")],
+    "bands": [year_in_range("formed_in")],
+    "reviews": [score_in_range()],
+    "music_catalog": [orphan("band_id", "band_name")],
+    "album_reviews": [score_in_range(), orphan("album_id", "album_title")],
+    "top10_by_country": [score_in_range("avg_score")],
+    "country_rankings": [score_in_range("avg_score"), score_in_range("bayesian_score")],
+    "band_avg_scores": [score_in_range("avg_score"), Rule("positive:review_count", pl.col("review_count") <= 0)],
+    "full_dataset": [score_in_range()],
+}
+
+# texto livre, quase único por linha: sem ``approx_n_unique``
+HIGH_CARDINALITY_TEXT = {"content", "title", "album_title"}
+PROFILE_COLUMN = "_profile"
+
+# coluna derivada por cast não estrito → coluna de origem
+CASTS: Dict[str, Dict[str, str]] = {
+    "bands": {"start_year": "active"},
+}
+
+_reports: Dict[str, Dict[str, dict]] = {}
+_lock = threading.Lock()
+
+
+def profile_exprs(schema: pl.Schema, dataset: str) -> List[pl.Expr]:
+    exprs = [pl.len().alias(f"rows{SEP}")]
+    for name, dtype in schema.items():
+        exprs.append(pl.col(name).null_count().alias(f"nulls{SEP}{name}"))
+        if not (dtype == pl.String and name in HIGH_CARDINALITY_TEXT):
+            exprs.append(pl.col(name).approx_n_unique().alias(f"distinct{SEP}{name}"))
+        if dtype.is_numeric() or dtype.is_temporal():
+            exprs.append(pl.col(name).min().alias(f"min{SEP}{name}"))
+            exprs.append(pl.col(name).max().alias(f"max{SEP}{name}"))
+
+    registered = schemas.REGISTRY.get(dataset)
+    rules = list(RULES.get(dataset, []))
+    if registered:
+        for column in registered.required:
+            rules.append(Rule(f"not_null:{column}", pl.col(column).is_null()))
+            rules.append(Rule(f"unique:{column}", pl.col(column).is_duplicated()))
+    for rule in rules:
+        if all(c in schema for c in rule.violation.meta.root_names()):
+            exprs.append(rule.violation.fill_null(False).sum().alias(f"violations{SEP}{rule.name}"))
+
+    for target, source in CASTS.get(dataset, {}).items():
+        if target in schema and source in schema:
+            failed = pl.col(source).is_not_null() & pl.col(target).is_null()
+            exprs.append(failed.sum().alias(f"cast_failures{SEP}{target}"))
+    return exprs
+
+
+def schema_mismatches(schema: pl.Schema, dataset: str) -> Dict[str, str]:
+    registered = schemas.REGISTRY.get(dataset)
+    if not registered:
+        return {}
+    return {
+        c.name: f"{schema[c.name]} != {c.dtype}"
+        for c in registered.silver_columns
+        if c.name in schema and schema[c.name] != c.dtype
+    }
+
+
+def build_profile(row: dict, schema: pl.Schema, dataset: str) -> dict:
+    rows = row.pop(f"rows{SEP}")
+    profile = {"rows": rows, "columns": {}, "violations": {}, "cast_failures": {}}
+    mismatches = schema_mismatches(schema, dataset)
+    if mismatches:
+        profile["schema_mismatches"] = mismatches
+    for alias, value in row.items():
+        kind, name = alias.split(SEP, 1)
+        if kind in ("violations", "cast_failures"):
+            profile[kind][name] = value
+            continue
+        column = profile["columns"].setdefault(name, {})
+        if kind == "nulls":
+            column["null_rate"] = round(value / rows, 6) if rows else 0.0
+        else:
+            column[kind] = value if isinstance(value, (int, float, str, type(None))) else str(value)
+    return profile
+
+
+def collect_profiled(lf: pl.LazyFrame, dataset: str) -> Tuple[pl.DataFrame, dict]:
+    """Coleta ``lf`` e o perfil numa consulta só: os agregados saem numa coluna
+    struct escalar (o Polars não a replica por linha), retirada do resultado."""
+    schema = lf.collect_schema()
+    exprs = profile_exprs(schema, dataset)
+    df = lf.with_columns(pl.struct(exprs).alias(PROFILE_COLUMN)).collect()
+    row = df[PROFILE_COLUMN][0] if df.height else df.select(exprs).row(0, named=True)
+    return df.drop(PROFILE_COLUMN), build_profile(row, schema, dataset)
+
+
+def record(layer: str, dataset: str, profile: dict) -> None:
+    with _lock:
+        _reports.setdefault(layer, {})[dataset] = profile
+
+
+def add_cast_failures(layer: str, dataset: str, rows: int, failures: Dict[str, int]) -> None:
+    """Soma as linhas e falhas de cast de um lote ao perfil de ``dataset`` (bronze, lida em lotes)."""
+    with _lock:
+        profile = _reports.setdefault(layer, {}).setdefault(
+            dataset, {"rows": 0, "columns": {}, "violations": {}, "cast_failures": {}}
+        )
+        profile["rows"] += rows
+        for column, n in failures.items():
+            profile["cast_failures"][column] = profile["cast_failures"].get(column, 0) + n
+
+
+def publish(s3, bucket: str, layer: str, log=print) -> str:
+    """Grava o relatório da execução da camada e loga o que falhou."""
+    with _lock:
+        datasets = _reports.pop(layer, {})
+    run_id = time.time_ns()
+    key = f"{REPORT_PREFIX}/{layer}/{run_id}.json"
+    save_json(s3, bucket, key, {"layer": layer, "run_id": run_id, "datasets": datasets})
+
+    for dataset, profile in sorted(datasets.items()):
+        problems = {
+            name: n
+            for kind in ("violations", "cast_failures")
+            for name, n in profile[kind].items()
+            if n
+        }
+        problems.update(profile.get("schema_mismatches", {}))
+        status = ", ".join(f"{k}={v}" for k, v in problems.items()) or "ok"
+        log(f"🧪 {layer}.{dataset}: {profile['rows']} linhas — {status}")
+    log(f"🧪 Relatório de qualidade: s3://{bucket}/{key}")
+    return key
@@ -0,0 +1,130 @@
+"""Top-k por grupo para várias métricas de uma vez, sem ordenar o resultado inteiro, com o mesmo ranking
+no Polars e no Daft (empates por ``TIE_BREAK``, nulos por último)."""
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from typing import List, Sequence, Tuple
+
+import polars as pl
+
+TOP_K = int(os.getenv("GOLD_TOP_K", "10"))
+BAYES_PRIOR = float(os.getenv("GOLD_BAYES_PRIOR", "10"))
+
+TIE_BREAK = ("band_id", "band_name")  # crescente, depois das métricas
+COLUMNS = ["band_id", "band_name", "review_count", "avg_score", "bayesian_score"]
+ROW = "_row"
+
+
+@dataclass(frozen=True)
+class Ranking:
+    name: str
+    metrics: Tuple[str, ...]  # decrescentes; as seguintes desempatam a primeira
+
+    @property
+    def keys(self) -> List[str]:
+        return [*self.metrics, *TIE_BREAK]
+
+    @property
+    def descending(self) -> List[bool]:
+        return [True] * len(self.metrics) + [False] * len(TIE_BREAK)
+
+    def top_k_by(self, k: int) -> pl.Expr:
+        """``top_k_by`` sobre ``ROW`` com nulos por último em cada chave (o
+        ``top_k_by`` não tem ``nulls_last``: cada chave vem depois de ``is_null``)."""
+        by, reverse = [], []
+        for key, descending in zip(self.keys, self.descending):
+            by += [pl.col(key).is_null(), pl.col(key)]
+            reverse += [True, not descending]
+        return pl.col(ROW).top_k_by(by, k=k, reverse=reverse).alias(self.name)
+
+
+RANKINGS: List[Ranking] = [
+    Ranking("review_count", ("review_count", "avg_score")),
+    Ranking("avg_score", ("avg_score", "review_count")),
+    Ranking("bayesian_score", ("bayesian_score", "review_count")),
+]
+
+
+def with_bayesian(df: pl.LazyFrame, prior: float = BAYES_PRIOR) -> pl.LazyFrame:
+    """Acrescenta ``bayesian_score``; ``C`` é a média global das notas
+    (médias por banda ponderadas por ``review_count``)."""
+    scored = pl.col("avg_score").is_not_null()
+    mean = (pl.col("avg_score") * pl.col("review_count")).sum() / pl.col("review_count").filter(scored).sum()
+    v = pl.col("review_count").cast(pl.Float64)
+    return df.with_columns(
+        ((v * pl.col("avg_score").fill_null(mean) + prior * mean) / (v + prior)).alias("bayesian_score")
+    )
+
+
+def top_k(
+    df: pl.LazyFrame,
+    group: str,
+    rankings: Sequence[Ranking] = RANKINGS,
+    k: int = TOP_K,
+) -> pl.LazyFrame:
+    """As ``k`` melhores linhas de cada ``group`` em cada ranking, em formato
+    longo: ``group``, ``metric``, ``rank`` (1..k) e as demais colunas."""
+    rows = df.with_row_index(ROW)
+    # um único group_by: cada ranking devolve os índices das suas k linhas
+    picked = (
+        rows.group_by(group)
+        .agg([r.top_k_by(k) for r in rankings])
+        .unpivot(index=group, variable_name="metric", value_name=ROW)
+        .explode(ROW)
+        .join(rows.drop(group), on=ROW)
+    )
+    # só as k linhas de cada grupo são ordenadas, para numerar o rank
+    ranked = [
+        picked.filter(pl.col("metric") == r.name)
+        .sort([group, *r.keys], descending=[False, *r.descending], nulls_last=True, maintain_order=True)
+        .with_columns(pl.int_range(1, pl.len() + 1, dtype=pl.UInt32).over(group).alias("rank"))
+        for r in rankings
+    ]
+    columns = [c for c in df.collect_schema().names() if c != group]
+    return pl.concat(ranked).select([group, "metric", "rank", *columns])
+
+
+# ─── Daft ───────────────────────────────────────────────────────────
+def daft_with_bayesian(df, prior: float = BAYES_PRIOR):
+    """``with_bayesian`` para um ``daft.DataFrame``."""
+    import daft
+    from daft import col
+
+    totals = (
+        df.where(col("avg_score").not_null())
+        .agg((col("avg_score") * col("review_count")).sum().alias("total"), col("review_count").sum().alias("count"))
+        .to_pydict()
+    )
+    count = totals["count"][0] or 0
+    mean = totals["total"][0] / count if count else 0.0
+    v = col("review_count").cast(daft.DataType.float64())
+    return df.with_column("bayesian_score", (v * col("avg_score").fill_null(mean) + prior * mean) / (v + prior))
+
+
+def daft_top_k(df, group: str, rankings: Sequence[Ranking] = RANKINGS, k: int = TOP_K):
+    """``top_k`` para um ``daft.DataFrame``: ``row_number`` numa janela por ``group`` e filtro ``rank <= k``."""
+    import daft
+    from daft import Window, col
+    from daft.functions import row_number
+
+    result = None
+    for r in rankings:
+        # nulos por último em cada chave, como em ``Ranking.top_k_by``: ``is_null`` crescente antes da chave
+        by, desc = [], []
+        for key, descending in zip(r.keys, r.descending):
+            by += [col(key).is_null().alias(f"_{key}_null"), col(key)]
+            desc += [False, descending]
+        window = Window().partition_by(group).order_by(*by, desc=desc)
+        ranked = (
+            df.with_column("rank", row_number().over(window))
+            .where(col("rank") <= k)
+            .select(
+                col(group),
+                daft.lit(r.name).alias("metric"),
+                col("rank").cast(daft.DataType.uint32()),
+                *[col(c) for c in COLUMNS],
+            )
+        )
+        result = ranked if result is None else result.concat(ranked)
+    return result
@@ -0,0 +1,97 @@
+"""Cache de resultados por saída, pela impressão digital das entradas, do código e dos parâmetros
+(``RESULT_CACHE=0`` desliga)."""
+from __future__ import annotations
+
+import hashlib
+import inspect
+import json
+import os
+import threading
+from collections import defaultdict
+from typing import Any, Dict, Iterable, Optional
+
+import s3_scan
+from state_store import load_json, save_json
+
+ENABLED = os.getenv("RESULT_CACHE", "1") != "0"
+CACHE_PREFIX = "state/result_cache"
+
+_stats: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+_lock = threading.Lock()
+
+
+def entry_key(layer: str, output: str) -> str:
+    return f"{CACHE_PREFIX}/{layer}/{output}.json"
+
+
+def listing(s3, uri: str) -> Dict[str, str]:
+    """Objetos sob ``uri`` (objeto, diretório ou glob), chave → ``ETag:tamanho``."""
+    bucket, key = s3_scan.split_uri(uri)
+    prefix = key.split("*")[0].split("?")[0].split("[")[0]
+    return {
+        o["Key"]: f"{o['ETag']}:{o['Size']}"
+        for page in s3.get_paginator("list_objects_v2").paginate(Bucket=bucket, Prefix=prefix)
+        for o in page.get("Contents", [])
+    }
+
+
+def code_hash(*objects: Any) -> str:
+    """Hash do código-fonte de módulos/funções (tasks do Prefect pelo ``fn``)."""
+    digest = hashlib.sha256()
+    for obj in objects:
+        digest.update(inspect.getsource(getattr(obj, "fn", obj)).encode())
+    return digest.hexdigest()
+
+
+def fingerprint(inputs: Dict[str, Any], code: str, params: Optional[Dict[str, Any]] = None) -> str:
+    payload = {"inputs": inputs, "code": code, "params": params or {}}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def lookup(s3, bucket: str, layer: str, output: str, fp: str) -> Optional[str]:
+    """URI da saída gravada com a impressão digital ``fp``, se ainda intacta."""
+    entry = load_json(s3, bucket, entry_key(layer, output), None) if ENABLED else None
+    hit = (
+        entry is not None
+        and entry["fingerprint"] == fp
+        and listing(s3, entry["uri"]) == entry["files"]
+    )
+    record(layer, hit)
+    return entry["uri"] if hit else None
+
+
+def record(layer: str, hit: bool) -> None:
+    with _lock:
+        _stats[layer]["hits" if hit else "misses"] += 1
+
+
+def store(s3, bucket: str, layer: str, output: str, fp: str, uri: str) -> None:
+    if not ENABLED or not uri:
+        return
+    entry = {"fingerprint": fp, "uri": uri, "files": listing(s3, uri)}
+    save_json(s3, bucket, entry_key(layer, output), entry)
+
+
+def lookup_all(s3, bucket: str, layer: str, fingerprints: Dict[str, str]) -> Dict[str, str]:
+    """Saídas de ``fingerprints`` (saída → impressão digital) que estão no cache, com a URI."""
+    hits = {name: lookup(s3, bucket, layer, name, fp) for name, fp in fingerprints.items()}
+    return {name: uri for name, uri in hits.items() if uri}
+
+
+def required_inputs(dependencies: Dict[str, Iterable[str]], outputs: Iterable[str]) -> set:
+    """Entradas de que ``outputs`` dependem (``dependencies``: saída → entradas)."""
+    return {i for name in outputs for i in dependencies[name]}
+
+
+def cache_stats() -> Dict[str, Dict[str, int]]:
+    with _lock:
+        return {layer: dict(values) for layer, values in _stats.items()}
+
+
+def log_cache_stats(log=print) -> None:
+    """Loga e zera os hits/misses registrados desde a última chamada."""
+    with _lock:
+        stats = {layer: dict(values) for layer, values in _stats.items()}
+        _stats.clear()
+    for layer, s in sorted(stats.items()):
+        log(f"♻️ cache de resultados ({layer}): {s.get('hits', 0)} hit(s), {s.get('misses', 0)} miss(es)")
@@ -0,0 +1,87 @@
+"""Streams de leitura/escrita no S3 com memória limitada (multipart por partes e prefixo já consumido)."""
+from __future__ import annotations
+
+import io
+
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+
+class S3MultipartWriter(io.RawIOBase):
+    def __init__(self, s3, bucket: str, key: str, part_size: int = 8 * 1024 * 1024, **create_kwargs):
+        super().__init__()
+        self.s3 = s3
+        self.bucket = bucket
+        self.key = key
+        self.part_size = max(part_size, MIN_PART_SIZE)
+        self.bytes_written = 0
+        self._buf = bytearray()
+        self._parts = []
+        self._upload_id = s3.create_multipart_upload(Bucket=bucket, Key=key, **create_kwargs)["UploadId"]
+
+    def writable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.bytes_written
+
+    def write(self, data) -> int:
+        self._buf += data
+        self.bytes_written += len(data)
+        while len(self._buf) >= self.part_size:
+            self._upload_part(self._buf[:self.part_size])
+            del self._buf[:self.part_size]
+        return len(data)
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        try:
+            if self._buf or not self._parts:
+                self._upload_part(self._buf)
+                self._buf = bytearray()
+            self.s3.complete_multipart_upload(
+                Bucket=self.bucket,
+                Key=self.key,
+                UploadId=self._upload_id,
+                MultipartUpload={"Parts": self._parts},
+            )
+        except Exception:
+            self.abort()
+            raise
+        super().close()
+
+    def abort(self) -> None:
+        if not self.closed:
+            self.s3.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self._upload_id)
+            super().close()
+
+    def _upload_part(self, data) -> None:
+        number = len(self._parts) + 1
+        resp = self.s3.upload_part(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self._upload_id,
+            PartNumber=number,
+            Body=bytes(data),
+        )
+        self._parts.append({"ETag": resp["ETag"], "PartNumber": number})
+
+
+class PrefixedStream(io.RawIOBase):
+    def __init__(self, prefix: bytes, stream):
+        super().__init__()
+        self._prefix = memoryview(prefix)
+        self._stream = stream
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buf) -> int:
+        if len(self._prefix):
+            n = min(len(buf), len(self._prefix))
+            buf[:n] = self._prefix[:n]
+            self._prefix = self._prefix[n:]
+            return n
+        data = self._stream.read(len(buf))
+        buf[:len(data)] = data
+        return len(data)
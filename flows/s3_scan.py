@@ -0,0 +1,230 @@
+"""Scans Parquet lazy sobre S3/LocalStack/MinIO: GETs com ``Range`` só do footer e dos column chunks pedidos pelo plano."""
+from __future__ import annotations
+
+import fnmatch
+import io
+import os
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import polars as pl
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+
+import aws_clients
+import parquet_layout
+
+
+@dataclass
+class ScanStats:
+    uri: str
+    files: int = 0
+    object_bytes: int = 0
+    bytes_fetched: int = 0
+    requests: int = 0
+    opens: int = 0
+
+    @property
+    def passes(self) -> float:
+        """Quantas vezes os arquivos foram lidos pelos ``collect`` (abrir cada arquivo = 1 passada)."""
+        return self.opens / self.files if self.files else 0.0
+
+    @property
+    def ratio(self) -> float:
+        return self.bytes_fetched / self.object_bytes if self.object_bytes else 0.0
+
+
+# sem pre_buffer: cada column chunk é um GET feito na thread do scan; com ele
+# o pyarrow chama o arquivo Python de dentro do pool de I/O e aborta na saída
+PARQUET = ds.ParquetFileFormat(
+    default_fragment_scan_options=ds.ParquetFragmentScanOptions(pre_buffer=False),
+)
+
+_scans: List[ScanStats] = []
+_scans_lock = threading.Lock()
+
+
+def split_uri(uri: str) -> Tuple[str, str]:
+    bucket, _, key = uri.replace("s3://", "", 1).partition("/")
+    return bucket, key
+
+
+class S3RangeReader(io.RawIOBase):
+    """Arquivo somente-leitura com seek; cada ``read`` é um GET com ``Range`` (footers ficam em cache)."""
+
+    def __init__(self, handler: "S3ReadHandler", path: str):
+        super().__init__()
+        self.bucket, self.key = split_uri(path)
+        self.path = path
+        self.size = handler.sizes[path]
+        self._handler = handler
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        base = {os.SEEK_SET: 0, os.SEEK_CUR: self._pos, os.SEEK_END: self.size}[whence]
+        self._pos = max(0, base + offset)
+        return self._pos
+
+    def readinto(self, buf) -> int:
+        n = min(len(buf), self.size - self._pos)
+        if n <= 0:
+            return 0
+        h = self._handler
+        tail_start, tail = h.tails.get(self.path, (self.size, b""))
+        if self._pos >= tail_start:
+            data = tail[self._pos - tail_start:self._pos - tail_start + n]
+        else:
+            rng = f"bytes={self._pos}-{self._pos + n - 1}"
+            data = h.s3.get_object(Bucket=self.bucket, Key=self.key, Range=rng)["Body"].read()
+            with h.lock:
+                h.stats.bytes_fetched += len(data)
+                h.stats.requests += 1
+                if self._pos + len(data) == self.size:
+                    h.tails[self.path] = (self._pos, data)
+        buf[:len(data)] = data
+        self._pos += len(data)
+        return len(data)
+
+
+class S3ReadHandler(pafs.FileSystemHandler):
+    """Handler mínimo (só leitura) para ``pyarrow.fs.PyFileSystem``."""
+
+    def __init__(self, sizes: Dict[str, int], stats: ScanStats):
+        self.sizes = sizes
+        self.stats = stats
+        self.s3 = aws_clients.client("s3")
+        self.lock = threading.Lock()
+        self.tails: Dict[str, Tuple[int, bytes]] = {}
+
+    # o plano do LazyFrame é serializado (ex.: hash de cache do Prefect);
+    # client e lock são recriados do outro lado
+    def __getstate__(self):
+        return {"sizes": self.sizes, "stats": self.stats}
+
+    def __setstate__(self, state):
+        self.__init__(state["sizes"], state["stats"])
+
+    def get_type_name(self) -> str:
+        return "s3-range"
+
+    def equals(self, other) -> bool:
+        return self is other
+
+    def normalize_path(self, path: str) -> str:
+        return path
+
+    def get_file_info(self, paths):
+        return [
+            pafs.FileInfo(p, pafs.FileType.File, size=self.sizes[p]) if p in self.sizes
+            else pafs.FileInfo(p, pafs.FileType.NotFound)
+            for p in paths
+        ]
+
+    def get_file_info_selector(self, selector):
+        prefix = selector.base_dir.rstrip("/") + "/"
+        return [pafs.FileInfo(p, pafs.FileType.File, size=s) for p, s in self.sizes.items() if p.startswith(prefix)]
+
+    def open_input_file(self, path: str):
+        with self.lock:
+            self.stats.opens += 1
+        return pa.PythonFile(S3RangeReader(self, path), mode="r")
+
+    def open_input_stream(self, path: str):
+        return self.open_input_file(path)
+
+    def _read_only(self, *args, **kwargs):
+        raise NotImplementedError("filesystem de scan é somente leitura")
+
+    create_dir = delete_dir = delete_dir_contents = delete_root_dir_contents = _read_only
+    delete_file = move = copy_file = open_output_stream = open_append_stream = _read_only
+
+
+def resolve_objects(uri: str) -> Dict[str, int]:
+    """Lista os objetos de ``uri`` (objeto, diretório ``/`` ou glob) com seus tamanhos."""
+    s3 = aws_clients.client("s3")
+    bucket, key = split_uri(uri)
+    if not key.endswith("/") and not any(c in key for c in "*?["):
+        return {uri: s3.head_object(Bucket=bucket, Key=key)["ContentLength"]}
+
+    prefix = key.split("*")[0].split("?")[0].split("[")[0]
+    pattern = key if not key.endswith("/") else key + "*.parquet"
+    sizes = {}
+    for page in s3.get_paginator("list_objects_v2").paginate(Bucket=bucket, Prefix=prefix):
+        for o in page.get("Contents", []):
+            if fnmatch.fnmatchcase(o["Key"], pattern):
+                sizes[f"s3://{bucket}/{o['Key']}"] = o["Size"]
+    return sizes
+
+
+def _open(uri: Union[str, Sequence[str]]) -> Tuple[Dict[str, int], ScanStats, pafs.PyFileSystem]:
+    """Resolve os objetos de ``uri``, registra o scan e monta o filesystem de leitura."""
+    uris = [uri] if isinstance(uri, str) else list(uri)
+    sizes = {}
+    for u in uris:
+        sizes.update(resolve_objects(u))
+    if not sizes:
+        raise FileNotFoundError(f"❌ Nenhum Parquet em {uri}")
+    if not isinstance(uri, str):
+        uri = uris[0] if len(uris) == 1 else f"{uris[0]} (+{len(uris) - 1})"
+
+    stats = ScanStats(uri, files=len(sizes), object_bytes=sum(sizes.values()))
+    with _scans_lock:
+        _scans.append(stats)
+    return sizes, stats, pafs.PyFileSystem(S3ReadHandler(sizes, stats))
+
+
+def count_rows(uri: Union[str, Sequence[str]]) -> int:
+    """Linhas de ``uri`` pelo ``num_rows`` dos footers, sem ler nenhum column chunk."""
+    sizes, stats, fs = _open(uri)
+    rows = ds.dataset(list(sizes), format=PARQUET, filesystem=fs).count_rows()
+    stats.opens = 0  # só footers
+    return rows
+
+
+def scan_parquet(
+    uri: Union[str, Sequence[str]],
+    schemas_may_differ: bool = False,
+    sorted_by: Optional[str] = None,
+) -> pl.LazyFrame:
+    """LazyFrame sobre ``uri`` (ou uma lista deles) sem baixar nada até o ``collect``.
+    ``sorted_by`` só em chaves de join: filtros sobre essa coluna deixam de chegar ao scan."""
+    sizes, stats, fs = _open(uri)
+    if not schemas_may_differ:
+        dataset = ds.dataset(list(sizes), format=PARQUET, filesystem=fs)
+        lf = pl.scan_pyarrow_dataset(dataset)
+        if sorted_by and parquet_layout.is_sorted(dataset, sorted_by):
+            lf = lf.with_columns(pl.col(sorted_by).set_sorted())
+        stats.opens = 0  # a inferência de schema e a leitura dos footers não contam como passada
+        return lf
+
+    frames = [pl.scan_pyarrow_dataset(ds.dataset([p], format=PARQUET, filesystem=fs)) for p in sorted(sizes)]
+    stats.opens = 0  # a inferência de schema acima não conta como passada
+    return frames[0] if len(frames) == 1 else pl.concat(frames, how="diagonal_relaxed")
+
+
+def scan_stats(uri: Optional[str] = None) -> List[ScanStats]:
+    with _scans_lock:
+        return [s for s in _scans if uri is None or s.uri == uri]
+
+
+def log_scan_stats(log=print) -> None:
+    """Loga e esvazia os scans registrados desde a última chamada."""
+    with _scans_lock:
+        scans = list(_scans)
+        _scans.clear()
+    for s in scans:
+        log(
+            f"🔍 {s.uri}: {s.bytes_fetched}/{s.object_bytes} bytes buscados "
+            f"({100 * s.ratio:.1f}%) em {s.requests} GET(s), {s.files} arquivo(s), {s.passes:g} passada(s)"
+        )
@@ -0,0 +1,211 @@
+"""Registro central dos schemas dos datasets: tipos, nulabilidade e nomes na silver, usados pela bronze,
+pela silver, pelos flows Iceberg e pelo DDL do Trino (``python flows/schemas.py``)."""
+from __future__ import annotations
+
+import re
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import polars as pl
+import pyarrow as pa
+
+# tokens lidos como nulo nas colunas não textuais (a base usa "N/A" em formed_in)
+NULL_TOKENS = ("", "N/A")
+
+TRINO_TYPES = {pl.Int64: "BIGINT", pl.Int32: "INTEGER", pl.Float64: "DOUBLE", pl.String: "VARCHAR"}
+
+
+@dataclass(frozen=True)
+class Column:
+    name: str
+    dtype: pl.DataType
+    nullable: bool = True
+    rename: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class DatasetSchema:
+    name: str
+    columns: Tuple[Column, ...]
+    # colunas criadas pela silver (não existem no CSV)
+    derived: Tuple[Column, ...] = field(default_factory=tuple)
+    # chave primária (MERGE incremental da silver)
+    key: str = "id"
+
+    @property
+    def names(self) -> List[str]:
+        return [c.name for c in self.columns]
+
+    @property
+    def silver_columns(self) -> Tuple[Column, ...]:
+        return self.columns + self.derived
+
+    @property
+    def renames(self) -> Dict[str, str]:
+        return {c.name: c.rename for c in self.columns if c.rename}
+
+    @property
+    def required(self) -> List[str]:
+        return [c.name for c in self.columns if not c.nullable]
+
+    def column(self, name: str) -> Optional[Column]:
+        return next((c for c in self.silver_columns if c.name == name), None)
+
+    def polars_schema(self) -> Dict[str, pl.DataType]:
+        return {c.name: c.dtype for c in self.columns}
+
+    def typed(self, names: Iterable[str]) -> List[Column]:
+        """Colunas não textuais do registro entre ``names``."""
+        names = set(names)
+        return [c for c in self.columns if c.name in names and c.dtype != pl.String]
+
+
+ALBUMS = DatasetSchema("albums", (
+    Column("id", pl.Int64, nullable=False, rename="album_id"),
+    Column("band", pl.Int64, rename="band_id"),
+    Column("title", pl.String, rename="album_title"),
+    Column("year", pl.Int64),
+))
+
+BANDS = DatasetSchema("bands", (
+    Column("id", pl.Int64, nullable=False, rename="band_id"),
+    Column("name", pl.String, rename="band_name"),
+    Column("country", pl.String),
+    Column("status", pl.String),
+    Column("formed_in", pl.Int64),
+    Column("genre", pl.String),
+    Column("theme", pl.String),
+    Column("active", pl.String),
+), derived=(
+    Column("start_year", pl.Int64),
+))
+
+REVIEWS = DatasetSchema("reviews", (
+    Column("id", pl.Int64, nullable=False, rename="review_id"),
+    Column("album", pl.Int64, rename="album_id"),
+    Column("title", pl.String),
+    Column("score", pl.Float64),
+    Column("content", pl.String),
+))
+
+# saídas da silver montadas por junção
+MUSIC_CATALOG = DatasetSchema("music_catalog", (
+    Column("album_id", pl.Int64, nullable=False),
+    Column("album_title", pl.String),
+    Column("year", pl.Int64),
+    Column("band_id", pl.Int64),
+    Column("band_name", pl.String),
+    Column("country", pl.String),
+    Column("genre", pl.String),
+    Column("theme", pl.String),
+), key="album_id")
+
+ALBUM_REVIEWS = DatasetSchema("album_reviews", (
+    Column("review_id", pl.Int64, nullable=False),
+    Column("album_id", pl.Int64),
+    Column("album_title", pl.String),
+    Column("score", pl.Float64),
+    Column("content", pl.String),
+), key="review_id")
+
+REGISTRY: Dict[str, DatasetSchema] = {s.name: s for s in (ALBUMS, BANDS, REVIEWS, MUSIC_CATALOG, ALBUM_REVIEWS)}
+BASE_DATASETS = ("albums", "bands", "reviews")
+
+
+def get(dataset: str) -> DatasetSchema:
+    try:
+        return REGISTRY[dataset]
+    except KeyError:
+        raise KeyError(f"❌ Dataset '{dataset}' não está no registro de schemas") from None
+
+
+def _arrow_type(dtype: pl.DataType) -> pa.DataType:
+    return pl.Series([], dtype=dtype).to_arrow().type
+
+
+def cast_text(df: pl.DataFrame, dataset: str) -> Tuple[pl.DataFrame, Dict[str, int]]:
+    """Converte as colunas de texto para os tipos do registro sem falhar; devolve também as falhas por coluna."""
+    schema = REGISTRY.get(dataset)
+    typed = schema.typed(df.columns) if schema else []
+    if not typed:
+        return df, {}
+    text = {c.name: pl.col(c.name).str.strip_chars() for c in typed}
+    text = {name: pl.when(value.is_in(NULL_TOKENS)).then(None).otherwise(value) for name, value in text.items()}
+    cast = {c.name: text[c.name].cast(c.dtype, strict=False) for c in typed}
+    failures = df.select((text[n].is_not_null() & cast[n].is_null()).sum().alias(n) for n in cast).row(0, named=True)
+    return df.with_columns(value.alias(name) for name, value in cast.items()), failures
+
+
+def validate(df: pl.LazyFrame, dataset: str, layer: str = "silver") -> pl.LazyFrame:
+    """Confere colunas e tipos contra o registro (parts antigos da bronze, só texto, são convertidos aqui)."""
+    schema = get(dataset)
+    actual = df.collect_schema()
+    expected = schema.columns if layer == "bronze" else schema.silver_columns
+    casts = []
+    for c in expected:
+        if c.name not in actual:
+            if c in schema.derived:
+                continue
+            raise ValueError(f"❌ Coluna '{c.name}' ausente em {dataset}")
+        if actual[c.name] != c.dtype:
+            casts.append(pl.col(c.name).cast(c.dtype, strict=False))
+    return df.with_columns(casts) if casts else df
+
+
+def select_silver(df: pl.LazyFrame, dataset: str) -> pl.LazyFrame:
+    return df.select(c.name for c in get(dataset).silver_columns)
+
+
+# ─── Iceberg ────────────────────────────────────────────────────────
+def iceberg_schema(dataset: str, layer: str = "silver"):
+    from pyiceberg.schema import Schema
+    from pyiceberg.types import DoubleType, IntegerType, LongType, NestedField, StringType
+
+    types = {pl.Int64: LongType(), pl.Int32: IntegerType(), pl.Float64: DoubleType(), pl.String: StringType()}
+    schema = get(dataset)
+    columns = schema.columns if layer == "bronze" else schema.silver_columns
+    return Schema(*(
+        NestedField(i, c.name, types[c.dtype], required=not c.nullable)
+        for i, c in enumerate(columns, start=1)
+    ))
+
+
+def daft_schema(dataset: str) -> dict:
+    from daft import DataType
+
+    return {c.name: DataType.from_arrow_type(_arrow_type(c.dtype)) for c in get(dataset).columns}
+
+
+# ─── Trino ──────────────────────────────────────────────────────────
+def trino_table(dataset: str, layer: str) -> str:
+    schema = get(dataset)
+    columns = schema.columns if layer == "bronze" else schema.silver_columns
+    width = max(12, max(len(c.name) for c in columns) + 4)
+    lines = [
+        f"    {c.name.ljust(width)}{TRINO_TYPES[c.dtype]}{'' if c.nullable else ' NOT NULL'}"
+        for c in columns
+    ]
+    body = ",\n".join(lines)
+    return f"CREATE TABLE IF NOT EXISTS {layer}.{dataset} (\n{body}\n)\nWITH (format = 'PARQUET');\n"
+
+
+def trino_ddl() -> str:
+    tables = [trino_table(d, "bronze") for d in BASE_DATASETS]
+    tables += [trino_table(d, "silver") for d in REGISTRY]
+    return "\n".join(tables)
+
+
+GENERATED = re.compile(r"(-- BEGIN GENERATED[^\n]*\n).*?(-- END GENERATED)", re.S)
+
+
+def render_sql(path: Path) -> None:
+    """Reescreve o bloco gerado de ``trino_create_tables.sql`` a partir do registro."""
+    text = path.read_text()
+    path.write_text(GENERATED.sub(lambda m: m.group(1) + "\n" + trino_ddl() + "\n" + m.group(2), text))
+
+
+if __name__ == "__main__":
+    default = Path(__file__).resolve().parents[1] / "scripts" / "trino_create_tables.sql"
+    render_sql(Path(sys.argv[1]) if len(sys.argv) > 1 else default)
@@ -1,29 +1,37 @@
 from __future__ import annotations
 
-import io
-import os
-from typing import Dict
+import time
+from typing import Dict, List, Optional, Tuple, Union
 
-import boto3
 import polars as pl
 from prefect import flow, task
 
-# ─── Config AWS ─────────────────────────────────────────────────────
-ENDPOINT = os.getenv("LOCALSTACK_ENDPOINT", "http://localhost:4566")
-AWS_KWARGS = dict(
-    region_name="us-east-1",
-    aws_access_key_id="test",
-    aws_secret_access_key="test",
-    endpoint_url=ENDPOINT,
-)
+import aws_clients
+import parquet_layout
+import partitioning
+import parquet_codecs
+import quality
+import result_cache
+import s3_scan
+import schemas
+import silver_merge
 
 BUCKET = "csv-batch-bucket"
 BRONZE_PREFIX = "bronze"
 SILVER_PREFIX = "silver"
 
+# saída da silver → entradas da bronze de que ela depende
+DEPENDENCIES: Dict[str, List[str]] = {
+    "albums": ["albums"],
+    "bands": ["bands"],
+    "reviews": ["reviews"],
+    "music_catalog": ["albums", "bands"],
+    "album_reviews": ["albums", "reviews"],
+}
+
 
 def boto(service: str):
-    return boto3.client(service, **AWS_KWARGS)
+    return aws_clients.client(service)
 
 
 @task
@@ -36,54 +44,25 @@ def ensure_bucket() -> None:
 
 
 @task
-def read_bronze_parquet_lazy(key: str) -> pl.LazyFrame:
-    s3 = boto("s3")
-    path_parts = key.replace("s3://", "").split("/")
-    bucket = path_parts[0]
-    object_key = "/".join(path_parts[1:])
-    obj = s3.get_object(Bucket=bucket, Key=object_key)
-    return pl.read_parquet(io.BytesIO(obj["Body"].read())).lazy()
+def read_bronze_parquet_lazy(key: Union[str, List[str]]) -> pl.LazyFrame:
+    """Scan lazy de um Parquet, de um diretório (``.../``), de um glob ou de uma lista de parts da bronze."""
+    # parts convertidos separadamente podem ter inferido tipos diferentes
+    return s3_scan.scan_parquet(key, schemas_may_differ=True)
 
 
-def validate_schema(df: pl.LazyFrame, expected_schema: dict, name: str):
-    actual_schema = df.collect_schema()
-    for col, expected_type in expected_schema.items():
-        if col not in actual_schema:
-            raise ValueError(f"❌ Coluna '{col}' ausente em {name}")
+def validate_schema(df: pl.LazyFrame, name: str) -> pl.LazyFrame:
+    """Valida ``df`` contra o registro de schemas (bronze já chega tipada)."""
+    return schemas.validate(df, name, layer="bronze")
 
 
 @task
 def transform_albums(df: pl.LazyFrame) -> pl.LazyFrame:
-    expected_schema = {
-        "id": pl.Int64,
-        "title": pl.Utf8,
-        "band": pl.Int64,
-        "year": pl.Int64,
-    }
-    validate_schema(df, expected_schema, "albums")
-    return df.with_columns([
-        pl.col("id").cast(pl.Int64),
-        pl.col("band").cast(pl.Int64),
-        pl.col("year").cast(pl.Int64)
-    ])
+    return validate_schema(df, "albums")
 
 
 @task
 def transform_bands(df: pl.LazyFrame) -> pl.LazyFrame:
-    expected_schema = {
-        "id": pl.Int64,
-        "name": pl.Utf8,
-        "country": pl.Utf8,
-        "genre": pl.Utf8,
-        "theme": pl.Utf8,
-        "status": pl.Utf8,
-        "formed_in": pl.Int64,
-        "active": pl.Utf8,
-    }
-    validate_schema(df, expected_schema, "bands")
-    return df.with_columns([
-        pl.col("id").cast(pl.Int64),
-        pl.col("formed_in").cast(pl.Int64, strict=False),
+    return validate_schema(df, "bands").with_columns([
         pl.when(pl.col("status") == "Active")
         .then(pl.lit("Active"))
         .otherwise(pl.col("status"))
@@ -97,103 +76,243 @@ def transform_bands(df: pl.LazyFrame) -> pl.LazyFrame:
 
 @task
 def transform_reviews(df: pl.LazyFrame) -> pl.LazyFrame:
-    expected_schema = {
-        "id": pl.Int64,
-        "album": pl.Int64,
-        "score": pl.Float64,
-        "content": pl.Utf8
-    }
-    validate_schema(df, expected_schema, "reviews")
-    return (
-        df.filter(~pl.col("id").cast(str).str.contains("id"))
-        .with_columns([
-            pl.col("id").cast(pl.Int64),
-            pl.col("album").cast(pl.Int64),
-            pl.col("score").cast(pl.Float64),
-            pl.col("content").str.replace_all(r"\|", ",").alias("content")
-        ])
+    return validate_schema(df, "reviews").with_columns(
+        pl.col("content").str.replace_all(r"\|", ",").alias("content")
     )
 
 
 @task
 def create_music_catalog(albums: pl.LazyFrame, bands: pl.LazyFrame) -> pl.LazyFrame:
-    albums = albums.rename({
-        "id": "album_id",
-        "title": "album_title",
-        "band": "band_id",
-    })
-    bands = bands.rename({
-        "id": "band_id",
-        "name": "band_name",
-    })
-
-    return albums.join(bands, on="band_id", how="left").select([
-        "album_id", "album_title", "year",
-        "band_id", "band_name", "country",
-        "genre", "theme",
-    ])
+    albums = albums.rename(schemas.ALBUMS.renames)
+    bands = bands.rename(schemas.BANDS.renames)
+    return schemas.select_silver(albums.join(bands, on="band_id", how="left"), "music_catalog")
 
 
 @task
 def create_album_reviews(albums: pl.LazyFrame, reviews: pl.LazyFrame) -> pl.LazyFrame:
-    albums = albums.rename({"id": "album_id", "title": "album_title"})
-    reviews = reviews.rename({"id": "review_id", "album": "album_id"})
+    albums = albums.rename(schemas.ALBUMS.renames).select("album_id", "album_title")
+    reviews = reviews.rename(schemas.REVIEWS.renames)
+    return schemas.select_silver(reviews.join(albums, on="album_id", how="left"), "album_reviews")
 
-    return reviews.join(albums, on="album_id", how="left").select([
-        "review_id", "album_id", "album_title",
-        "score", "content",
-    ])
+
+TRANSFORMS = {"albums": transform_albums, "bands": transform_bands, "reviews": transform_reviews}
 
 
 @task
-def write_silver_parquet(df: pl.LazyFrame, dataset_name: str) -> str:
-    df_collected = df.collect()
+def write_silver_parquet(df: pl.LazyFrame, dataset_name: str, partitioned: bool = False) -> str:
+    """Grava ``silver/<nome>/<nome>.parquet`` ou, com ``partitioned`` e uma
+    partição definida para o dataset, ``silver/<nome>/<coluna>=<valor>/``."""
+    df_collected, profile = quality.collect_profiled(df, dataset_name)
+    quality.record("silver", dataset_name, profile)
     s3 = boto("s3")
-    buf = io.BytesIO()
-    df_collected.write_parquet(buf, compression="snappy")
-    buf.seek(0)
-
-    key = f"{SILVER_PREFIX}/{dataset_name}/{dataset_name}.parquet"
-    s3.put_object(Bucket=BUCKET, Key=key, Body=buf.getvalue())
+    # execução completa: o layout por faixas (modo incremental) deixa de valer
+    silver_merge.drop(s3, BUCKET, SILVER_PREFIX, dataset_name)
+    prefix = f"{SILVER_PREFIX}/{dataset_name}"
+    spec = partitioning.SPECS.get(dataset_name) if partitioned else None
+    if spec is not None:
+        sort_by = parquet_layout.sort_keys(dataset_name)
+        keys = partitioning.write_partitioned(s3, BUCKET, prefix, df_collected, spec, sort_by)
+        partitioning.remove_stale(s3, BUCKET, prefix, keys)
+        return f"s3://{BUCKET}/{prefix}/"
+
+    key = f"{prefix}/{dataset_name}.parquet"
+    s3.put_object(Bucket=BUCKET, Key=key, Body=parquet_layout.to_bytes(df_collected, dataset_name))
+    partitioning.remove_stale(s3, BUCKET, prefix, [key])
     return f"s3://{BUCKET}/{key}"
 
 
-@flow(name="silver-transform-flow")
-def silver_transform_flow(bronze_paths: Dict[str, str]) -> Dict[str, str]:
-    ensure_bucket()
-    result = {}
+@task
+def publish_quality_report() -> str:
+    return quality.publish(boto("s3"), BUCKET, "silver")
+
+
+@task
+def materialize_inputs(transformed: Dict[str, pl.LazyFrame]) -> Dict[str, pl.LazyFrame]:
+    """Coleta as entradas transformadas juntas, uma vez, para todas as saídas reaproveitarem."""
+    names = list(transformed)
+    frames = pl.collect_all([transformed[name] for name in names])
+    return {name: df.lazy() for name, df in zip(names, frames)}
+
+
+# ─── Cache de resultados ────────────────────────────────────────────
+def silver_outputs(inputs: List[str]) -> List[str]:
+    """Saídas que uma execução completa gera a partir das entradas ``inputs``."""
+    outputs = []
+    if {"albums", "bands"} <= set(inputs):
+        outputs += ["albums", "bands", "music_catalog"]
+    if "reviews" in inputs:
+        outputs.append("reviews")
+        if {"albums", "bands"} <= set(inputs):
+            outputs.append("album_reviews")
+    return outputs
 
-    dfs = {name: read_bronze_parquet_lazy(path) for name, path in bronze_paths.items()}
-    transformed = {}
 
-    if "albums" in dfs and "bands" in dfs:
-        transformed["albums"] = transform_albums(dfs["albums"])
-        transformed["bands"] = transform_bands(dfs["bands"])
-        result["albums"] = write_silver_parquet(transformed["albums"], "albums")
-        result["bands"] = write_silver_parquet(transformed["bands"], "bands")
-        music_catalog = create_music_catalog(transformed["albums"], transformed["bands"])
-        result["music_catalog"] = write_silver_parquet(music_catalog, "music_catalog")
+@task
+def fingerprint_outputs(bronze_paths: Dict[str, str], partitioned: bool) -> Dict[str, str]:
+    """Impressão digital de cada saída: objetos da bronze de que ela depende,
+    código da silver e parâmetros."""
+    s3 = boto("s3")
+    inputs = {name: result_cache.listing(s3, path) for name, path in bronze_paths.items()}
+    code = result_cache.code_hash(
+        schemas, parquet_layout, parquet_codecs, partitioning,
+        *TRANSFORMS.values(), create_music_catalog, create_album_reviews, write_silver_parquet,
+    )
+    return {
+        name: result_cache.fingerprint({i: inputs[i] for i in DEPENDENCIES[name]}, code, {"partitioned": partitioned})
+        for name in silver_outputs(list(bronze_paths))
+    }
+
+
+@task(log_prints=True)
+def lookup_cached_outputs(fingerprints: Dict[str, str]) -> Dict[str, str]:
+    cached = result_cache.lookup_all(boto("s3"), BUCKET, "silver", fingerprints)
+    for name, uri in cached.items():
+        print(f"♻️ {name}: entradas e código inalterados, mantido {uri}")
+    return cached
+
+
+@task
+def remember_output(name: str, fingerprint: str, uri: str) -> None:
+    result_cache.store(boto("s3"), BUCKET, "silver", name, fingerprint, uri)
+
+
+# ─── Modo incremental (MERGE por chave) ─────────────────────────────
+def read_silver_lazy(dataset: str, keys: Optional[pl.Series] = None) -> pl.LazyFrame:
+    """Silver incremental atual; com ``keys`` lê só as faixas dessas chaves e filtra por elas."""
+    if keys is None:
+        return partitioning.scan(boto("s3"), BUCKET, SILVER_PREFIX, dataset)
+    uris = silver_merge.current_uris(boto("s3"), BUCKET, SILVER_PREFIX, dataset, keys)
+    schema = schemas.get(dataset)
+    if not uris:
+        return pl.LazyFrame(schema={c.name: c.dtype for c in schema.silver_columns})
+    return s3_scan.scan_parquet(uris).filter(pl.col(schema.key).is_in(keys))
+
 
-    if "reviews" in dfs:
-        transformed["reviews"] = transform_reviews(dfs["reviews"])
-        result["reviews"] = write_silver_parquet(transformed["reviews"], "reviews")
+@task(log_prints=True)
+def plan_silver_delta(dataset: str, bronze_path: str) -> Tuple[List[str], Dict[str, str]]:
+    """Parts da bronze que mudaram desde o último MERGE de ``dataset`` e a listagem atual."""
+    s3 = boto("s3")
+    manifest = silver_merge.load_manifest(s3, BUCKET, SILVER_PREFIX, dataset, schemas.get(dataset).key)
+    sources = silver_merge.list_sources(s3, bronze_path)
+    changed = silver_merge.changed_sources(sources, manifest)
+    print(f"🔁 {dataset}: {len(changed)} part(s) novo(s)/alterado(s) na bronze")
+    return [f"s3://{BUCKET}/{k}" for k in changed], sources
+
+
+@task(log_prints=True)
+def merge_silver_delta(
+    delta: pl.LazyFrame,
+    dataset: str,
+    run_id: int,
+    sources: Optional[Dict[str, str]] = None,
+) -> pl.DataFrame:
+    """Coleta o delta, faz o MERGE nas faixas afetadas e devolve as linhas alteradas."""
+    s3 = boto("s3")
+    df, profile = quality.collect_profiled(delta, dataset)
+    quality.record("silver", dataset, profile)
+
+    manifest = silver_merge.load_manifest(s3, BUCKET, SILVER_PREFIX, dataset, schemas.get(dataset).key)
+    if sources is not None:
+        manifest["sources"] = sources
+    ranges = silver_merge.merge(s3, BUCKET, SILVER_PREFIX, dataset, df, manifest, run_id)
+    print(f"🔁 {dataset}: {df.height} linha(s) → {len(ranges)} faixa(s) reescrita(s)")
+    return df
+
+
+def silver_incremental(bronze_paths: Dict[str, str], run_id: int) -> Dict[str, str]:
+    changed: Dict[str, pl.DataFrame] = {}
+    for name, path in bronze_paths.items():
+        parts, sources = plan_silver_delta(name, path)
+        if parts:
+            delta = TRANSFORMS[name](read_bronze_parquet_lazy(parts))
+            changed[name] = merge_silver_delta(delta, name, run_id, sources)
+
+    empty = pl.Series([], dtype=pl.Int64)
+    album_ids = changed["albums"]["id"] if "albums" in changed else empty
+    band_ids = changed["bands"]["id"] if "bands" in changed else empty
+    review_ids = changed["reviews"]["id"] if "reviews" in changed else empty
+
+    # derivados: só as linhas cujas entradas mudaram. Mudança só do lado da
+    # chave lê apenas as faixas dela; mudança na dimensão (banda/álbum) precisa
+    # achar as linhas que apontam para ela em todas as faixas.
+    if {"albums", "bands"} <= set(bronze_paths) and (len(album_ids) or len(band_ids)):
+        if len(band_ids):
+            albums = read_silver_lazy("albums").filter(pl.col("id").is_in(album_ids) | pl.col("band").is_in(band_ids))
+        else:
+            albums = read_silver_lazy("albums", album_ids)
+        catalog = create_music_catalog(albums, read_silver_lazy("bands"))
+        merge_silver_delta(catalog, "music_catalog", run_id)
+    if {"albums", "reviews"} <= set(bronze_paths) and (len(album_ids) or len(review_ids)):
+        if len(album_ids):
+            reviews = read_silver_lazy("reviews").filter(pl.col("id").is_in(review_ids) | pl.col("album").is_in(album_ids))
+        else:
+            reviews = read_silver_lazy("reviews", review_ids)
+        album_reviews = create_album_reviews(read_silver_lazy("albums"), reviews)
+        merge_silver_delta(album_reviews, "album_reviews", run_id)
+
+    outputs = list(bronze_paths)
+    if {"albums", "bands"} <= set(bronze_paths):
+        outputs.append("music_catalog")
+    if {"albums", "reviews"} <= set(bronze_paths):
+        outputs.append("album_reviews")
+    return {name: f"s3://{BUCKET}/{silver_merge.manifest_key(SILVER_PREFIX, name)}" for name in outputs}
 
-        if "albums" in transformed:
-            album_reviews = create_album_reviews(transformed["albums"], transformed["reviews"])
-            result["album_reviews"] = write_silver_parquet(album_reviews, "album_reviews")
 
+@flow(name="silver-transform-flow")
+def silver_transform_flow(
+    bronze_paths: Dict[str, str],
+    single_pass: bool = False,
+    incremental: bool = False,
+    partitioned: bool = False,
+) -> Dict[str, str]:
+    """Gera a silver; ``single_pass``, ``incremental`` (MERGE, ver ``silver_merge``) e ``partitioned`` escolhem o modo."""
+    ensure_bucket()
+    if incremental:
+        result = silver_incremental(bronze_paths, time.time_ns())
+        publish_quality_report()
+        s3_scan.log_scan_stats()
+        aws_clients.log_client_stats()
+        return result
+
+    # saídas cujas entradas e código não mudaram desde a última gravação não são recalculadas
+    fingerprints = fingerprint_outputs(bronze_paths, partitioned)
+    cached = lookup_cached_outputs(fingerprints)
+    pending = [name for name in fingerprints if name not in cached]
+    needed = result_cache.required_inputs(DEPENDENCIES, pending)
+
+    dfs = {name: read_bronze_parquet_lazy(path) for name, path in bronze_paths.items() if name in needed}
+    transformed = {name: TRANSFORMS[name](df) for name, df in dfs.items()}
+    if single_pass:
+        transformed = materialize_inputs(transformed)
+
+    outputs = {name: transformed[name] for name in ("albums", "bands", "reviews") if name in pending}
+    if "music_catalog" in pending:
+        outputs["music_catalog"] = create_music_catalog(transformed["albums"], transformed["bands"])
+    if "album_reviews" in pending:
+        outputs["album_reviews"] = create_album_reviews(transformed["albums"], transformed["reviews"])
+
+    written = {}
+    for name, df in outputs.items():
+        written[name] = write_silver_parquet(df, name, partitioned)
+        remember_output(name, fingerprints[name], written[name])
+    result = {name: cached.get(name) or written[name] for name in fingerprints}
+    publish_quality_report()
+
+    s3_scan.log_scan_stats()
+    aws_clients.log_client_stats()
+    result_cache.log_cache_stats()
     return result
 
 
 # ─── Execução direta (útil para dev/local) ───────────────────────────────
 if __name__ == "__main__":
     example_bronze_paths = {
-        "albums": f"s3://{BUCKET}/{BRONZE_PREFIX}/albums/albums.parquet",
-        "bands": f"s3://{BUCKET}/{BRONZE_PREFIX}/bands/bands.parquet",
-        "reviews": f"s3://{BUCKET}/{BRONZE_PREFIX}/reviews/reviews.parquet"
+        "albums": f"s3://{BUCKET}/{BRONZE_PREFIX}/albums/",
+        "bands": f"s3://{BUCKET}/{BRONZE_PREFIX}/bands/",
+        "reviews": f"s3://{BUCKET}/{BRONZE_PREFIX}/reviews/"
     }
 
-    silver_paths = silver_transform_flow(example_bronze_paths)
+    silver_paths = silver_transform_flow(example_bronze_paths, single_pass=True)
 
     print("\n✨ Camada Silver gerada:")
     for name, path in silver_paths.items():
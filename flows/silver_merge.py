@@ -0,0 +1,111 @@
+"""MERGE por chave da silver em arquivos ``silver/<dataset>/range=<início>/part-<run>.parquet``, com um manifesto
+das faixas atuais e dos parts da bronze já incorporados."""
+from __future__ import annotations
+
+import os
+from typing import Dict, Iterable, List, Optional
+
+import polars as pl
+
+import parquet_layout
+import s3_scan
+from state_store import load_json, save_json
+
+RANGE_SIZE = int(os.getenv("SILVER_RANGE_SIZE", "100000"))
+
+
+def manifest_key(prefix: str, dataset: str) -> str:
+    return f"{prefix}/{dataset}/_manifest.json"
+
+
+def load_manifest(s3, bucket: str, prefix: str, dataset: str, key: str) -> dict:
+    default = {"key": key, "range_size": RANGE_SIZE, "sources": {}, "partitions": {}}
+    return load_json(s3, bucket, manifest_key(prefix, dataset), default)
+
+
+def current_uris(
+    s3,
+    bucket: str,
+    prefix: str,
+    dataset: str,
+    keys: Optional[Iterable[int]] = None,
+) -> Optional[List[str]]:
+    """Arquivos atuais do dataset (só as faixas que podem conter ``keys``); ``None`` se ele não é incremental."""
+    manifest = load_json(s3, bucket, manifest_key(prefix, dataset), None)
+    if manifest is None:
+        return None
+    partitions = sorted(manifest["partitions"].items(), key=lambda i: int(i[0]))
+    if keys is not None:
+        size = manifest["range_size"]
+        wanted = {str(k // size * size) for k in keys}
+        partitions = [(start, p) for start, p in partitions if start in wanted]
+    return [f"s3://{bucket}/{p['file']}" for _, p in partitions]
+
+
+def list_sources(s3, uri: str) -> Dict[str, str]:
+    """Parts da bronze em ``uri`` (diretório), chave → ETag."""
+    bucket, prefix = s3_scan.split_uri(uri)
+    return {
+        o["Key"]: o["ETag"]
+        for page in s3.get_paginator("list_objects_v2").paginate(Bucket=bucket, Prefix=prefix)
+        for o in page.get("Contents", [])
+        if o["Key"].endswith(".parquet")
+    }
+
+
+def changed_sources(sources: Dict[str, str], manifest: dict) -> List[str]:
+    """Parts ainda não incorporados ou com ETag diferente do incorporado."""
+    return sorted(k for k, etag in sources.items() if manifest["sources"].get(k) != etag)
+
+
+def delete_keys(s3, bucket: str, keys: Iterable[str]) -> None:
+    keys = list(keys)
+    for start in range(0, len(keys), 1000):
+        batch = keys[start:start + 1000]
+        s3.delete_objects(Bucket=bucket, Delete={"Objects": [{"Key": k} for k in batch], "Quiet": True})
+
+
+def merge(
+    s3,
+    bucket: str,
+    prefix: str,
+    dataset: str,
+    delta: pl.DataFrame,
+    manifest: dict,
+    run_id: int,
+) -> List[int]:
+    """Upsert de ``delta`` (última versão de cada chave vence); grava o manifesto e devolve as faixas reescritas."""
+    key, size = manifest["key"], manifest["range_size"]
+    if delta.is_empty():
+        save_json(s3, bucket, manifest_key(prefix, dataset), manifest)
+        return []
+
+    delta = delta.unique(subset=key, keep="last", maintain_order=True)
+    stale = []
+    ranges = delta.with_columns((pl.col(key) // size * size).alias("_range"))
+    for (start,), part in sorted(ranges.partition_by("_range", as_dict=True).items()):
+        part = part.drop("_range")
+        entry = manifest["partitions"].get(str(start))
+        if entry:
+            current = s3_scan.scan_parquet(f"s3://{bucket}/{entry['file']}").collect()
+            part = pl.concat([current.join(part.select(key), on=key, how="anti"), part], how="diagonal_relaxed")
+            stale.append(entry["file"])
+
+        # ordenado pela chave: as faixas, na ordem do manifesto, formam um dataset ordenado
+        file_key = f"{prefix}/{dataset}/range={start}/part-{run_id}.parquet"
+        s3.put_object(Bucket=bucket, Key=file_key, Body=parquet_layout.to_bytes(part, dataset, [key]))
+        manifest["partitions"][str(start)] = {"file": file_key, "rows": part.height}
+
+    manifest["run_id"] = run_id
+    save_json(s3, bucket, manifest_key(prefix, dataset), manifest)
+    delete_keys(s3, bucket, (k for k in stale if k not in {p["file"] for p in manifest["partitions"].values()}))
+    return sorted(int(s) for s in ranges["_range"].unique())
+
+
+def drop(s3, bucket: str, prefix: str, dataset: str) -> None:
+    """Remove manifesto e faixas (a execução completa volta a gravar um arquivo único)."""
+    manifest = load_json(s3, bucket, manifest_key(prefix, dataset), None)
+    if manifest is None:
+        return
+    s3.delete_object(Bucket=bucket, Key=manifest_key(prefix, dataset))
+    delete_keys(s3, bucket, (p["file"] for p in manifest["partitions"].values()))
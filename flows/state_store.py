@@ -0,0 +1,18 @@
+"""Estado dos flows guardado como JSON no próprio bucket (``state/…``)."""
+from __future__ import annotations
+
+import json
+from typing import Any
+
+
+def load_json(s3, bucket: str, key: str, default: Any) -> Any:
+    try:
+        obj = s3.get_object(Bucket=bucket, Key=key)
+    except s3.exceptions.NoSuchKey:
+        return default
+    return json.loads(obj["Body"].read())
+
+
+def save_json(s3, bucket: str, key: str, value: Any) -> None:
+    body = json.dumps(value, indent=1, sort_keys=True).encode()
+    s3.put_object(Bucket=bucket, Key=key, Body=body, ContentType="application/json")
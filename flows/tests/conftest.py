@@ -0,0 +1,53 @@
+"""S3 do moto num servidor local para os testes dos flows."""
+from __future__ import annotations
+
+import os
+import socket
+import sys
+from pathlib import Path
+
+import pytest
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+PORT = _free_port()
+# antes de importar os flows: aws_clients lê o endpoint no import
+os.environ["LOCALSTACK_ENDPOINT"] = f"http://127.0.0.1:{PORT}"
+os.environ.setdefault("AWS_MAX_ATTEMPTS", "2")
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+@pytest.fixture(scope="session")
+def moto_server():
+    from moto.server import ThreadedMotoServer
+
+    server = ThreadedMotoServer(ip_address="127.0.0.1", port=PORT, verbose=False)
+    server.start()
+    yield
+    server.stop()
+
+
+@pytest.fixture
+def s3(moto_server):
+    """Bucket dos flows vazio e caches de processo zerados."""
+    import aws_clients
+    import bronze
+    import gold_publish
+    import quality
+    import requests
+    import result_cache
+
+    requests.post(f"{aws_clients.ENDPOINT}/moto-api/reset")
+    bronze._dedup_indexes.clear()
+    bronze._compacted.clear()
+    quality._reports.clear()
+    gold_publish._cache.clear()
+    result_cache._stats.clear()
+    client = aws_clients.client("s3")
+    client.create_bucket(Bucket=bronze.BUCKET)
+    return client
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import io
+
+import polars as pl
+import pytest
+
+import bronze
+import quality
+
+ALBUMS = b"id,band,title,year\n1,10,Alpha,1990\n2,10,Beta,1992\n"
+
+
+def put_landing(s3, key: str, body: bytes) -> None:
+    s3.put_object(Bucket=bronze.BUCKET, Key=key, Body=body)
+
+
+def read_bronze(s3, dataset: str) -> pl.DataFrame:
+    frames = [
+        pl.read_parquet(io.BytesIO(s3.get_object(Bucket=bronze.BUCKET, Key=o["Key"])["Body"].read()))
+        for o in bronze.iter_objects(s3, f"{bronze.BRONZE_PREFIX}/{dataset}/")
+        if o["Key"].endswith(".parquet")
+    ]
+    return pl.concat(frames, how="diagonal_relaxed") if frames else pl.DataFrame()
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_dedup_rerun_keeps_rows(s3, streaming):
+    put_landing(s3, "landing/albums/a.csv", ALBUMS)
+    first = bronze.csv_s3_to_parquet.fn("landing/albums/a.csv", streaming=streaming, dedup=True)
+    bronze.save_dedup_indexes.fn()
+
+    # mesma versão do objeto de novo (ex.: o estado da bronze não chegou a ser salvo)
+    bronze._dedup_indexes.clear()
+    second = bronze.csv_s3_to_parquet.fn("landing/albums/a.csv", streaming=streaming, dedup=True)
+
+    assert first == second
+    assert sorted(read_bronze(s3, "albums")["id"].to_list()) == [1, 2]
+
+
+def test_dedup_rerun_registers_rows_of_unsaved_index(s3):
+    put_landing(s3, "landing/albums/a.csv", ALBUMS)
+    bronze.csv_s3_to_parquet.fn("landing/albums/a.csv", dedup=True)
+    # o índice não foi salvo: a reexecução põe as linhas do part nele
+    bronze._dedup_indexes.clear()
+    bronze.csv_s3_to_parquet.fn("landing/albums/a.csv", dedup=True)
+
+    put_landing(s3, "landing/albums/b.csv", ALBUMS + b"3,11,Gamma,2001\n")
+    bronze.csv_s3_to_parquet.fn("landing/albums/b.csv", dedup=True)
+
+    assert sorted(read_bronze(s3, "albums")["id"].to_list()) == [1, 2, 3]
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_dedup_new_etag_replaces_previous_part(s3, streaming):
+    put_landing(s3, "landing/albums/a.csv", ALBUMS)
+    put_landing(s3, "landing/albums/b.csv", b"id,band,title,year\n1,10,Alpha,1990\n3,11,Gamma,2001\n")
+    for key in ("landing/albums/a.csv", "landing/albums/b.csv"):
+        bronze.csv_s3_to_parquet.fn(key, streaming=streaming, dedup=True)
+    bronze.save_dedup_indexes.fn()
+
+    # a.csv reescrito: a linha 2 sai, a 4 entra; a 1 continua (e só existia no part antigo de a)
+    put_landing(s3, "landing/albums/a.csv", b"id,band,title,year\n1,10,Alpha,1990\n4,12,Delta,2005\n")
+    bronze._dedup_indexes.clear()
+    uri = bronze.csv_s3_to_parquet.fn("landing/albums/a.csv", streaming=streaming, dedup=True)
+
+    keys = [o["Key"] for o in bronze.iter_objects(s3, "bronze/albums/part-a-")]
+    assert keys == [uri.split("/", 3)[-1]]
+    assert sorted(read_bronze(s3, "albums")["id"].to_list()) == [1, 3, 4]
+
+
+@pytest.mark.parametrize("dedup", [False, True])
+def test_rerun_after_compaction_does_not_duplicate(s3, dedup):
+    put_landing(s3, "landing/albums/a.csv", ALBUMS)
+    put_landing(s3, "landing/albums/b.csv", b"id,band,title,year\n3,11,Gamma,2001\n")
+    for _ in range(2):
+        for key in ("landing/albums/a.csv", "landing/albums/b.csv"):
+            assert bronze.csv_s3_to_parquet.fn(key, dedup=dedup)
+        if dedup:
+            bronze.save_dedup_indexes.fn()
+        bronze.compact_bronze.fn("albums")
+        bronze._compacted.clear()
+        bronze._dedup_indexes.clear()
+
+    keys = [o["Key"] for o in bronze.iter_objects(s3, "bronze/albums/")]
+    assert len(keys) == 1 and "/compact-" in keys[0]
+    assert sorted(read_bronze(s3, "albums")["id"].to_list()) == [1, 2, 3]
+
+
+def test_compaction_deletes_leftover_parts(s3):
+    put_landing(s3, "landing/albums/a.csv", ALBUMS)
+    put_landing(s3, "landing/albums/b.csv", b"id,band,title,year\n3,11,Gamma,2001\n")
+    for key in ("landing/albums/a.csv", "landing/albums/b.csv"):
+        bronze.csv_s3_to_parquet.fn(key)
+    parts = {k: s3.get_object(Bucket=bronze.BUCKET, Key=k)["Body"].read() for k in
+             (o["Key"] for o in bronze.iter_objects(s3, "bronze/albums/"))}
+    bronze.compact_bronze.fn("albums")
+    # compactação interrompida antes de apagar os parts
+    for key, body in parts.items():
+        s3.put_object(Bucket=bronze.BUCKET, Key=key, Body=body)
+
+    bronze.compact_bronze.fn("albums")
+
+    assert sorted(read_bronze(s3, "albums")["id"].to_list()) == [1, 2, 3]
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_malformed_numeric_becomes_null_and_is_counted(s3, streaming):
+    put_landing(s3, "landing/bands/a.csv", (
+        b"id,name,country,status,formed_in,genre,theme,active\n"
+        b"1,N/A,Norway,Active,N/A,Black,Winter,1991-present\n"
+        b"2,Beta,,Split-up,?,Death,Gore,1990-1995\n"
+        b"x,Gamma,Chile,Active,1999,Thrash,War,1999-present\n"
+    ))
+    assert bronze.csv_s3_to_parquet.fn("landing/bands/a.csv", streaming=streaming)
+
+    df = read_bronze(s3, "bands").sort("id")
+    assert df["id"].to_list() == [1, 2]
+    assert df["formed_in"].to_list() == [None, None]
+    # tokens nulos só valem nas colunas não textuais
+    assert df["name"].to_list() == ["N/A", "Beta"]
+    assert df["country"].to_list() == ["Norway", None]
+    assert quality._reports["bronze"]["bands"]["cast_failures"] == {"id": 1, "formed_in": 1}
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_empty_object_writes_empty_part(s3, streaming):
+    put_landing(s3, "landing/albums/empty.csv", b"")
+    uri = bronze.csv_s3_to_parquet.fn("landing/albums/empty.csv", streaming=streaming, dedup=True)
+
+    assert uri
+    df = read_bronze(s3, "albums")
+    assert df.is_empty() and df.schema["id"] == pl.Int64
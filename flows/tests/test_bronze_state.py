@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import bronze
+
+HEADER = b"id,band,title,year\n"
+
+
+def land(s3, hour: str, name: str) -> str:
+    key = f"landing/albums/2024/05/01/{hour}/{name}"
+    s3.put_object(Bucket=bronze.BUCKET, Key=key, Body=HEADER + b"1,10,Alpha,1990\n")
+    return key
+
+
+def run(state: dict):
+    objects = bronze.list_new_landing_objects.fn(state)
+    results = [f"s3://{bronze.BUCKET}/bronze/{o['Key']}" for o in objects]
+    return [o["Key"] for o in objects], bronze.save_bronze_state.fn(state, objects, results)
+
+
+def test_listing_start_keeps_lateness_window():
+    prefix = "landing/albums/"
+    assert bronze.listing_start(prefix, None) is None
+    assert bronze.listing_start(prefix, f"{prefix}2024/05/01/00/x", 2) == f"{prefix}2024/04/30/22/"
+    assert bronze.listing_start(prefix, f"{prefix}part-0003.csv", 2) == f"{prefix}part-0003.csv"
+
+
+def test_late_object_inside_window_is_listed(s3):
+    state = {"datasets": {}}
+    first = [land(s3, "10", "a"), land(s3, "12", "b")]
+    listed, state = run(state)
+    assert listed == first
+
+    late = land(s3, "11", "late")
+    listed, state = run(state)
+    assert listed == [late]
+    assert state["datasets"]["albums"]["watermark"] == first[-1]
+
+    listed, _ = run(state)
+    assert listed == []
+
+
+def test_processed_is_pruned_below_window(s3):
+    state = {"datasets": {}}
+    old = land(s3, "06", "old")
+    run(state)
+    land(s3, "12", "new")
+    _, state = run(state)
+
+    processed = state["datasets"]["albums"]["processed"]
+    assert old not in processed
+    assert sorted(processed) == ["landing/albums/2024/05/01/12/new"]
+    # o estado foi salvo no bucket
+    assert bronze.load_bronze_state.fn() == state
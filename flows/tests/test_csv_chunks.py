@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import csv
+import io
+import random
+
+import pytest
+
+from csv_chunks import iter_csv_chunks, last_record_boundary
+
+HEADER = b"id,title,content\n"
+
+
+def records(n: int = 300, seed: int = 3) -> list:
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n):
+        text = rng.choice(["curto", "duas\nlinhas", '"aspas"\n e quebra,\n', "x" * rng.randint(0, 200)])
+        title = rng.choice(["a", "b,c", "quebra\r\nwindows"])
+        buf = io.StringIO()
+        csv.writer(buf, lineterminator="\n").writerow([i, title, text])
+        rows.append(buf.getvalue().encode())
+    return rows
+
+
+def body(chunks) -> bytes:
+    out = b""
+    for chunk in chunks:
+        assert chunk.startswith(HEADER)
+        out += bytes(chunk[len(HEADER):])
+    return out
+
+
+def parse(chunk: bytes) -> list:
+    return list(csv.reader(io.StringIO(chunk.decode(), newline="")))
+
+
+@pytest.mark.parametrize("max_bytes", [64, 300, 4096])
+def test_chunks_keep_quoted_newlines_whole(tmp_path, max_bytes):
+    rows = records()
+    path = tmp_path / "data.csv"
+    path.write_bytes(HEADER + b"".join(rows))
+
+    chunks = list(iter_csv_chunks(path, max_bytes=max_bytes, buffer_size=128))
+
+    assert body(chunks) == b"".join(rows)
+    parsed = [row for chunk in chunks for row in parse(bytes(chunk))[1:]]
+    assert parsed == [parse(r)[0] for r in rows]
+    for chunk in chunks:
+        assert all(len(row) == 3 for row in parse(bytes(chunk)))
+
+
+def test_append_ranges_match_whole_file(tmp_path):
+    rows = records()
+    path = tmp_path / "data.csv"
+    path.write_bytes(HEADER + b"".join(rows))
+    mid = len(HEADER) + sum(len(r) for r in rows[:120])
+
+    head = list(iter_csv_chunks(path, max_bytes=500, buffer_size=128, end=mid))
+    tail = list(iter_csv_chunks(path, max_bytes=500, buffer_size=128, start=mid))
+
+    assert body(head) == b"".join(rows[:120])
+    assert body(tail) == b"".join(rows[120:])
+    assert body(head + tail) == body(iter_csv_chunks(path, max_bytes=500, buffer_size=128))
+
+
+def test_last_record_boundary_ignores_quoted_newlines():
+    buf = bytearray(b'1,"a\nb"\n2,"c\nd')
+    assert last_record_boundary(buf, 0, len(buf)) == buf.index(b"2")
+    assert last_record_boundary(bytearray(b'1,"a\nb'), 0, 6) == -1
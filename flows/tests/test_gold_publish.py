@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+import gold_publish
+
+BUCKET = "csv-batch-bucket"
+
+
+def stage(s3, run_id: int, name: str = "band_avg_scores") -> dict:
+    key = f"{gold_publish.run_prefix('gold', run_id)}/{name}/{name}.parquet"
+    s3.put_object(Bucket=BUCKET, Key=key, Body=b"x")
+    return {name: f"s3://{BUCKET}/{key}"}
+
+
+def test_run_ids_in_the_same_second_do_not_collide():
+    ids = [gold_publish.new_run_id() for _ in range(1000)]
+    assert len(set(ids)) == len(ids) and ids == sorted(ids)
+
+
+def test_publish_never_goes_back(s3):
+    older, newer = gold_publish.new_run_id(), gold_publish.new_run_id()
+    assert gold_publish.publish(s3, BUCKET, "gold", newer, stage(s3, newer))
+    assert gold_publish.publish(s3, BUCKET, "gold", older, stage(s3, older)) is None
+    assert gold_publish.load(s3, BUCKET, "gold")["run_id"] == newer
+
+
+def test_collect_garbage_keeps_retained_versions(s3, monkeypatch):
+    monkeypatch.setattr(gold_publish, "KEEP_VERSIONS", 2)
+    runs = [gold_publish.new_run_id() for _ in range(3)]
+    for run in runs:
+        gold_publish.publish(s3, BUCKET, "gold", run, stage(s3, run))
+    s3.put_object(Bucket=BUCKET, Key="gold/band_avg_scores/band_avg_scores.parquet", Body=b"old")
+
+    deleted, _ = gold_publish.collect_garbage(s3, BUCKET, "gold")
+
+    keys = {o["Key"] for o in s3.list_objects_v2(Bucket=BUCKET, Prefix="gold/")["Contents"]}
+    assert deleted == 2
+    assert keys == {
+        "gold/_CURRENT",
+        *(f"gold/_runs/{run}/band_avg_scores/band_avg_scores.parquet" for run in runs[1:]),
+    }
+    assert gold_publish.dataset_uris(s3, BUCKET, "gold", "band_avg_scores", refresh=True) == [
+        f"s3://{BUCKET}/gold/_runs/{runs[-1]}/band_avg_scores/band_avg_scores.parquet"
+    ]
@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+import io
+
+import polars as pl
+
+import gold_publish
+import gold_serving
+
+
+def test_unpublished_outputs_are_served_empty(s3, tmp_path):
+    run = gold_publish.new_run_id()
+    key = f"{gold_publish.run_prefix('gold', run)}/band_avg_scores.parquet"
+    buf = io.BytesIO()
+    pl.DataFrame(
+        {
+            "band_id": [7], "band_name": ["Alpha"], "country": ["Norway"], "review_count": [2],
+            "avg_score": [0.8], "min_score": [0.7], "max_score": [0.9], "std_score": [0.14],
+        },
+        schema_overrides={"review_count": pl.UInt32},
+    ).write_parquet(buf)
+    s3.put_object(Bucket=gold_serving.BUCKET, Key=key, Body=buf.getvalue())
+    # top10_by_country, band_album_counts e music_catalog vazios: nada publicado
+    gold_publish.publish(s3, gold_serving.BUCKET, "gold", run, {"band_avg_scores": f"s3://{gold_serving.BUCKET}/{key}"})
+
+    service = gold_serving.GoldService(directory=tmp_path)
+
+    stats = service.band_stats(7)
+    assert stats.band_name == "Alpha" and stats.album_count is None
+    assert service.top_bands("Norway") == []
+    assert service.albums_of_band(7) == []
+    assert service.album(1) is None
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import io
+
+import polars as pl
+from polars.testing import assert_frame_equal
+
+import gold_state
+import silver_merge
+
+BUCKET = "csv-batch-bucket"
+CATALOG = pl.DataFrame({
+    "album_id": [1, 2, 3],
+    "band_id": [10, 10, 20],
+    "band_name": ["Alpha", "Alpha", "Beta"],
+    "country": ["Norway", "Norway", "Chile"],
+})
+
+
+def put_catalog(s3, catalog: pl.DataFrame = CATALOG) -> None:
+    buf = io.BytesIO()
+    catalog.write_parquet(buf)
+    s3.put_object(Bucket=BUCKET, Key="silver/music_catalog/music_catalog.parquet", Body=buf.getvalue())
+
+
+def merge_reviews(s3, delta: pl.DataFrame, run_id: int) -> None:
+    manifest = silver_merge.load_manifest(s3, BUCKET, "silver", "reviews", "id")
+    manifest["range_size"] = 10
+    silver_merge.merge(s3, BUCKET, "silver", "reviews", delta, manifest, run_id)
+
+
+def expected(reviews: pl.DataFrame, catalog: pl.DataFrame = CATALOG) -> pl.DataFrame:
+    """Agregação completa, como em ``gold.create_band_scores``."""
+    score = pl.col("score")
+    return (
+        gold_state.attribute(reviews, catalog)
+        .group_by(gold_state.KEYS)
+        .agg(pl.len().alias("review_count"), score.mean().alias("avg_score"), score.min().alias("min_score"),
+             score.max().alias("max_score"), score.std().alias("std_score"))
+        .sort("band_id")
+    )
+
+
+def reviews(ids, albums, scores) -> pl.DataFrame:
+    return pl.DataFrame({"id": ids, "album": albums, "score": scores}, schema={"id": pl.Int64, "album": pl.Int64, "score": pl.Float64})
+
+
+def test_incremental_refresh_matches_full_aggregation(s3):
+    put_catalog(s3)
+    base = reviews([1, 2, 3, 15, 25], [1, 2, 3, 1, 3], [0.5, 0.9, 0.4, 0.7, None])
+    merge_reviews(s3, base, 1)
+    first = gold_state.refresh(s3, BUCKET, "silver", 1, log=lambda _: None)
+    assert_frame_equal(first.sort("band_id"), expected(base))
+
+    # a nota 0.9 (máximo da Alpha) muda, e entra uma review numa faixa nova
+    delta = reviews([2, 31], [2, 3], [0.1, 0.8])
+    merge_reviews(s3, delta, 2)
+    second = gold_state.refresh(s3, BUCKET, "silver", 2, log=lambda _: None)
+
+    current = pl.concat([base.filter(~pl.col("id").is_in([2])), delta])
+    assert_frame_equal(second.sort("band_id"), expected(current))
+    manifest = gold_state.load_json(s3, BUCKET, gold_state.MANIFEST_KEY, None)
+    assert manifest["run_id"] == 2 and sorted(manifest["contrib"]) == ["0", "10", "20", "30"]
+
+
+def test_catalog_change_reattributes_only_moved_albums(s3):
+    put_catalog(s3)
+    base = reviews([1, 2, 3, 15, 25, 26], [1, 2, 3, 1, 3, 4], [0.5, 0.9, 0.4, 0.7, None, 0.6])
+    merge_reviews(s3, base, 1)
+    gold_state.refresh(s3, BUCKET, "silver", 1, log=lambda _: None)
+    before = gold_state.load_json(s3, BUCKET, gold_state.MANIFEST_KEY, None)
+
+    # álbum 3 passa da Beta para a Alpha; o 4 (já com review) entra no catálogo; o 2 não muda
+    catalog = pl.DataFrame({
+        "album_id": [1, 2, 3, 4],
+        "band_id": [10, 10, 10, 30],
+        "band_name": ["Alpha", "Alpha", "Alpha", "Gamma"],
+        "country": ["Norway", "Norway", "Norway", "Peru"],
+    })
+    put_catalog(s3, catalog)
+    logs = []
+    scores = gold_state.refresh(s3, BUCKET, "silver", 2, log=logs.append)
+
+    assert_frame_equal(scores.sort("band_id", nulls_last=True), expected(base, catalog).sort("band_id", nulls_last=True))
+    assert not any("reconstrução completa" in line for line in logs)
+    after = gold_state.load_json(s3, BUCKET, gold_state.MANIFEST_KEY, None)
+    # a faixa 10 só tem reviews do álbum 1: o arquivo de contribuições dela não é reescrito
+    assert after["contrib"]["10"] == before["contrib"]["10"]
+    assert after["contrib"]["0"] != before["contrib"]["0"]
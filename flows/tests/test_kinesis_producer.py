@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import threading
+from collections import Counter
+
+from kinesis_producer import THROTTLE_CODE, KinesisProducer
+
+SHARDS = [(0, 99), (100, 199), (200, 299), (300, 399)]
+
+
+class FakeKinesis:
+    """``put_records`` que recusa com throttling cada terceiro registro da primeira tentativa."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.seen = Counter()
+        self.delivered = Counter()
+        self.hash_keys = Counter()
+
+    def list_shards(self, **kwargs):
+        return {"Shards": [
+            {"HashKeyRange": {"StartingHashKey": str(a), "EndingHashKey": str(b)}, "SequenceNumberRange": {}}
+            for a, b in SHARDS
+        ]}
+
+    def put_records(self, StreamName, Records):
+        results = []
+        with self.lock:
+            for record in Records:
+                first = self.seen[record["Data"]] == 0
+                self.seen[record["Data"]] += 1
+                if first and int(record["Data"]) % 3 == 0:
+                    results.append({"ErrorCode": THROTTLE_CODE, "ErrorMessage": "Rate exceeded"})
+                else:
+                    self.delivered[record["Data"]] += 1
+                    self.hash_keys[int(record["ExplicitHashKey"])] += 1
+                    results.append({"SequenceNumber": "1", "ShardId": "shardId-0"})
+        return {"FailedRecordCount": sum("ErrorCode" in r for r in results), "Records": results}
+
+
+def test_partial_failures_resend_only_failed_records():
+    kin = FakeKinesis()
+    payloads = [str(i).encode() for i in range(1200)]
+
+    with KinesisProducer(kin, "stream", "reviews", base_delay=0.001, max_delay=0.002) as producer:
+        for data in payloads:
+            producer.put(data)
+    stats = producer.stats
+
+    assert kin.delivered == Counter(payloads)
+    # só os recusados voltam, uma vez cada
+    assert all(kin.seen[data] == (2 if int(data) % 3 == 0 else 1) for data in payloads)
+    assert stats.records == len(payloads) and stats.retried_records == 400
+    assert stats.throttled_requests > 0
+    # um ExplicitHashKey no meio de cada shard, todos usados por igual
+    assert sorted(kin.hash_keys) == [(a + b) // 2 for a, b in SHARDS]
+    assert set(kin.hash_keys.values()) == {len(payloads) // len(SHARDS)}
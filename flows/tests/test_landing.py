@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import threading
+
+import pytest
+from prefect import task
+from prefect.testing.utilities import prefect_test_harness
+
+import landing
+from landing_tracker import DatasetProgress
+
+
+@pytest.fixture(scope="module", autouse=True)
+def prefect_api():
+    with prefect_test_harness():
+        yield
+
+
+def test_bronze_starts_per_dataset_without_waiting_for_slow_streams(tmp_path, monkeypatch):
+    for name in ("albums", "reviews"):
+        (tmp_path / f"{name}.csv").write_text("id\n1\n")
+    albums_converted = threading.Event()
+    started = []
+
+    class Tracker:
+        def __init__(self, *args):
+            pass
+
+        def snapshot(self, datasets):
+            return {d: [] for d in datasets}
+
+        def restore(self, baseline):
+            pass
+
+        def expect(self, *args):
+            pass
+
+        def iter_ready(self, timeout):
+            yield DatasetProgress("albums", 1, 1, 1, ["landing/albums/a"])
+            # reviews só "chega" depois que a bronze de albums começou
+            assert albums_converted.wait(10), "bronze de albums esperou o stream de reviews"
+            yield DatasetProgress("reviews", 1, 1, 1, ["landing/reviews/r"])
+
+    @task
+    def push(path, start=0, end=None):
+        return {"dataset": path.stem, "records": 1, "bytes": 1, "push": {}}
+
+    @task
+    def convert(key, streaming=False, dedup=False):
+        started.append(key)
+        if key.startswith("landing/albums/"):
+            albums_converted.set()
+        return key.replace("landing/", "s3://b/bronze/")
+
+    monkeypatch.setattr(landing, "LandingCompletionTracker", Tracker)
+    monkeypatch.setattr(landing, "push_csv_in_chunks", push)
+    monkeypatch.setattr(landing.bronze, "csv_s3_to_parquet", convert)
+    monkeypatch.setattr(landing, "load_manifest", lambda s3, bucket: {})
+    monkeypatch.setattr(landing, "save_manifest", lambda s3, bucket, manifest: None)
+    monkeypatch.setattr(landing.bronze, "publish_quality_report", lambda: "")
+
+    ready = landing.ingest_folder_flow(str(tmp_path), to_bronze=True)
+
+    assert ready == {"albums": ["landing/albums/a"], "reviews": ["landing/reviews/r"]}
+    assert sorted(started) == ["landing/albums/a", "landing/reviews/r"]
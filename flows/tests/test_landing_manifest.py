@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+from csv_chunks import iter_csv_chunks
+from landing_manifest import PushDigest, changed_chunks, plan_file, record_push
+
+
+def push(path, start=0, end=None) -> dict:
+    digest = PushDigest()
+    for chunk in iter_csv_chunks(path, max_bytes=256, buffer_size=64, start=start, end=end):
+        digest.update(chunk)
+    return digest.as_dict()
+
+
+def test_push_records_one_hash_per_chunk(tmp_path):
+    path = tmp_path / "reviews.csv"
+    path.write_bytes(b"id,text\n" + b"".join(b'%d,"linha\n%d"\n' % (i, i) for i in range(200)))
+    manifest = {"files": {}}
+    plan = plan_file(path, manifest)
+    record_push(manifest, plan, 1, push(path, plan.start, plan.end))
+
+    recorded = manifest["files"]["reviews.csv"]["pushes"][-1]
+    chunks = list(iter_csv_chunks(path, max_bytes=256, buffer_size=64))
+    assert recorded["chunks"] == len(chunks) == len(recorded["chunk_hashes"]) > 1
+    assert changed_chunks(recorded, chunks) == []
+
+    # reenvio parcial: só o chunk alterado diverge
+    chunks[3] = chunks[3].replace(b"linha", b"LINHA")
+    assert changed_chunks(recorded, chunks) == [3]
+    assert changed_chunks(recorded, chunks + [b"id,text\n999,x\n"]) == [3, len(chunks)]
+
+
+def test_append_push_keeps_its_own_chunk_hashes(tmp_path):
+    path = tmp_path / "albums.csv"
+    path.write_bytes(b"id\n" + b"".join(b"%d\n" % i for i in range(100)))
+    manifest = {"files": {}}
+    first = plan_file(path, manifest)
+    record_push(manifest, first, 1, push(path, first.start, first.end))
+    with open(path, "ab") as fh:
+        fh.write(b"".join(b"%d\n" % i for i in range(100, 300)))
+
+    plan = plan_file(path, manifest)
+    assert plan.mode == "append"
+    record_push(manifest, plan, 2, push(path, plan.start, plan.end))
+    pushes = manifest["files"]["albums.csv"]["pushes"]
+    tail = list(iter_csv_chunks(path, max_bytes=256, buffer_size=64, start=plan.start, end=plan.end))
+    assert [p["mode"] for p in pushes] == ["full", "append"]
+    assert changed_chunks(pushes[-1], tail) == []
@@ -0,0 +1,19 @@
+from __future__ import annotations
+
+import polars as pl
+import pytest
+
+import parquet_codecs
+
+
+def test_choice_is_reused_per_dataset_and_schema(monkeypatch):
+    parquet_codecs._chosen.clear()
+    df = pl.DataFrame({"id": range(1000), "name": [f"band {i % 7}" for i in range(1000)]})
+    first = parquet_codecs.choose(df, "bands")
+
+    monkeypatch.setattr(parquet_codecs, "encoded_size", lambda *_: 1 / 0)
+    assert parquet_codecs.choose(df.tail(10), "bands") == first
+    # outro schema amostra de novo
+    other = df.with_columns(pl.col("id").cast(pl.Int32))
+    with pytest.raises(ZeroDivisionError):
+        parquet_codecs.choose(other, "bands")
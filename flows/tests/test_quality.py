@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+import polars as pl
+
+import quality
+
+
+def test_collect_profiled_returns_data_and_profile_from_one_query():
+    lf = pl.LazyFrame({
+        "review_id": [1, 2, 2],
+        "album_id": [1, 1, None],
+        "album_title": ["a", "b", None],
+        "score": [0.5, 2.0, None],
+        "content": ["x", "y", "z"],
+    })
+    df, profile = quality.collect_profiled(lf, "album_reviews")
+
+    assert df.equals(lf.collect())
+    assert profile["rows"] == 3
+    assert profile["violations"]["range:score"] == 1
+    assert profile["violations"]["unique:review_id"] == 2
+    assert "distinct" not in profile["columns"]["content"]
+    assert profile["columns"]["album_id"]["distinct"] == 2
+
+
+def test_collect_profiled_empty():
+    df, profile = quality.collect_profiled(pl.LazyFrame({"review_id": [], "score": []}, schema={"review_id": pl.Int64, "score": pl.Float64}), "reviews")
+    assert df.is_empty() and profile["rows"] == 0
+
+
+def test_publishes_in_the_same_second_do_not_overwrite(s3):
+    keys = []
+    for rows in (1, 2):
+        quality.add_cast_failures("silver", "reviews", rows, {})
+        keys.append(quality.publish(s3, "csv-batch-bucket", "silver", log=lambda _: None))
+
+    assert keys[0] != keys[1]
+    listed = [o["Key"] for o in s3.list_objects_v2(Bucket="csv-batch-bucket", Prefix="quality/silver/")["Contents"]]
+    assert sorted(listed) == sorted(keys)
@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+import random
+
+import polars as pl
+import pytest
+
+import ranking
+
+
+def bands(n: int = 400, seed: int = 7) -> pl.DataFrame:
+    rng = random.Random(seed)
+    return pl.DataFrame({
+        "country": [rng.choice(["Brazil", "Norway", None]) for _ in range(n)],
+        "band_id": [rng.choice([i, None]) for i in range(n)],
+        "band_name": [rng.choice(["a", "b", "c", None]) for _ in range(n)],
+        "review_count": [rng.randint(1, 3) for _ in range(n)],
+        "avg_score": [rng.choice([None, 0.5, 0.75, 1.0]) for _ in range(n)],
+    }).lazy().pipe(ranking.with_bayesian).collect()
+
+
+def reference(df: pl.DataFrame, r: ranking.Ranking, k: int) -> pl.DataFrame:
+    """Ordenação completa do grupo, nulos por último."""
+    return (
+        df.sort(r.keys, descending=r.descending, nulls_last=True, maintain_order=True)
+        .group_by("country", maintain_order=True)
+        .head(k)
+    )
+
+
+@pytest.mark.parametrize("k", [1, 3, 10])
+def test_top_k_matches_full_sort_with_nulls_last(k):
+    df = bands()
+    result = ranking.top_k(df.lazy(), "country", k=k).collect()
+    for r in ranking.RANKINGS:
+        got = result.filter(pl.col("metric") == r.name).sort(["country", "rank"], nulls_last=True)
+        want = reference(df, r, k).sort("country", nulls_last=True, maintain_order=True)
+        assert got.select(ranking.COLUMNS).equals(want.select(ranking.COLUMNS)), r.name
+
+
+def test_daft_top_k_matches_polars():
+    daft = pytest.importorskip("daft")
+    df = bands()
+    want = ranking.top_k(df.lazy(), "country", k=5).collect()
+    got = pl.from_arrow(ranking.daft_top_k(daft.from_arrow(df.to_arrow()), "country", k=5).to_arrow())
+    order = ["metric", "country", "rank"]
+    assert got.select(want.columns).sort(order, nulls_last=True).equals(want.sort(order, nulls_last=True))
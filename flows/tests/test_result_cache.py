@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+import result_cache
+import schemas
+
+BUCKET = "csv-batch-bucket"
+INPUTS = ["silver/reviews/reviews.parquet", "silver/music_catalog/music_catalog.parquet"]
+OUTPUT = "gold/_runs/1/band_avg_scores.parquet"
+
+
+def fingerprint(s3, code: str) -> str:
+    inputs = {key: result_cache.listing(s3, f"s3://{BUCKET}/{key}") for key in INPUTS}
+    return result_cache.fingerprint(inputs, code, {"top_k": 10})
+
+
+def test_hit_only_while_inputs_and_code_are_unchanged(s3):
+    for key in INPUTS:
+        s3.put_object(Bucket=BUCKET, Key=key, Body=b"v1")
+    s3.put_object(Bucket=BUCKET, Key=OUTPUT, Body=b"out")
+    code = result_cache.code_hash(schemas)
+    result_cache.store(s3, BUCKET, "gold", "band_avg_scores", fingerprint(s3, code), f"s3://{BUCKET}/{OUTPUT}")
+
+    assert result_cache.lookup(s3, BUCKET, "gold", "band_avg_scores", fingerprint(s3, code)) == f"s3://{BUCKET}/{OUTPUT}"
+    # outro código: miss
+    other_code = result_cache.code_hash(result_cache)
+    assert result_cache.lookup(s3, BUCKET, "gold", "band_avg_scores", fingerprint(s3, other_code)) is None
+
+    # uma entrada com ETag novo: miss
+    s3.put_object(Bucket=BUCKET, Key=INPUTS[1], Body=b"v2")
+    assert result_cache.lookup(s3, BUCKET, "gold", "band_avg_scores", fingerprint(s3, code)) is None
+    stats = result_cache.cache_stats()["gold"]
+    assert stats == {"hits": 1, "misses": 2}
+
+
+def test_miss_when_the_stored_output_changed(s3):
+    s3.put_object(Bucket=BUCKET, Key=INPUTS[0], Body=b"v1")
+    s3.put_object(Bucket=BUCKET, Key=OUTPUT, Body=b"out")
+    fp = fingerprint(s3, "code")
+    result_cache.store(s3, BUCKET, "gold", "band_avg_scores", fp, f"s3://{BUCKET}/{OUTPUT}")
+
+    s3.put_object(Bucket=BUCKET, Key=OUTPUT, Body=b"edited")
+    assert result_cache.lookup(s3, BUCKET, "gold", "band_avg_scores", fp) is None
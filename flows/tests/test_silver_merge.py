@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import io
+
+import polars as pl
+
+import silver
+import silver_merge
+
+BUCKET = "csv-batch-bucket"
+
+
+def manifest(s3, dataset: str = "reviews") -> dict:
+    m = silver_merge.load_manifest(s3, BUCKET, "silver", dataset, "id")
+    m["range_size"] = 10
+    return m
+
+
+def reviews(ids, scores) -> pl.DataFrame:
+    return pl.DataFrame({"id": ids, "score": scores}, schema={"id": pl.Int64, "score": pl.Float64})
+
+
+def read(s3, dataset: str = "reviews") -> pl.DataFrame:
+    uris = silver_merge.current_uris(s3, BUCKET, "silver", dataset)
+    return pl.concat([
+        pl.read_parquet(io.BytesIO(s3.get_object(Bucket=BUCKET, Key=uri.split("/", 3)[-1])["Body"].read()))
+        for uri in uris
+    ]).sort("id")
+
+
+def keys(s3, prefix: str = "silver/reviews/range=") -> list:
+    return sorted(o["Key"] for o in s3.list_objects_v2(Bucket=BUCKET, Prefix=prefix).get("Contents", []))
+
+
+def test_upsert_overwrites_keys_and_deletes_stale_range_files(s3):
+    silver_merge.merge(s3, BUCKET, "silver", "reviews", reviews([1, 2, 15], [0.1, 0.2, 0.3]), manifest(s3), 1)
+    assert keys(s3) == ["silver/reviews/range=0/part-1.parquet", "silver/reviews/range=10/part-1.parquet"]
+
+    rewritten = silver_merge.merge(s3, BUCKET, "silver", "reviews", reviews([2, 3, 2], [0.5, 0.6, 0.9]), manifest(s3), 2)
+
+    assert rewritten == [0]
+    assert read(s3).rows() == [(1, 0.1), (2, 0.9), (3, 0.6), (15, 0.3)]
+    # a faixa 0 foi reescrita: o arquivo antigo sai; a 10 não foi tocada
+    assert keys(s3) == ["silver/reviews/range=0/part-2.parquet", "silver/reviews/range=10/part-1.parquet"]
+
+
+def test_current_uris_prunes_ranges_by_key(s3):
+    silver_merge.merge(s3, BUCKET, "silver", "reviews", reviews([1, 15, 27], [0.1, 0.2, 0.3]), manifest(s3), 1)
+
+    assert silver_merge.current_uris(s3, BUCKET, "silver", "reviews", [15, 16]) == [
+        f"s3://{BUCKET}/silver/reviews/range=10/part-1.parquet"
+    ]
+    assert len(silver_merge.current_uris(s3, BUCKET, "silver", "reviews", [1, 29])) == 2
+    assert silver_merge.current_uris(s3, BUCKET, "silver", "reviews", [99]) == []
+    assert silver_merge.current_uris(s3, BUCKET, "silver", "albums") is None
+
+
+def test_changed_bronze_etag_is_merged_again(s3):
+    def put_part(df: pl.DataFrame) -> None:
+        buf = io.BytesIO()
+        df.write_parquet(buf)
+        s3.put_object(Bucket=BUCKET, Key="bronze/reviews/part-a.parquet", Body=buf.getvalue())
+
+    bronze_path = f"s3://{BUCKET}/bronze/reviews/"
+    put_part(reviews([1], [0.1]))
+    parts, sources = silver.plan_silver_delta.fn("reviews", bronze_path)
+    assert parts == [f"s3://{BUCKET}/bronze/reviews/part-a.parquet"]
+    silver.merge_silver_delta.fn(pl.LazyFrame(reviews([1], [0.1])), "reviews", 1, sources)
+    assert silver.plan_silver_delta.fn("reviews", bronze_path)[0] == []
+
+    put_part(reviews([1], [0.7]))
+    assert silver.plan_silver_delta.fn("reviews", bronze_path)[0] == parts
@@ -2,6 +2,7 @@
 bronze_daft.py – converte CSV da landing em Iceberg (namespace bronze) usando Daft
 """
 import os
+import sys
 from pathlib import Path
 from typing import List
 
@@ -9,6 +10,9 @@ import daft
 from pyiceberg.catalog import load_catalog
 from prefect import flow, task
 
+sys.path.append(str(Path(__file__).resolve().parents[1] / "flows"))
+import schemas  # noqa: E402
+
 # ---------------------------------------------------------------------
 # Config
 # ---------------------------------------------------------------------
@@ -18,7 +22,12 @@ CATALOG = load_catalog(
     warehouse=os.getenv("WAREHOUSE", "s3a://datalake/warehouse"),
 )
 LANDING_PREFIX = Path("/data/landing")  # ou "s3://datalake/landing"
-DATASETS = {"albums", "bands", "reviews"}  # validação simples
+DATASETS = set(schemas.BASE_DATASETS)
+CSV_PATTERNS = ("*.csv", "*.csv.gz", "*.csv.zst")  # chunks podem vir comprimidos da landing
+
+
+def dataset_name(path: Path) -> str:
+    return path.name.split(".", 1)[0].lower()
 
 
 # ---------------------------------------------------------------------
@@ -26,19 +35,20 @@ DATASETS = {"albums", "bands", "reviews"}  # validação simples
 # ---------------------------------------------------------------------
 @task
 def list_csv() -> List[Path]:
-    return sorted(p for p in LANDING_PREFIX.glob("*.csv") if p.stem in DATASETS)
+    files = (p for pattern in CSV_PATTERNS for p in LANDING_PREFIX.glob(pattern))
+    return sorted(p for p in files if dataset_name(p) in DATASETS)
 
 
 @task(log_prints=True, retries=3, retry_delay_seconds=10)
 def csv_to_iceberg(csv_path: Path) -> str:
-    dataset = csv_path.stem.lower()
+    dataset = dataset_name(csv_path)
     table_id = f"bronze.{dataset}"
 
-    # 1. Ler CSV em Daft DataFrame
-    df = daft.read_csv(csv_path.as_posix(), infer_schema_length=5000)
+    # 1. Ler CSV em Daft DataFrame, tipado pelo registro (sem inferência)
+    df = daft.read_csv(csv_path.as_posix(), infer_schema=False, schema=schemas.daft_schema(dataset))
 
     if not CATALOG.table_exists(table_id):
-        CATALOG.create_table(table_id, schema=df.to_arrow().schema)
+        CATALOG.create_table(table_id, schema=schemas.iceberg_schema(dataset, layer="bronze"))
 
     table = CATALOG.load_table(table_id)
     df.write_iceberg(table, mode="overwrite")
@@ -1,11 +1,20 @@
 """Gold flow usando Daft – rank corrigido sem `.rank()`"""
 from __future__ import annotations
 import os
+import sys
+from pathlib import Path
+from typing import Optional
+
 import daft
 from daft import col
 from pyiceberg.catalog import load_catalog
 from prefect import flow, task
 
+sys.path.append(str(Path(__file__).resolve().parents[1] / "flows"))
+import ranking  # noqa: E402
+import result_cache  # noqa: E402
+import schemas  # noqa: E402
+
 CATALOG = load_catalog(
     "nessie",
     uri=os.getenv("NESSIE_URI", "http://nessie.lakehouse.svc.cluster.local:19120/api/v1"),
@@ -18,17 +27,57 @@ CATALOG = load_catalog(
 def read_df(table_id: str) -> daft.DataFrame:
     return daft.read_iceberg(CATALOG.load_table(table_id))
 
-def write_df(df: daft.DataFrame, table_id: str, mode: str = "append"):
+def write_df(df: daft.DataFrame, table_id: str, mode: str = "append", fingerprint: Optional[str] = None):
     if not CATALOG.table_exists(table_id):
         CATALOG.create_table(table_id, schema=df.to_arrow().schema)
     df.write_iceberg(CATALOG.load_table(table_id), mode=mode)
+    if fingerprint:
+        # impressão digital das entradas + snapshot gravado: ver ``is_cached``
+        table = CATALOG.load_table(table_id)
+        with table.transaction() as tx:
+            tx.set_properties(**{
+                FINGERPRINT_PROPERTY: fingerprint,
+                SNAPSHOT_PROPERTY: str(table.current_snapshot().snapshot_id),
+            })
+
+
+# ---------------------------------------------------------------------
+# Cache de resultados (ver flows/result_cache.py): entradas pelo snapshot id
+# ---------------------------------------------------------------------
+FINGERPRINT_PROPERTY = "result_cache.fingerprint"
+SNAPSHOT_PROPERTY = "result_cache.snapshot_id"
+
+
+def snapshot_ids(*table_ids: str) -> dict:
+    ids = {}
+    for table_id in table_ids:
+        snapshot = CATALOG.load_table(table_id).current_snapshot()
+        ids[table_id] = snapshot.snapshot_id if snapshot else None
+    return ids
+
+
+def is_cached(table_id: str, fingerprint: str) -> bool:
+    """A tabela foi gravada com ``fingerprint`` e ninguém a alterou depois."""
+    hit = False
+    if CATALOG.table_exists(table_id):
+        table = CATALOG.load_table(table_id)
+        snapshot = table.current_snapshot()
+        hit = (
+            snapshot is not None
+            and table.properties.get(FINGERPRINT_PROPERTY) == fingerprint
+            and table.properties.get(SNAPSHOT_PROPERTY) == str(snapshot.snapshot_id)
+        )
+    result_cache.record("gold-iceberg", hit)
+    if hit:
+        print(f"♻️ {table_id}: entradas e código inalterados, mantido")
+    return hit
 
 # ---------------------------------------------------------------------
 # Tasks
 # ---------------------------------------------------------------------
 @task
-def create_top10_by_country(music: daft.DataFrame, reviews: daft.DataFrame) -> daft.DataFrame:
-    reviews_mod = reviews.with_column_renamed({"id": "review_id", "album": "album_id"})
+def create_country_rankings(music: daft.DataFrame, reviews: daft.DataFrame, k: int = ranking.TOP_K) -> daft.DataFrame:
+    reviews_mod = reviews.with_column_renamed(schemas.REVIEWS.renames)
     joined = reviews_mod.join(music, on="album_id", how="left")
 
     grouped = (
@@ -39,17 +88,21 @@ def create_top10_by_country(music: daft.DataFrame, reviews: daft.DataFrame) -> d
         )
     )
 
-    # Ordena por país e review_count desc, depois pega as 10 primeiras de cada país
-    top10 = (
-        grouped.sort(["country", "review_count"], descending=[False, True])
-               .groupby("country")
-               .head(10)
+    # top-k de cada país por heap limitado (sem ordenar tudo): mesmo ranking da gold Polars
+    return ranking.daft_top_k(ranking.daft_with_bayesian(grouped), "country", k=k).collect()
+
+
+@task
+def create_top10_by_country(rankings: daft.DataFrame) -> daft.DataFrame:
+    return (
+        rankings.where(col("metric") == "review_count")
+        .sort(["country", "rank"])
+        .select("country", "band_id", "band_name", "review_count", "avg_score")
     )
-    return top10
 
 @task
 def create_band_avg_scores(music: daft.DataFrame, reviews: daft.DataFrame) -> daft.DataFrame:
-    reviews_mod = reviews.with_column_renamed({"id": "review_id", "album": "album_id"})
+    reviews_mod = reviews.with_column_renamed(schemas.REVIEWS.renames)
     joined = reviews_mod.join(music, on="album_id", how="left")
     return (
         joined.groupby(["band_id", "band_name", "country"])
@@ -70,11 +123,28 @@ def gold_flow():
     music = read_df("silver.music_catalog")
     reviews = read_df("silver.reviews")
 
-    top10 = create_top10_by_country(music, reviews)
-    write_df(top10, "gold.top10_by_country")
+    # todas as saídas dependem das duas tabelas: uma impressão digital só
+    fingerprint = result_cache.fingerprint(
+        snapshot_ids("silver.music_catalog", "silver.reviews"),
+        result_cache.code_hash(sys.modules[__name__], ranking, schemas),
+        {"top_k": ranking.TOP_K, "bayes_prior": ranking.BAYES_PRIOR},
+    )
+    pending = [t for t in ("gold.country_rankings", "gold.top10_by_country", "gold.band_avg_scores")
+               if not is_cached(t, fingerprint)]
+
+    if {"gold.country_rankings", "gold.top10_by_country"} & set(pending):
+        rankings = create_country_rankings(music, reviews)
+        if "gold.country_rankings" in pending:
+            write_df(rankings, "gold.country_rankings", mode="overwrite", fingerprint=fingerprint)
+        if "gold.top10_by_country" in pending:
+            top10 = create_top10_by_country(rankings)
+            write_df(top10, "gold.top10_by_country", mode="overwrite", fingerprint=fingerprint)
+
+    if "gold.band_avg_scores" in pending:
+        avg_scores = create_band_avg_scores(music, reviews)
+        write_df(avg_scores, "gold.band_avg_scores", mode="overwrite", fingerprint=fingerprint)
 
-    avg_scores = create_band_avg_scores(music, reviews)
-    write_df(avg_scores, "gold.band_avg_scores")
+    result_cache.log_cache_stats()
 
 if __name__ == "__main__":
     gold_flow()
\ No newline at end of file
@@ -1,12 +1,21 @@
 """Landing flow: lê CSV locais e grava chunks diretamente no MinIO (S3) em `landing/`."""
 import os
+import sys
 import time
 from pathlib import Path
-from typing import List
+from typing import Dict, List, Optional
 
-import boto3
 from prefect import flow, task
 
+from parallel_upload import ParallelUploader
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "flows"))
+import aws_clients  # noqa: E402
+from csv_chunks import DEFAULT_MAX_BYTES, iter_csv_chunks  # noqa: E402
+from landing_manifest import (  # noqa: E402
+    FilePlan, PushDigest, load_manifest, plan_file, record_push, save_manifest,
+)
+
 # Endpoint e credenciais MinIO (já usadas nos outros flows)
 ENDPOINT = os.getenv("AWS_ENDPOINT", "http://minio.lakehouse.svc.cluster.local:9000")
 AWS_KWARGS = dict(
@@ -18,9 +27,12 @@ AWS_KWARGS = dict(
 
 BUCKET = os.getenv("BUCKET", "datalake")
 PREFIX = os.getenv("LANDING_PREFIX", "landing/")
+COMPRESSION = os.getenv("LANDING_COMPRESSION") or None  # "gzip" | "zstd"
+UPLOAD_WORKERS = int(os.getenv("LANDING_UPLOAD_WORKERS", "16"))
+
 
-def boto(service):
-    return boto3.client(service, **AWS_KWARGS)
+def boto(service, max_pool_connections: int = aws_clients.MAX_POOL_CONNECTIONS):
+    return aws_clients.client(service, max_pool_connections=max_pool_connections, **AWS_KWARGS)
 
 # ---------------------------------------------------------------------------
 # Tasks
@@ -30,40 +42,51 @@ def boto(service):
 def list_csv(folder: str = "csv") -> List[Path]:
     return sorted(Path(folder).glob("*.csv"))
 
+
 @task(log_prints=True)
-def push_csv_in_chunks(csv_path: Path, max_bytes: int = 900 * 1024) -> List[str]:
+def plan_ingestion(files: List[Path], manifest: dict) -> List[FilePlan]:
+    plans = [plan_file(f, manifest) for f in files]
+    for plan in plans:
+        print(f"🧾 {Path(plan.path).name}: {plan.mode} (bytes {plan.start}–{plan.end or plan.size})")
+    return plans
 
-    s3 = boto("s3")
-    dataset = csv_path.stem.lower()
-    lines = csv_path.read_text().splitlines()
-    header = lines[0] + "\n"
+@task(log_prints=True)
+def push_csv_in_chunks(
+    csv_path: Path,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    compression: Optional[str] = COMPRESSION,
+    max_workers: int = UPLOAD_WORKERS,
+    start: int = 0,
+    end: Optional[int] = None,
+) -> Dict[str, object]:
 
-    keys = []
-    chunk = header
-    size = len(chunk.encode())
+    s3 = boto("s3", max_pool_connections=max_workers)
+    dataset = csv_path.stem.lower()
     ts = int(time.time() * 1000)
-    part = 0
-
-    for line in lines[1:]:
-        encoded = (line + "\n").encode()
-        if size + len(encoded) > max_bytes:
-            key = f"{PREFIX}{dataset}/{ts}_{part}.csv"
-            s3.put_object(Bucket=BUCKET, Key=key, Body=chunk.encode())
-            keys.append(key)
-            part += 1
-            chunk = header + line + "\n"
-            size = len(chunk.encode())
-        else:
-            chunk += line + "\n"
-            size += len(encoded)
-
-    if size > len(header.encode()):
-        key = f"{PREFIX}{dataset}/{ts}_{part}.csv"
-        s3.put_object(Bucket=BUCKET, Key=key, Body=chunk.encode())
-        keys.append(key)
-
-    print(f"✅ Enviadas {len(keys)} parte(s) para dataset '{dataset}'")
-    return keys
+
+    digest = PushDigest()
+    with ParallelUploader(s3, BUCKET, max_workers=max_workers, compression=compression) as uploader:
+        for part, chunk in enumerate(iter_csv_chunks(csv_path, max_bytes, start=start, end=end)):
+            key = uploader.submit(f"{PREFIX}{dataset}/{ts}_{part}.csv", chunk)
+            digest.update(chunk, key=key)
+    keys = uploader.keys
+
+    mb_s = uploader.sent_bytes / uploader.elapsed_s / 1e6
+    print(
+        f"✅ Enviadas {len(keys)} parte(s) para dataset '{dataset}' "
+        f"({uploader.raw_bytes} → {uploader.sent_bytes} bytes, {mb_s:.1f} MB/s)"
+    )
+    return {"keys": keys, **digest.as_dict()}
+
+
+@task
+def record_ingestion(manifest: dict, plans: List[FilePlan], pushed: List[Dict[str, object]]) -> None:
+    run_id = int(time.time() * 1000)
+    todo = [p for p in plans if p.mode != "skip"]
+    pushes = {plan.dataset: {k: v for k, v in push.items() if k != "keys"} for plan, push in zip(todo, pushed)}
+    for plan in plans:
+        record_push(manifest, plan, run_id, pushes.get(plan.dataset))
+    save_manifest(boto("s3"), BUCKET, manifest)
 
 # ---------------------------------------------------------------------------
 # Flow
@@ -71,11 +94,18 @@ def push_csv_in_chunks(csv_path: Path, max_bytes: int = 900 * 1024) -> List[str]
 
 @flow(name="landing-to-minio")
 def ingest_folder_flow(folder: str = "csv") -> List[str]:
-    all_keys: List[str] = []
-    csv_files = list_csv(folder)
-    for keys in push_csv_in_chunks.map(csv_files):
-        all_keys.extend(keys)
-    return all_keys
+    manifest = load_manifest(boto("s3"), BUCKET)
+    plans = plan_ingestion(list_csv(folder), manifest)
+    todo = [p for p in plans if p.mode != "skip"]
+
+    pushed = push_csv_in_chunks.map(
+        [Path(p.path) for p in todo],
+        start=[p.start for p in todo],
+        end=[p.end for p in todo],
+    ).result()
+    record_ingestion(manifest, plans, pushed)
+    aws_clients.log_client_stats()
+    return [key for push in pushed for key in push["keys"]]
 
 # Execução local
 if __name__ == "__main__":
@@ -0,0 +1,96 @@
+"""Upload paralelo de chunks da landing para o MinIO (S3), com compressão opcional (gzip/zstd) e fila limitada."""
+from __future__ import annotations
+
+import gzip
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+# codec -> (sufixo da chave, Content-Encoding)
+CODECS: Dict[str, Tuple[str, str]] = {
+    "gzip": (".gz", "gzip"),
+    "zstd": (".zst", "zstd"),
+}
+
+
+def compressor(codec: Optional[str], level: Optional[int] = None) -> Callable[[bytes], bytes]:
+    if not codec:
+        return lambda data: data
+    if codec == "gzip":
+        return lambda data: gzip.compress(data, compresslevel=level or 6, mtime=0)
+    if codec == "zstd":
+        try:
+            import zstandard
+        except ImportError as e:
+            raise RuntimeError("compression='zstd' requer o pacote 'zstandard'") from e
+        # ZstdCompressor não é thread-safe: um por chamada (custo desprezível)
+        return lambda data: zstandard.ZstdCompressor(level=level or 3).compress(data)
+    raise ValueError(f"Codec de compressão desconhecido: {codec}")
+
+
+class ParallelUploader:
+    def __init__(
+        self,
+        s3,
+        bucket: str,
+        max_workers: int = 16,
+        max_pending: Optional[int] = None,
+        compression: Optional[str] = None,
+        level: Optional[int] = None,
+    ):
+        self.s3 = s3
+        self.bucket = bucket
+        self.compression = compression or None
+        self.keys: List[str] = []
+        self.raw_bytes = 0
+        self.sent_bytes = 0
+
+        self._compress = compressor(self.compression, level)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+        self._slots = threading.BoundedSemaphore(max_pending or 2 * max_workers)
+        self._lock = threading.Lock()
+        self._futures: List[Future] = []
+        self._started = time.perf_counter()
+
+    def key_for(self, key: str) -> str:
+        return key + CODECS[self.compression][0] if self.compression else key
+
+    def submit(self, key: str, body) -> str:
+        """Enfileira o upload; bloqueia enquanto a fila estiver cheia."""
+        key = self.key_for(key)
+        self._slots.acquire()
+        future = self._pool.submit(self._upload, key, body)
+        future.add_done_callback(lambda _: self._slots.release())
+        self._futures.append(future)
+        self.keys.append(key)
+        return key
+
+    def close(self) -> List[str]:
+        try:
+            for future in self._futures:
+                future.result()
+        finally:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+        return self.keys
+
+    def __enter__(self) -> "ParallelUploader":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    @property
+    def elapsed_s(self) -> float:
+        return time.perf_counter() - self._started
+
+    def _upload(self, key: str, body) -> None:
+        payload = self._compress(body)
+        extra = {"ContentType": "text/csv"}
+        if self.compression:
+            extra["ContentEncoding"] = CODECS[self.compression][1]
+        self.s3.put_object(Bucket=self.bucket, Key=key, Body=payload, **extra)
+
+        with self._lock:
+            self.raw_bytes += len(body)
+            self.sent_bytes += len(payload)
@@ -2,12 +2,17 @@
 from __future__ import annotations
 
 import os
+import sys
+from pathlib import Path
 
 import daft
-from daft import col, DataType
+from daft import col
 from prefect import flow, task
 from pyiceberg.catalog import load_catalog
 
+sys.path.append(str(Path(__file__).resolve().parents[1] / "flows"))
+import schemas  # noqa: E402
+
 CATALOG = load_catalog(
     "nessie",
     uri=os.getenv("NESSIE_URI", "http://nessie.lakehouse.svc.cluster.local:19120/api/v1"),
@@ -25,7 +30,7 @@ def read_daft(table_id: str) -> daft.DataFrame:
 
 def write_daft(df: daft.DataFrame, table_id: str, mode: str = "append"):
     if not CATALOG.table_exists(table_id):
-        CATALOG.create_table(table_id, schema=df.to_arrow().schema)
+        CATALOG.create_table(table_id, schema=schemas.iceberg_schema(table_id.split(".", 1)[1]))
     table = CATALOG.load_table(table_id)
     df.write_iceberg(table, mode=mode)
 
@@ -33,46 +38,31 @@ def write_daft(df: daft.DataFrame, table_id: str, mode: str = "append"):
 # ---------------------------------------------------------------------
 # Transform tasks
 # ---------------------------------------------------------------------
+# a bronze Iceberg já é tipada pelo registro de schemas: nada de cast aqui;
+# start_year entra porque faz parte do schema da silver.bands
 @task
 def transform_albums(df: daft.DataFrame) -> daft.DataFrame:
-    return (
-        df
-        .with_column("id", col("id").cast(DataType.int64()))
-        .with_column("band", col("band").cast(DataType.int64()))
-        .with_column("year", col("year").cast(DataType.int64()))
-    )
+    return df.select(*schemas.ALBUMS.names)
 
 
 @task
 def transform_bands(df: daft.DataFrame) -> daft.DataFrame:
-    return (
-        df
-        .with_column("id", col("id").cast(DataType.int64()))
-        .with_column("formed_in", col("formed_in").cast(DataType.int64()))
+    return df.select(*schemas.BANDS.names).with_column(
+        "start_year", col("active").str.extract(r"(\d{4})").cast(daft.DataType.int64())
     )
 
 
 @task
 def transform_reviews(df: daft.DataFrame) -> daft.DataFrame:
-    return (
-        df
-        .filter(~col("id").cast(DataType.string()).str.contains("id"))
-        .with_column("id", col("id").cast(DataType.int64()))
-        .with_column("album", col("album").cast(DataType.int64()))
-        .with_column("score", col("score").cast(DataType.float64()))
-    )
+    return df.select(*schemas.REVIEWS.names)
 
 
 @task
 def join_music_catalog(albums: daft.DataFrame, bands: daft.DataFrame) -> daft.DataFrame:
-    albums_mod = (
-        albums
-        .with_column_renamed({"id": "album_id", "title": "album_title", "band": "band_id"})
-    )
-    bands_mod = (
-        bands.with_column_renamed({"id": "band_id", "name": "band_name"})
-    )
-    return albums_mod.join(bands_mod, on="band_id", how="left")
+    albums_mod = albums.with_column_renamed(schemas.ALBUMS.renames)
+    bands_mod = bands.with_column_renamed(schemas.BANDS.renames)
+    joined = albums_mod.join(bands_mod, on="band_id", how="left")
+    return joined.select(*schemas.MUSIC_CATALOG.names)
 
 
 # ---------------------------------------------------------------------
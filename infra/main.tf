@@ -44,19 +44,25 @@ resource "aws_iam_role_policy" "firehose_s3" {
 # 3) Kinesis Data Streams
 ###############################################################################
 
+variable "stream_shard_count" {
+  description = "Shards por stream; o producer da landing abre um lote em voo por shard"
+  type        = number
+  default     = 1
+}
+
 resource "aws_kinesis_stream" "albums_stream" {
   name        = "albums-stream"
-  shard_count = 1
+  shard_count = var.stream_shard_count
 }
 
 resource "aws_kinesis_stream" "bands_stream" {
   name        = "bands-stream"
-  shard_count = 1
+  shard_count = var.stream_shard_count
 }
 
 resource "aws_kinesis_stream" "reviews_stream" {
   name        = "reviews-stream"
-  shard_count = 1
+  shard_count = var.stream_shard_count
 }
 
 ###############################################################################
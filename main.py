@@ -1,6 +1,19 @@
+import os
+import sys
+from pathlib import Path
+
 import daft
+import polars as pl
 from daft.io import IOConfig, S3Config
 
+sys.path.append(str(Path(__file__).resolve().parent / "flows"))
+import aws_clients  # noqa: E402
+import gold_publish  # noqa: E402
+
+# COUNTRY=Brazil python main.py: com a gold particionada por país, só as
+# partições desse país são lidas
+COUNTRY = os.getenv("COUNTRY")
+
 io_cfg = IOConfig(
     s3=S3Config(
         endpoint_url="http://localhost:4566",
@@ -10,77 +23,29 @@ io_cfg = IOConfig(
     )
 )
 
-df_bands = daft.read_parquet(
-    "s3://csv-batch-bucket/silver/bands/bands.parquet",
-    io_config=io_cfg
-).sort(by=daft.col('id'))
-
-df_bands.show()
 
-df_albums = daft.read_parquet(
-    "s3://csv-batch-bucket/silver/albums/albums.parquet",
-    io_config=io_cfg
-).sort(by=daft.col('id'))
+def gold_files(dataset, predicate=None):
+    # versão publicada da gold: o ponteiro _CURRENT é lido uma vez e fica em cache
+    return gold_publish.dataset_uris(aws_clients.client("s3"), "csv-batch-bucket", "gold", dataset, predicate)
 
-df_albums = df_albums.with_columns_renamed({"id": "album_id"})
 
-df_albums.show()
-#
-df_reviews = daft.read_parquet(
-    "s3://csv-batch-bucket/silver/reviews/reviews.parquet",
-    io_config=io_cfg
-).sort(by=daft.col('id'))
+country_filter = pl.col("country") == COUNTRY if COUNTRY else None
 
-df_reviews = df_reviews.with_columns_renamed({"album": "album_id"})
-df_reviews.show()
-#
-df_bands_albums = df_albums.join(
-    df_bands,
-    how="left",
-    left_on=daft.col("band"),
-    right_on=daft.col("id")
-).select(
-    daft.col('album_id'),
-    daft.col('title').alias("title_album"),
-    daft.col('year').alias("year_album"),
-    daft.col('name'),
-    daft.col('country'),
-    daft.col('status'),
-    daft.col('formed_in'),
-)
-
-df_bands_albums.show()
+# tabela larga banda × álbum × review já montada e materializada pela gold
+# (full_dataset, recalculada só quando a silver muda): nada de joins aqui
+full_files = gold_files("full_dataset", country_filter)
+if not full_files:
+    sys.exit("⚠️ full_dataset ainda não publicado: rode o gold flow (flows/gold.py).")
 
-df_albums_reviews = df_reviews.join(
-    df_albums,
-    how="right",
-    left_on=daft.col("album_id"),
-    right_on=daft.col("album_id")
-).select(
-    daft.col('id').alias("id_review"),
-    daft.col('album_id'),
-    daft.col('title').alias("title_review"),
-    daft.col('score'),
-    daft.col('content'),
-)
+df_fulldataset = daft.read_parquet(full_files, io_config=io_cfg)
+if COUNTRY:
+    df_fulldataset = df_fulldataset.filter(daft.col('country') == COUNTRY)
 
-df_albums_reviews.show()
-#
-df_fulldataset = df_bands_albums.join(
-    df_albums_reviews,
-    how="left",
-    left_on=daft.col("album_id"),
-    right_on=daft.col("album_id")
-).select(
-    daft.col('name'),
-    daft.col('country'),
-    daft.col('status'),
-    daft.col('formed_in'),
-    daft.col('title_album'),
-    daft.col('year_album'),
-    daft.col('title_review'),
-    daft.col('score'),
-    daft.col('content')
-)
+df_fulldataset.show()
 
-df_fulldataset.filter(daft.col('name') != 'None').filter(daft.col('title_review') != 'None').show()
+top10_files = gold_files("top10_by_country", country_filter)
+if top10_files:
+    df_top10 = daft.read_parquet(top10_files, io_config=io_cfg)
+    if COUNTRY:
+        df_top10 = df_top10.filter(daft.col('country') == COUNTRY)
+    df_top10.show()
@@ -11,80 +11,97 @@ CREATE SCHEMA IF NOT EXISTS silver;
 CREATE SCHEMA IF NOT EXISTS gold;
 
 -- ==============================================================
--- 2. Tabelas Bronze (estruturas mínimas)
---    OBS.: se o loader Python já criou estas tabelas, os CREATE
---    serão ignorados graças ao IF NOT EXISTS.
+-- 2. Tabelas Bronze e Silver
+--    Geradas a partir de flows/schemas.py — não editar à mão;
+--    rode `python flows/schemas.py` depois de mudar o registro.
 -- ==============================================================
 
+-- BEGIN GENERATED (flows/schemas.py)
+
 CREATE TABLE IF NOT EXISTS bronze.albums (
-    id          BIGINT,
-    title       VARCHAR,
+    id          BIGINT NOT NULL,
     band        BIGINT,
-    year        INTEGER,
-    genre       VARCHAR,
-    created_at  TIMESTAMP
+    title       VARCHAR,
+    year        BIGINT
 )
 WITH (format = 'PARQUET');
 
 CREATE TABLE IF NOT EXISTS bronze.bands (
-    id          BIGINT,
-    name        VARCHAR,
-    country     VARCHAR,
-    formed_in   INTEGER,
-    created_at  TIMESTAMP
+    id           BIGINT NOT NULL,
+    name         VARCHAR,
+    country      VARCHAR,
+    status       VARCHAR,
+    formed_in    BIGINT,
+    genre        VARCHAR,
+    theme        VARCHAR,
+    active       VARCHAR
 )
 WITH (format = 'PARQUET');
 
 CREATE TABLE IF NOT EXISTS bronze.reviews (
-    id          BIGINT,
+    id          BIGINT NOT NULL,
     album       BIGINT,
-    reviewer    VARCHAR,
+    title       VARCHAR,
     score       DOUBLE,
-    created_at  TIMESTAMP
+    content     VARCHAR
 )
 WITH (format = 'PARQUET');
 
--- ==============================================================
--- 3. Tabelas Silver (transformadas)
--- ==============================================================
-
 CREATE TABLE IF NOT EXISTS silver.albums (
-    album_id        BIGINT,
-    album_title     VARCHAR,
-    band_id         BIGINT,
-    year            INTEGER,
-    genre           VARCHAR
+    id          BIGINT NOT NULL,
+    band        BIGINT,
+    title       VARCHAR,
+    year        BIGINT
 )
 WITH (format = 'PARQUET');
 
 CREATE TABLE IF NOT EXISTS silver.bands (
-    band_id         BIGINT,
-    band_name       VARCHAR,
-    country         VARCHAR,
-    formed_in       INTEGER
+    id            BIGINT NOT NULL,
+    name          VARCHAR,
+    country       VARCHAR,
+    status        VARCHAR,
+    formed_in     BIGINT,
+    genre         VARCHAR,
+    theme         VARCHAR,
+    active        VARCHAR,
+    start_year    BIGINT
 )
 WITH (format = 'PARQUET');
 
 CREATE TABLE IF NOT EXISTS silver.reviews (
-    review_id   BIGINT,
-    album_id    BIGINT,
-    score       DOUBLE
+    id          BIGINT NOT NULL,
+    album       BIGINT,
+    title       VARCHAR,
+    score       DOUBLE,
+    content     VARCHAR
 )
 WITH (format = 'PARQUET');
 
 CREATE TABLE IF NOT EXISTS silver.music_catalog (
-    album_id        BIGINT,
-    album_title     VARCHAR,
-    band_id         BIGINT,
-    band_name       VARCHAR,
-    country         VARCHAR,
-    year            INTEGER,
-    genre           VARCHAR
+    album_id       BIGINT NOT NULL,
+    album_title    VARCHAR,
+    year           BIGINT,
+    band_id        BIGINT,
+    band_name      VARCHAR,
+    country        VARCHAR,
+    genre          VARCHAR,
+    theme          VARCHAR
 )
 WITH (format = 'PARQUET');
 
+CREATE TABLE IF NOT EXISTS silver.album_reviews (
+    review_id      BIGINT NOT NULL,
+    album_id       BIGINT,
+    album_title    VARCHAR,
+    score          DOUBLE,
+    content        VARCHAR
+)
+WITH (format = 'PARQUET');
+
+-- END GENERATED
+
 -- ==============================================================
--- 4. Tabelas Gold (métricas / agregações)
+-- 3. Tabelas Gold (métricas / agregações)
 -- ==============================================================
 
 CREATE TABLE IF NOT EXISTS gold.top10_by_country (
@@ -108,7 +125,7 @@ CREATE TABLE IF NOT EXISTS gold.band_avg_scores (
 WITH (format = 'PARQUET');
 
 -- ==============================================================
--- 5. Views auxiliares (opcional)
+-- 4. Views auxiliares (opcional)
 -- ==============================================================
 
 CREATE OR REPLACE VIEW gold.band_score_ranking AS